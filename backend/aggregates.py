@@ -0,0 +1,121 @@
+'''
+Precomputed aggregate tables, built by backend.ingest and read by backend.stats_query:
+- player_season_stats: per player, team and season, games played and the total of every stat in STATS
+- team_season_stats:   per team and season, games, wins, losses, points for/against and box score totals
+- game_stat_leaders:   per game and stat in LEADER_STATS, the game leaders and each team's leaders (ties kept)
+
+build_aggregates() creates them from scratch; refresh_aggregates() recomputes only the given games and seasons.
+'''
+import time
+from sqlalchemy import text
+from backend.stats_query import STATS, LEADER_STATS, TEAM_STATS
+
+AGGREGATE_TABLES = ["player_season_stats", "team_season_stats", "game_stat_leaders"]
+
+PLAYER_SEASON_SQL = f"""
+    SELECT pbs.person_id, pbs.team_id, g.season, COUNT(*) AS games,
+            {", ".join(f"CAST(SUM({expr}) AS bigint) AS {stat}" for stat, (expr, _) in STATS.items())}
+    FROM player_box_scores pbs
+    JOIN game_details g ON pbs.game_id = g.game_id
+    {{where}}
+    GROUP BY pbs.person_id, pbs.team_id, g.season
+    """
+
+# Box score totals use the same expressions as the player table; wins and scores come from game_details
+BOX_TEAM_STATS = [stat for stat in TEAM_STATS if stat not in ("points", "wins", "losses")]
+TEAM_SEASON_SQL = f"""
+    SELECT tg.team_id, tg.season, tg.games, tg.wins, tg.losses, tg.points, tg.points_allowed,
+            {", ".join(f"b.{stat}" for stat in BOX_TEAM_STATS)}
+    FROM (
+        SELECT t.team_id, g.season, COUNT(*) AS games,
+                CAST(SUM(CASE WHEN g.winning_team_id = t.team_id THEN 1 ELSE 0 END) AS bigint) AS wins,
+                CAST(SUM(CASE WHEN g.winning_team_id = t.team_id THEN 0 ELSE 1 END) AS bigint) AS losses,
+                CAST(SUM(CASE WHEN g.home_team_id = t.team_id THEN g.home_points ELSE g.away_points END) AS bigint) AS points,
+                CAST(SUM(CASE WHEN g.home_team_id = t.team_id THEN g.away_points ELSE g.home_points END) AS bigint) AS points_allowed
+        FROM game_details g
+        JOIN teams t ON t.team_id IN (g.home_team_id, g.away_team_id)
+        {{where}}
+        GROUP BY t.team_id, g.season
+    ) tg
+    LEFT JOIN (
+        SELECT pbs.team_id, g.season,
+                {", ".join(f"CAST(SUM({STATS[stat][0]}) AS bigint) AS {stat}" for stat in BOX_TEAM_STATS)}
+        FROM player_box_scores pbs
+        JOIN game_details g ON pbs.game_id = g.game_id
+        {{where}}
+        GROUP BY pbs.team_id, g.season
+    ) b ON b.team_id = tg.team_id AND b.season = tg.season
+    """
+
+# One row per player and stat, ranked within the game and within the player's team
+GAME_LEADERS_SQL = f"""
+    WITH v AS (
+        SELECT pbs.game_id, pbs.team_id, pbs.person_id, s.stat, s.value
+        FROM player_box_scores pbs
+        CROSS JOIN LATERAL (VALUES {", ".join(f"('{stat}', CAST({STATS[stat][0]} AS bigint))" for stat in LEADER_STATS)}) AS s(stat, value)
+        {{where}}
+    ), ranked AS (
+        SELECT *,
+                RANK() OVER (PARTITION BY game_id, stat ORDER BY value DESC) AS game_rank,
+                RANK() OVER (PARTITION BY game_id, team_id, stat ORDER BY value DESC) AS team_rank
+        FROM v
+    )
+    SELECT game_id, stat, team_id, person_id, value, game_rank = 1 AS game_leader, team_rank = 1 AS team_leader
+    FROM ranked
+    WHERE game_rank = 1 OR team_rank = 1
+    """
+
+# (table, indexed columns)
+INDEXES = [
+    ("player_season_stats", "season"),
+    ("team_season_stats", "season"),
+    ("game_stat_leaders", "game_id, stat"),
+]
+PRIMARY_KEYS = {
+    "player_season_stats": "person_id, team_id, season",
+    "team_season_stats": "team_id, season",
+}
+
+
+def build_aggregates(cx, schema=None):
+    '''
+    Drop and rebuild every aggregate table from player_box_scores and game_details.
+    With schema set, the tables are created in that schema (source tables still resolve through search_path).
+    '''
+    start = time.perf_counter()
+    qualify = (lambda t: f"{schema}.{t}") if schema else (lambda t: t)
+    for table, sql in (("player_season_stats", PLAYER_SEASON_SQL), ("team_season_stats", TEAM_SEASON_SQL),
+                       ("game_stat_leaders", GAME_LEADERS_SQL)):
+        cx.execute(text(f"DROP TABLE IF EXISTS {qualify(table)}"))
+        cx.execute(text(f"CREATE TABLE {qualify(table)} AS " + sql.format(where="")))
+        if table in PRIMARY_KEYS:
+            cx.execute(text(f"ALTER TABLE {qualify(table)} ADD PRIMARY KEY ({PRIMARY_KEYS[table]})"))
+    for table, cols in INDEXES:
+        name = f"idx_{table}_{cols.replace(', ', '_')}"
+        cx.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {qualify(table)} ({cols})"))
+    print(f"Built aggregate tables in {time.perf_counter() - start:.2f}s")
+
+
+def aggregates_exist(cx):
+    return all(cx.execute(text("SELECT to_regclass(:t) IS NOT NULL"), {"t": t}).scalar() for t in AGGREGATE_TABLES)
+
+
+def refresh_aggregates(cx, game_ids, seasons):
+    '''
+    Recompute game_stat_leaders for the given games and the season tables for the given seasons.
+    Rows for games or seasons that no longer exist are removed.
+    '''
+    start = time.perf_counter()
+    game_ids, seasons = sorted(game_ids), sorted(seasons)
+    if game_ids:
+        params = {"game_ids": game_ids}
+        cx.execute(text("DELETE FROM game_stat_leaders WHERE game_id = ANY(:game_ids)"), params)
+        cx.execute(text("INSERT INTO game_stat_leaders " +
+                        GAME_LEADERS_SQL.format(where="WHERE pbs.game_id = ANY(:game_ids)")), params)
+    if seasons:
+        params = {"seasons": seasons}
+        for table, sql in (("player_season_stats", PLAYER_SEASON_SQL), ("team_season_stats", TEAM_SEASON_SQL)):
+            cx.execute(text(f"DELETE FROM {table} WHERE season = ANY(:seasons)"), params)
+            cx.execute(text(f"INSERT INTO {table} " + sql.format(where="WHERE g.season = ANY(:seasons)")), params)
+    print(f"Refreshed aggregates for {len(game_ids)} games and {len(seasons)} seasons "
+          f"in {time.perf_counter() - start:.2f}s")
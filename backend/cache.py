@@ -0,0 +1,268 @@
+import copy
+import time
+import sqlite3
+import threading
+import numpy as np
+from collections import OrderedDict
+
+
+def normalize_text(text):
+    """
+    Collapse runs of whitespace and lowercase, so trivially different phrasings share a cache entry.
+    """
+    return " ".join(text.split()).lower()
+
+
+class EmbeddingCache:
+    """
+    Bounded, thread-safe LRU cache of query embeddings keyed on model + text.
+
+    - maxsize: max in-memory entries; least recently used entries are evicted first (0 disables caching)
+    - ttl: seconds before an entry expires (None = never)
+    - normalize: key on normalize_text(text) instead of the raw text
+    - path: optional SQLite file used as a second tier, so entries survive restarts
+    """
+
+    def __init__(self, maxsize=1024, ttl=None, normalize=True, path=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.normalize = normalize
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._entries = OrderedDict()    # key -> (created, vector)
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, created REAL, vector BLOB)")
+            self._db.commit()
+
+    def key(self, model, text):
+        return f"{model}\n{normalize_text(text) if self.normalize else text}"
+
+    def _expired(self, created):
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def get(self, model, text):
+        """
+        Return the cached vector (list of floats) or None.
+        """
+        if self.maxsize <= 0:
+            return None
+        k = self.key(model, text)
+        with self._lock:
+            entry = self._entries.get(k)
+            if entry is not None and not self._expired(entry[0]):
+                self._entries.move_to_end(k)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[k]
+
+            if self._db is not None:
+                row = self._db.execute("SELECT created, vector FROM embeddings WHERE key = ?", (k,)).fetchone()
+                if row is not None and not self._expired(row[0]):
+                    vec = np.frombuffer(row[1], dtype=np.float32).tolist()
+                    self._store(k, row[0], vec)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return vec
+
+            self.misses += 1
+            return None
+
+    def put(self, model, text, vec):
+        if self.maxsize <= 0:
+            return
+        k = self.key(model, text)
+        created = time.time()
+        with self._lock:
+            self._store(k, created, vec)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO embeddings (key, created, vector) VALUES (?, ?, ?)",
+                                 (k, created, np.asarray(vec, dtype=np.float32).tobytes()))
+                self._db.commit()
+
+    def _store(self, k, created, vec):
+        # Caller holds the lock
+        self._entries[k] = (created, vec)
+        self._entries.move_to_end(k)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def get_or_compute(self, model, text, compute):
+        """
+        Return the cached vector for (model, text), calling compute(model, text) and caching the result on a miss.
+        """
+        vec = self.get(model, text)
+        if vec is None:
+            vec = compute(model, text)
+            self.put(model, text, vec)
+        return vec
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM embeddings")
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class SemanticCache:
+    """
+    Answer cache keyed on question embeddings rather than question text.
+
+    A lookup returns the payload of the most similar cached question when its cosine similarity is at least
+    threshold and its key is equal: near-identical embeddings of questions about different seasons, teams or players
+    must not share an answer, so callers key entries on what the question names. Each entry carries the dependencies (source rows) it was built from; lookup() takes an
+    is_valid(deps) callback so stale entries are dropped individually when their rows change.
+    Async callers validate between candidate() and accept()/reject() instead.
+
+    - maxsize: max entries; least recently used entries are evicted first (0 disables caching)
+    - ttl: seconds before an entry expires (None = never)
+    """
+
+    def __init__(self, threshold=0.97, maxsize=512, ttl=None):
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()    # id -> (created, unit vector, payload, deps, key)
+        self._next_id = 0
+        self._matrix = None              # Stacked unit vectors of _entries, rebuilt lazily
+        self._ids = []
+        self._keys = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _unit(vec):
+        v = np.asarray(vec, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm > 0 else v
+
+    def _best_match(self, q, key):
+        # Caller holds the lock
+        if self._matrix is None:
+            self._ids = list(self._entries)
+            self._keys = [self._entries[i][4] for i in self._ids]
+            self._matrix = np.stack([self._entries[i][1] for i in self._ids]) if self._ids else None
+        if self._matrix is None:
+            return None, 0.0
+        same_key = np.fromiter((k == key for k in self._keys), dtype=bool, count=len(self._keys))
+        if not same_key.any():
+            return None, 0.0
+        sims = np.where(same_key, self._matrix @ q, -np.inf)
+        best = int(np.argmax(sims))
+        return self._ids[best], float(sims[best])
+
+    def _remove(self, entry_id):
+        # Caller holds the lock
+        del self._entries[entry_id]
+        self._matrix = None
+
+    def candidate(self, qvec, key=None):
+        """
+        Find the closest cached question above threshold that was stored with an equal key. Returns (entry_id, deps)
+        for the caller to validate and then accept() or reject(), or None on a miss.
+        """
+        if self.maxsize <= 0:
+            return None
+        q = self._unit(qvec)
+        with self._lock:
+            entry_id, sim = self._best_match(q, key)
+            if entry_id is None or sim < self.threshold:
+                self.misses += 1
+                return None
+            created, _, _, deps, _ = self._entries[entry_id]
+            if self.ttl is not None and time.time() - created > self.ttl:
+                self._remove(entry_id)
+                self.misses += 1
+                return None
+            return entry_id, deps
+
+    def accept(self, entry_id):
+        """
+        Return a copy of a validated candidate's payload (None if it was evicted in the meantime).
+        """
+        with self._lock:
+            entry = self._entries.get(entry_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(entry_id)
+            self.hits += 1
+            return copy.deepcopy(entry[2])
+
+    def reject(self, entry_id):
+        """
+        Evict a candidate whose dependencies changed.
+        """
+        with self._lock:
+            if entry_id in self._entries:
+                self._remove(entry_id)
+                self.invalidations += 1
+            self.misses += 1
+
+    def lookup(self, qvec, is_valid=None, key=None):
+        """
+        Return a copy of the cached payload for the closest question above threshold with an equal key, or None.
+        is_valid(deps) is called on a candidate hit; if it returns False the entry is evicted and the lookup misses.
+        """
+        found = self.candidate(qvec, key)
+        if found is None:
+            return None
+        entry_id, deps = found
+        if is_valid is not None and not is_valid(deps):
+            self.reject(entry_id)
+            return None
+        return self.accept(entry_id)
+
+    def store(self, qvec, payload, deps=None, key=None):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[self._next_id] = (time.time(), self._unit(qvec), copy.deepcopy(payload), deps, key)
+            self._next_id += 1
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def invalidate(self, predicate=None):
+        """
+        Drop every entry whose deps satisfy predicate(deps), or all entries if predicate is None.
+        Returns the number of entries dropped.
+        """
+        with self._lock:
+            stale = [i for i, e in self._entries.items() if predicate is None or predicate(e[3])]
+            for i in stale:
+                self._remove(i)
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
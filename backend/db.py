@@ -0,0 +1,154 @@
+'''
+Shared database engines for the API server and backend.rag.
+
+Both engines use one configurable pool (DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE,
+DB_POOL_PRE_PING) and cache compiled SQL; the asyncpg engine also keeps DB_STATEMENT_CACHE_SIZE prepared
+statements per connection, so the constant retrieval queries are parsed and planned once per connection.
+Retrieval only reads, so read_only() / read_connection() open READ ONLY transactions.
+Pool counters (connections checked out, overflow, time spent waiting for a connection) are kept per engine
+by PoolMetrics and served from /api/stats.
+'''
+import time
+import threading
+import sqlalchemy as sa
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from contextlib import contextmanager, asynccontextmanager
+from backend.config import (DB_DSN, ASYNC_DB_DSN, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE,
+                            DB_POOL_PRE_PING, DB_STATEMENT_CACHE_SIZE)
+
+
+def pool_options():
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "query_cache_size": DB_STATEMENT_CACHE_SIZE,
+    }
+
+
+class PoolMetrics:
+    '''
+    Counters for one engine's pool: checkouts, new connections, acquire wait times and pool timeouts.
+    Live gauges (size, checked out, overflow) are read from the pool itself.
+    '''
+
+    def __init__(self, engine):
+        self.pool = engine.pool
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.connects = 0
+        self.timeouts = 0
+        self.waits = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "connect", self._on_connect)
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self.waits += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.pool.size(),
+                "checked_out": self.pool.checkedout(),
+                "idle": self.pool.checkedin(),
+                "overflow": max(self.pool.overflow(), 0),
+                "max_overflow": DB_MAX_OVERFLOW,
+                "checkouts": self.checkouts,
+                "connects": self.connects,
+                "timeouts": self.timeouts,
+                "wait_ms_avg": round(1000 * self.wait_total / self.waits, 3) if self.waits else 0.0,
+                "wait_ms_max": round(1000 * self.wait_max, 3),
+            }
+
+
+_engine = None
+_engine_metrics = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    '''
+    Process-wide psycopg2 engine (backend.rag), created on first use.
+    '''
+    global _engine, _engine_metrics
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                eng = sa.create_engine(DB_DSN, **pool_options())
+                _engine_metrics = PoolMetrics(eng)
+                _engine = eng
+    return _engine
+
+
+@contextmanager
+def read_only():
+    '''
+    A connection from the shared pool inside a READ ONLY transaction. Acquire time is recorded in the pool metrics.
+    '''
+    eng = get_engine()
+    start = time.perf_counter()
+    try:
+        cx = eng.connect()
+    except PoolTimeout:
+        _engine_metrics.record_timeout()
+        raise
+    _engine_metrics.record_wait(time.perf_counter() - start)
+    with cx:
+        cx.execution_options(postgresql_readonly=True)
+        with cx.begin():
+            yield cx
+
+
+def make_async_engine():
+    '''
+    asyncpg engine for the API server, with the shared pool settings and a per-connection prepared statement cache.
+    Returns (engine, PoolMetrics).
+    '''
+    url = make_url(ASYNC_DB_DSN).update_query_dict({"prepared_statement_cache_size": str(DB_STATEMENT_CACHE_SIZE)})
+    aeng = create_async_engine(url, **pool_options())
+    return aeng, PoolMetrics(aeng.sync_engine)
+
+
+@asynccontextmanager
+async def read_connection(aeng, metrics):
+    '''
+    Async counterpart of read_only(): a pooled asyncpg connection whose transactions are READ ONLY.
+    '''
+    start = time.perf_counter()
+    try:
+        async with aeng.connect() as cx:
+            metrics.record_wait(time.perf_counter() - start)
+            await cx.execution_options(postgresql_readonly=True)
+            yield cx
+    except PoolTimeout:
+        metrics.record_timeout()
+        raise
+
+
+def pool_stats():
+    '''
+    Metrics of the sync engine, or None if it has not been used in this process.
+    '''
+    return _engine_metrics.stats() if _engine_metrics is not None else None
@@ -1,8 +1,20 @@
+import io
+import os
+import sys
+import time
+import math
+import hashlib
+import argparse
+import numpy as np
 import pandas as pd
+import multiprocessing as mp
 import sqlalchemy as sa
 from sqlalchemy import text
-from backend.config import DB_DSN, EMBED_MODEL
-from backend.utils import ollama_embed
+from backend.config import DB_DSN, EMBED_MODEL, EMBED_BACKEND, EMBED_BATCH_SIZE, EMBED_CHUNK_SIZE, EMBED_WORKERS
+from backend.encoders import encoder_id
+from backend.utils import ollama_embed_batch, get_embed_model
+from backend.lexical import search_terms
+from backend.quantize import create_vector_index
 
 def row_text_game(r):
     '''
@@ -74,55 +86,271 @@ def row_text_player(r):
            f"Points: {pts} | Rebounds: {reb} | Assists: {ast} | {td} | {dd}")
 
 
-def embed_games(eng):
+def _concat(*parts):
     '''
-    Embed every row in game_details.
+    Element-wise string concatenation of Series and scalar strings.
+    '''
+    out = parts[0]
+    for p in parts[1:]:
+        out = out + p
+    return out
+
+
+def _date_parts(df):
+    '''
+    Vectorized equivalent of the per-row date strings shared by row_text_game and row_text_player.
+    Dates are formatted once per distinct (game_timestamp, season) and broadcast back to every row.
+    '''
+    keys = df[["game_timestamp", "season"]]
+    codes = keys.groupby(["game_timestamp", "season"], sort=False).ngroup().to_numpy()
+    uniq = keys.drop_duplicates()
+
+    ts = pd.to_datetime(uniq["game_timestamp"], utc=True)
+    season = uniq["season"].astype("int64")
+    season_str = season.astype(str)
+    season_span = _concat(season_str, "-", (season + 1).astype(str).str[-2:])
+    date_in_season = _concat(ts.dt.month.astype(str), "/", ts.dt.day.astype(str), " in the ", season_str, " NBA Season")
+    parts = _concat(date_in_season, " | ", ts.dt.strftime('%B %d, %Y'), "| ", ts.dt.strftime('%m/%d/%Y'), " | ",
+                    ts.dt.strftime('%Y-%m-%d'), " | ", season_str, " NBA season | ", season_span, " NBA season | ")
+    return pd.Series(parts.to_numpy()[codes], index=df.index)
+
+
+def row_texts_game(df):
+    '''
+    Column-wise row_text_game: build the embedding string for every game_details row at once.
+    Output is identical to applying row_text_game to each row.
+    '''
+    s = {c: df[c].astype(str) for c in ["home_city", "home_team_name", "home_abbrev", "away_city", "away_team_name", "away_abbrev"]}
+    home_pts = df["home_points"].astype("int64").astype(str)
+    away_pts = df["away_points"].astype("int64").astype(str)
+    home = _concat(s["home_city"], " ", s["home_team_name"])
+    away = _concat(s["away_city"], " ", s["away_team_name"])
+    home_full = _concat(home, " (", s["home_abbrev"], ")")
+    away_full = _concat(away, " (", s["away_abbrev"], ")")
+    winner = home_full.where(df["winning_team_id"] == df["home_team_id"], away_full)
+
+    return _concat(_date_parts(df),
+                   "Home: ", home_full, " | ",
+                   "Away: ", away_full, " | ",
+                   "Matchup: ", s["away_abbrev"], "@", s["home_abbrev"], " | ",
+                   "Score: ", home, " ", home_pts, " - ", away_pts, " ", away, " | ",
+                   "Winner: ", winner, " victory")
+
+
+def row_texts_player(df):
+    '''
+    Column-wise row_text_player: build the embedding string for every player_box_scores row at once.
+    Output is identical to applying row_text_player to each row.
+    '''
+    s = {c: df[c].astype(str) for c in ["team_city", "team_name", "team_abbrev", "opp_city", "opp_name", "opp_abbrev",
+                                       "home_abbrev", "away_abbrev"]}
+    name = _concat(df["first_name"].astype(str), " ", df["last_name"].astype(str))
+    name_ascii = name.str.encode("ascii", "ignore").str.decode("ascii")
+    pts = df["points"].astype("int64")
+    reb = (df["oreb"] + df["dreb"]).astype("int64")
+    ast = df["assists"].astype("int64")
+    n_double = (pts >= 10).astype(int) + (reb >= 10).astype(int) + (ast >= 10).astype(int)
+    td = pd.Series(np.where(n_double >= 3, "Triple-Double", ""), index=df.index)
+    dd = pd.Series(np.where(n_double == 2, "Double-Double", ""), index=df.index)
+    team = _concat(s["team_city"], " ", s["team_name"])
+    opp = _concat(s["opp_city"], " ", s["opp_name"])
+
+    return _concat(name, " | ", name_ascii, " | ",
+                   _date_parts(df),
+                   "Team: ", team, " (", s["team_abbrev"], ") | ",
+                   "Opponent: ", opp, " (", s["opp_abbrev"], ") | ",
+                   "Matchup: ", s["away_abbrev"], "@", s["home_abbrev"], " | ", team, " vs  ", opp, " | ",
+                   "Points: ", pts.astype(str), " | Rebounds: ", reb.astype(str), " | Assists: ", ast.astype(str),
+                   " | ", td, " | ", dd)
+
+
+def vector_literal(vec):
+    '''
+    Format a vector in pgvector's text representation ("[x1,x2,...]") for COPY.
+    '''
+    return "[" + ",".join(map(str, vec.tolist())) + "]"
+
+
+def content_hash(row_text):
+    '''
+    Hash of the embedding input plus the model and encoder backend, stored next to each embedding so unchanged rows
+    can be skipped.
+    '''
+    return hashlib.sha256(f"{encoder_id(EMBED_MODEL, EMBED_BACKEND)}\n{row_text}".encode("utf-8")).hexdigest()
+
+
+def update_from_staging(cx, table, key_cols, staging, col_defs, lines, assignments):
+    '''
+    COPY tab-separated lines (key columns first, then col_defs) into a temporary staging table,
+    then apply them with a single UPDATE ... FROM join instead of one UPDATE per row.
+    '''
+    key_defs = ", ".join(f"{k} bigint" for k in key_cols)
+    cx.execute(text(f"CREATE TEMP TABLE IF NOT EXISTS {staging} ({key_defs}, {col_defs}) ON COMMIT DROP"))
+    cols = key_cols + [d.split()[0] for d in col_defs.split(", ")]
+    buf = io.StringIO("".join(lines))
+
+    # COPY is not exposed through SQLAlchemy, so go through the underlying psycopg2 cursor
+    with cx.connection.dbapi_connection.cursor() as cur:
+        cur.copy_expert(f"COPY {staging} ({', '.join(cols)}) FROM STDIN", buf)
+
+    match = " AND ".join(f"t.{k} = s.{k}" for k in key_cols)
+    cx.execute(text(f"UPDATE {table} t SET {assignments} FROM {staging} s WHERE {match}"))
+
+
+def write_embeddings(cx, table, column, key_cols, keys, vecs, hashes, terms=None):
+    '''
+    Bulk write one chunk of embeddings and their hashes. With terms (backend.lexical.search_terms of the row texts),
+    {column}_terms is set too, for full-text search in hybrid retrieval.
+    '''
+    terms = terms if terms is not None else [None] * len(hashes)
+    lines = ("\t".join(str(int(k)) for k in key) + "\t" + vector_literal(vec) + "\t" + h + "\t" + (t if t is not None else "\\N") + "\n"
+             for key, vec, h, t in zip(keys, vecs, hashes, terms))
+    assignments = f"{column} = s.v, {column}_hash = s.h, {column}_terms = COALESCE(to_tsvector('simple', s.t), t.{column}_terms)"
+    update_from_staging(cx, table, key_cols, f"staging_{column}", "v vector(768), h text, t text", lines, assignments)
+
+
+def write_terms(cx, table, column, key_cols, keys, terms):
+    '''
+    Bulk write only the full-text search terms of one chunk (rows embedded before {column}_terms existed).
+    '''
+    lines = ("\t".join(str(int(k)) for k in key) + "\t" + t + "\n" for key, t in zip(keys, terms))
+    update_from_staging(cx, table, key_cols, f"staging_{column}_terms", "t text", lines,
+                        f"{column}_terms = to_tsvector('simple', s.t)")
+
+
+def init_worker(num_threads):
+    '''
+    Process pool initializer: cap the encoder's thread count so workers don't oversubscribe the cores,
+    and load the embedding model once per worker.
+    '''
+    get_embed_model(num_threads)
+
+
+def encode_shard(texts):
+    '''
+    Encode one shard of texts inside a pool worker.
+    '''
+    return ollama_embed_batch(EMBED_MODEL, texts, batch_size=EMBED_BATCH_SIZE)
+
+
+def parallel_encoder(pool, workers):
+    '''
+    Build an encode(texts) function that splits texts into one contiguous shard per worker and
+    reassembles the vectors in input order, so results flow back to the single writer in the main process.
+    '''
+    def encode(texts):
+        size = math.ceil(len(texts) / workers)
+        shards = [texts[i:i + size] for i in range(0, len(texts), size)]
+        return np.vstack(pool.map(encode_shard, shards))
+    return encode
+
+
+def embed_rows(eng, select_sql, row_texts, table, column, key_cols, label, full=False, encode=None):
+    '''
+    Stream rows from select_sql in chunks of EMBED_CHUNK_SIZE, build their texts column-wise with row_texts(df),
+    encode the stale rows of each chunk as one batch and write them back with one bulk statement per chunk.
+    Returns the number of rows embedded.
+
+    A row is stale if its embedding is NULL or its stored hash no longer matches content_hash() of its text
+    (text, EMBED_MODEL or EMBED_BACKEND changed). Stale rows get their full-text search terms written with the embedding;
+    fresh rows without terms get only their terms, without re-encoding. Every chunk commits its embeddings and hashes together, so an interrupted
+    run resumes where it stopped: the committed rows are no longer stale on the next run.
+    With full=True every row is re-embedded regardless of its stored hash.
+    encode(texts) defaults to encoding in-process; see parallel_encoder() for the multi-process variant.
+    '''
+    if encode is None:
+        encode = lambda texts: ollama_embed_batch(EMBED_MODEL, texts, batch_size=EMBED_BATCH_SIZE)
+    total = 0
+    skipped = 0
+    indexed = 0
+    start = time.perf_counter()
+
+    # Server-side cursor so only one chunk is held in memory at a time
+    with eng.connect().execution_options(stream_results=True) as read_cx:
+        for df in pd.read_sql(text(select_sql), read_cx, chunksize=EMBED_CHUNK_SIZE):
+            texts = row_texts(df).tolist()
+            hashes = [content_hash(t) for t in texts]
+            stale = [
+                i for i, h in enumerate(hashes)
+                if full or df["missing_embedding"].iat[i] or df["stored_hash"].iat[i] != h
+            ]
+            skipped += len(df) - len(stale)
+            stale_set = set(stale)
+            unindexed = [i for i in range(len(df)) if df["missing_terms"].iat[i] and i not in stale_set]
+            if unindexed:
+                keys = df[key_cols].iloc[unindexed].itertuples(index=False, name=None)
+                with eng.begin() as cx:
+                    write_terms(cx, table, column, key_cols, keys, search_terms([texts[i] for i in unindexed]))
+                indexed += len(unindexed)
+            if not stale:
+                continue
+
+            vecs = encode([texts[i] for i in stale])
+            keys = df[key_cols].iloc[stale].itertuples(index=False, name=None)
+            with eng.begin() as cx:
+                write_embeddings(cx, table, column, key_cols, keys, vecs, [hashes[i] for i in stale],
+                                 search_terms([texts[i] for i in stale]))
+
+            total += len(stale)
+            print(f"Embedded {total} {label} rows, skipped {skipped} unchanged ({total / (time.perf_counter() - start):.1f} rows/s)")
+
+    elapsed = time.perf_counter() - start
+    rate = total / elapsed if elapsed > 0 else 0.0
+    print(f"Finished {label.title()} Embeddings: {total} Rows Updated, {skipped} Unchanged in {elapsed:.1f}s ({rate:.1f} rows/s)")
+    if indexed:
+        print(f"Indexed search terms of {indexed} unchanged {label} rows")
+    return total
+
+
+def embed_games(eng, full=False, encode=None):
+    '''
+    Embed every new or changed row in game_details (every row if full=True).
     '''
     with eng.begin() as cx:
         cx.execute(text("ALTER TABLE IF EXISTS game_details ADD COLUMN IF NOT EXISTS game_embedding vector(768);"))
-        cx.execute(text("CREATE INDEX IF NOT EXISTS idx_game_details_game_embedding ON game_details USING hnsw (game_embedding vector_cosine_ops);"))
+        cx.execute(text("ALTER TABLE IF EXISTS game_details ADD COLUMN IF NOT EXISTS game_embedding_hash text;"))
+        create_vector_index(cx, "game_details", "game_embedding")
+        cx.execute(text("ALTER TABLE IF EXISTS game_details ADD COLUMN IF NOT EXISTS game_embedding_terms tsvector;"))
+        cx.execute(text("CREATE INDEX IF NOT EXISTS idx_game_details_game_embedding_terms ON game_details USING gin (game_embedding_terms);"))
     
     # Include relevant details from other tables in embedding
-    df = pd.read_sql("""
+    game_sql = """
         SELECT 
             g.game_id, g.season, g.game_timestamp, g.home_points, g.away_points, g.winning_team_id, 
             g.home_team_id, h.city AS home_city, h.name AS home_team_name, h.abbreviation AS home_abbrev,
-            g.away_team_id, a.city AS away_city, a.name AS away_team_name, a.abbreviation AS away_abbrev
+            g.away_team_id, a.city AS away_city, a.name AS away_team_name, a.abbreviation AS away_abbrev,
+            g.game_embedding_hash AS stored_hash, g.game_embedding IS NULL AS missing_embedding,
+            g.game_embedding_terms IS NULL AS missing_terms
         FROM game_details g
         JOIN teams h ON g.home_team_id = h.team_id
         JOIN teams a ON g.away_team_id = a.team_id
-    """, eng)
+        ORDER BY g.game_id
+    """
     
-    total = len(df)
-    for i, (_, r) in enumerate(df.iterrows(), start=1):
-        print(f"Embedding game row {i}/{total}")
-        vec = ollama_embed(EMBED_MODEL, row_text_game(r))
-        with eng.begin() as cx:
-            cx.execute(text("""
-                UPDATE game_details 
-                SET game_embedding = :v 
-                WHERE game_id = :gid
-            """), {"v": vec, "gid": int(r.game_id)})
-
-    print(f"Finished Game Embeddings: {total} Rows Updated")
+    return embed_rows(eng, game_sql, row_texts_game, "game_details", "game_embedding", ["game_id"], "game", full, encode)
 
 
-def embed_players(eng):
+def embed_players(eng, full=False, encode=None):
     '''
-    Embed every row in player_box_scores.
+    Embed every new or changed row in player_box_scores (every row if full=True).
     '''
     with eng.begin() as cx:
         cx.execute(text("ALTER TABLE IF EXISTS player_box_scores ADD COLUMN IF NOT EXISTS player_embedding vector(768);"))
-        cx.execute(text("CREATE INDEX IF NOT EXISTS idx_player_box_scores_player_embedding ON player_box_scores USING hnsw (player_embedding vector_cosine_ops);"))
+        cx.execute(text("ALTER TABLE IF EXISTS player_box_scores ADD COLUMN IF NOT EXISTS player_embedding_hash text;"))
+        create_vector_index(cx, "player_box_scores", "player_embedding")
+        cx.execute(text("ALTER TABLE IF EXISTS player_box_scores ADD COLUMN IF NOT EXISTS player_embedding_terms tsvector;"))
+        cx.execute(text("CREATE INDEX IF NOT EXISTS idx_player_box_scores_player_embedding_terms ON player_box_scores USING gin (player_embedding_terms);"))
 
     # Include relevant details from other tables in embedding
-    df = pd.read_sql("""
+    player_sql = """
         SELECT 
             pbs.game_id, g.game_timestamp, g.season, p.first_name, p.last_name, pbs.person_id, 
             t.city AS team_city, t.name AS team_name, t.abbreviation AS team_abbrev,
             opp.city AS opp_city, opp.name AS opp_name, opp.abbreviation AS opp_abbrev,
             g.home_team_id, g.away_team_id, h.abbreviation AS home_abbrev, a.abbreviation AS away_abbrev,
-            pbs.points, pbs.offensive_reb AS oreb, pbs.defensive_reb AS dreb, pbs.assists
+            pbs.points, pbs.offensive_reb AS oreb, pbs.defensive_reb AS dreb, pbs.assists,
+            pbs.player_embedding_hash AS stored_hash, pbs.player_embedding IS NULL AS missing_embedding,
+            pbs.player_embedding_terms IS NULL AS missing_terms
         FROM player_box_scores pbs
         JOIN players p ON pbs.person_id = p.player_id
         JOIN game_details g ON pbs.game_id = g.game_id
@@ -133,31 +361,41 @@ def embed_players(eng):
         )
         JOIN teams h ON g.home_team_id = h.team_id
         JOIN teams a ON g.away_team_id = a.team_id
-    """, eng)
+        ORDER BY pbs.game_id, pbs.person_id
+    """
     
     # Note: 7,224 player_box_scores rows (across 232 missing players) were skipped from embedding due to missing player metadata
-    total = len(df)     # ~36k total player_box_scores rows but condensed down to ~29k
-    for i, (_, r) in enumerate(df.iterrows(), start=1):
-        print(f"Embedding player row {i}/{total}")
-        vec = ollama_embed(EMBED_MODEL, row_text_player(r))
-        with eng.begin() as cx:
-            cx.execute(text("""
-                UPDATE player_box_scores 
-                SET player_embedding = :v 
-                WHERE game_id = :gid AND person_id = :pid 
-            """), {"v": vec, "gid": int(r.game_id), "pid": int(r.person_id)})
-
-    print(f"Finished Player Embeddings: {total} Rows Updated")  
-
-
-def main():
-    print("Starting Embedding Process")
+    # ~36k total player_box_scores rows but condensed down to ~29k
+    return embed_rows(eng, player_sql, row_texts_player, "player_box_scores", "player_embedding", ["game_id", "person_id"], "player", full, encode)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Embed game_details and player_box_scores rows.")
+    parser.add_argument("--full", action="store_true",
+                        help="Re-embed every row instead of only new or changed rows")
+    parser.add_argument("--workers", type=int, default=EMBED_WORKERS,
+                        help="Number of encoder processes (default: EMBED_WORKERS or 1)")
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="Torch threads per worker (default: CPU count / workers)")
+    args = parser.parse_args(argv)
+
+    print(f"Starting Embedding Process ({'full' if args.full else 'incremental'}, {args.workers} worker(s))")
     eng = sa.create_engine(DB_DSN)
-    embed_games(eng)
-    embed_players(eng)
+
+    if args.workers <= 1:
+        embed_games(eng, full=args.full)
+        embed_players(eng, full=args.full)
+    else:
+        threads = args.threads_per_worker or max(1, (os.cpu_count() or 1) // args.workers)
+        # spawn rather than fork: torch's thread pools are not fork-safe
+        with mp.get_context("spawn").Pool(args.workers, initializer=init_worker, initargs=(threads,)) as pool:
+            encode = parallel_encoder(pool, args.workers)
+            embed_games(eng, full=args.full, encode=encode)
+            embed_players(eng, full=args.full, encode=encode)
+
     print("Finished Embedding Process")
 
 
 if __name__ == "__main__":
-    main()
+    main(sys.argv[1:])
     
\ No newline at end of file
@@ -0,0 +1,237 @@
+'''
+Encoder backends behind backend.utils.get_embed_model() (EMBED_BACKEND). Each one has SentenceTransformer's
+encode(texts, batch_size=..., convert_to_numpy=True, show_progress_bar=False) and returns the same 768-d vectors:
+- torch:     SentenceTransformer(EMBED_MODEL), as before
+- onnx:      the same transformer exported to ONNX Runtime, with mean pooling and normalization in numpy;
+             serving it imports neither torch nor sentence-transformers
+- onnx-int8: the ONNX model with its weights dynamically quantized to int8
+
+Export once (needs torch, onnx and onnxruntime), which also checks both ONNX models against torch:
+    python -m backend.encoders export [--out DIR]
+    python -m backend.encoders check [--backend onnx-int8] [--rows N]   # cosine similarity to torch
+'''
+import sys
+import json
+import argparse
+import numpy as np
+from pathlib import Path
+from backend.config import EMBED_MODEL, EMBED_BATCH_SIZE, ONNX_MODEL_DIR
+
+ENCODER_BACKENDS = ("torch", "onnx", "onnx-int8")
+ONNX_FILES = {"onnx": "model.onnx", "onnx-int8": "model.int8.onnx"}
+
+# Lowest cosine similarity to the torch embedding accepted for any text
+TOLERANCES = {"onnx": 0.9999, "onnx-int8": 0.98}
+
+SAMPLE_QUESTIONS = [
+    "Who led the Nuggets in rebounds on 4/9 in the 2023 season?",
+    "How many points did Jalen Brunson score against the Jazz on January 30, 2024?",
+    "What was the score of the Celtics vs Heat game on 5/17/2023?",
+    "Which team won when the Lakers played Golden State on Christmas?",
+    "How many assists did Nikola Jokic have in the 2024 season?",
+    "Tell me about the Knicks' last game",
+]
+
+
+class OnnxEncoder:
+    '''
+    ONNX Runtime encoder over a directory written by export_onnx(): tokenizer.json, encoder.json and the model.
+    Texts are encoded in batches of similar length, so short questions are not padded to the longest row text.
+    '''
+
+    def __init__(self, model_dir=ONNX_MODEL_DIR, backend="onnx", num_threads=None):
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise RuntimeError(f"EMBED_BACKEND={backend} requires onnxruntime (pip install onnxruntime)") from e
+
+        model_dir = Path(model_dir)
+        path = model_dir / ONNX_FILES[backend]
+        if not path.exists():
+            raise RuntimeError(f"No {path}; export it with python -m backend.encoders export --out {model_dir}")
+        self.meta = json.loads((model_dir / "encoder.json").read_text())
+        if self.meta["model"] != EMBED_MODEL:
+            raise RuntimeError(f"{model_dir} was exported from {self.meta['model']}, not EMBED_MODEL {EMBED_MODEL}")
+
+        self.tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(self.meta["max_seq_length"])
+        self.tokenizer.enable_padding(pad_id=self.meta["pad_id"], pad_token=self.meta["pad_token"])
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(str(path), options, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def _encode_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feed = {"input_ids": ids, "attention_mask": mask, "token_type_ids": np.zeros_like(ids)}
+        (hidden,) = self.session.run(["last_hidden_state"], {n: feed[n] for n in self.input_names})
+        # Mean over the real tokens, as sentence-transformers' Pooling(pooling_mode="mean")
+        weights = mask[..., None].astype(np.float32)
+        pooled = (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+        if self.meta["normalize"]:
+            pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+        return pooled
+
+    def encode(self, sentences, batch_size=EMBED_BATCH_SIZE, convert_to_numpy=True, show_progress_bar=False, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        out = np.empty((len(texts), self.meta["dim"]), dtype=np.float32)
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        for i in range(0, len(texts), batch_size):
+            idx = order[i:i + batch_size]
+            out[idx] = self._encode_batch([texts[j] for j in idx])
+        return out[0] if single else out
+
+
+def encoder_id(model, backend):
+    '''
+    Name of the encoder behind an embedding, for content hashes and embedding cache keys. ONNX (and int8) vectors
+    differ slightly from torch ones, so they must not be taken for each other; torch keeps the bare model name,
+    which its stored hashes were computed with.
+    '''
+    return model if backend == "torch" else f"{model} ({backend})"
+
+
+def load_encoder(backend, num_threads=None, model_dir=ONNX_MODEL_DIR):
+    '''
+    The EMBED_BACKEND encoder for EMBED_MODEL. num_threads caps the intra-op threads (pool workers).
+    '''
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        if num_threads:
+            import torch
+            torch.set_num_threads(num_threads)
+            try:
+                torch.set_num_interop_threads(1)
+            except RuntimeError:
+                pass  # Already set once torch started parallel work
+        return SentenceTransformer(EMBED_MODEL)
+    if backend in ONNX_FILES:
+        return OnnxEncoder(model_dir, backend, num_threads)
+    raise ValueError(f"Unknown EMBED_BACKEND {backend!r} (expected one of {', '.join(ENCODER_BACKENDS)})")
+
+
+def export_onnx(out_dir=ONNX_MODEL_DIR):
+    '''
+    Export EMBED_MODEL's transformer to {out_dir}/model.onnx, a dynamically int8-quantized copy to model.int8.onnx,
+    and its tokenizer and pooling settings next to them.
+    '''
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    st = SentenceTransformer(EMBED_MODEL, device="cpu")
+    transformer, pooling = st[0], st[1]
+    # pooling_mode_*: True flags before sentence-transformers 6, a single pooling_mode string since
+    config = pooling.get_config_dict()
+    modes = [k for k, v in config.items() if k.startswith("pooling_mode_") and v is True] or [config.get("pooling_mode")]
+    if modes not in (["pooling_mode_mean_tokens"], ["mean"]):
+        raise RuntimeError(f"{EMBED_MODEL} does not use mean pooling, which OnnxEncoder implements")
+    extra = [type(m).__name__ for m in list(st)[2:] if type(m).__name__ != "Normalize"]
+    if extra:
+        raise RuntimeError(f"{EMBED_MODEL} has modules after pooling that OnnxEncoder does not run: {extra}")
+    model = transformer.auto_model.eval()
+    tokenizer = transformer.tokenizer
+
+    sample = tokenizer(SAMPLE_QUESTIONS[:2], padding=True, return_tensors="pt")
+    input_names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+
+    class LastHiddenState(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *inputs):
+            return self.model(**dict(zip(input_names, inputs))).last_hidden_state
+
+    axes = {0: "batch", 1: "tokens"}
+    torch.onnx.export(LastHiddenState(), tuple(sample[n] for n in input_names), str(out_dir / ONNX_FILES["onnx"]),
+                      input_names=input_names, output_names=["last_hidden_state"],
+                      dynamic_axes={n: axes for n in [*input_names, "last_hidden_state"]},
+                      opset_version=17, dynamo=False)
+    quantize_dynamic(str(out_dir / ONNX_FILES["onnx"]), str(out_dir / ONNX_FILES["onnx-int8"]),
+                     weight_type=QuantType.QInt8)
+
+    tokenizer.backend_tokenizer.save(str(out_dir / "tokenizer.json"))
+    meta = {"model": EMBED_MODEL, "dim": model.config.hidden_size, "max_seq_length": st.max_seq_length,
+            "normalize": any(type(m).__name__ == "Normalize" for m in st),
+            "pad_id": tokenizer.pad_token_id, "pad_token": tokenizer.pad_token}
+    (out_dir / "encoder.json").write_text(json.dumps(meta, indent=2))
+    for backend, name in ONNX_FILES.items():
+        print(f"Exported {backend:<10} {out_dir / name} ({(out_dir / name).stat().st_size / 2**20:.0f} MB)")
+    return st
+
+
+def sample_texts(rows=200, seed=0):
+    '''
+    SAMPLE_QUESTIONS plus the embedding texts of `rows` random games and `rows` random box scores from the CSVs.
+    '''
+    import pandas as pd
+    from backend.ingest import TABLES, csv_path
+    from backend.frames import game_frame, player_frame
+    from backend.embed import row_texts_game, row_texts_player
+
+    tables = {t: pd.read_csv(csv_path(t)) for t in TABLES}
+    games = game_frame(tables)
+    players = player_frame(tables)
+    return (SAMPLE_QUESTIONS
+            + row_texts_game(games.sample(min(rows, len(games)), random_state=seed)).tolist()
+            + row_texts_player(players.sample(min(rows, len(players)), random_state=seed)).tolist())
+
+
+def similarities(encoder, reference, texts, batch_size=EMBED_BATCH_SIZE):
+    '''
+    Cosine similarity of each text's embedding under encoder to its embedding under reference.
+    '''
+    a = encoder.encode(texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+    b = reference.encode(texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+    return (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+
+
+def check(backends, texts, reference=None, min_similarity=None, model_dir=ONNX_MODEL_DIR):
+    '''
+    Compare each ONNX backend with torch on texts; returns False if any text falls below its tolerance.
+    '''
+    reference = reference or load_encoder("torch")
+    ok = True
+    for backend in backends:
+        sims = similarities(load_encoder(backend, model_dir=model_dir), reference, texts)
+        tolerance = TOLERANCES[backend] if min_similarity is None else min_similarity
+        passed = sims.min() >= tolerance
+        ok &= passed
+        print(f"  {backend:<10} cosine to torch over {len(texts)} texts: min {sims.min():.6f}  mean {sims.mean():.6f}  "
+              f"(tolerance {tolerance}) {'ok' if passed else 'FAILED'}")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export and check the ONNX encoder backends (EMBED_BACKEND).")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="Export EMBED_MODEL to ONNX (fp32 and int8) and check both against torch")
+    export.add_argument("--out", default=ONNX_MODEL_DIR)
+    export.add_argument("--rows", type=int, default=200, help="Row texts per table used for the check")
+    chk = sub.add_parser("check", help="Compare ONNX embeddings with torch")
+    chk.add_argument("--backend", choices=sorted(ONNX_FILES), action="append")
+    chk.add_argument("--dir", default=ONNX_MODEL_DIR)
+    chk.add_argument("--rows", type=int, default=200, help="Row texts per table used for the check")
+    chk.add_argument("--min-similarity", type=float, help="Override the backend's tolerance")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        reference = export_onnx(args.out)
+        ok = check(list(ONNX_FILES), sample_texts(args.rows), reference, model_dir=args.out)
+    else:
+        ok = check(args.backend or list(ONNX_FILES), sample_texts(args.rows), min_similarity=args.min_similarity,
+                   model_dir=args.dir)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
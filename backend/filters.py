@@ -0,0 +1,135 @@
+'''
+Structured pre-filters for vector search, extracted from the question with the compiled team, player and date
+patterns of backend.stats_query:
+- team_ids:   teams named in the question (by full name, nickname, unique city or abbreviation)
+- person_ids: players named in the question (full name, or a last name only one player has)
+- date:       a calendar date, holiday or "M/D in the YYYY season", with the year resolved from the season
+- season:     "the 2023 season", only applied together with one of the above
+
+When any of team_ids, person_ids or date is present, retrieval ranks only the rows that match them, exactly,
+instead of searching every row: games involving the teams on that date, box scores of those players in those games.
+A bare season matches half the data, so on its own it is left to the HNSW index.
+'''
+import re
+import numpy as np
+from sqlalchemy import text
+from backend.stats_query import fold, find_stat, find_season, find_teams, find_players, resolve_date, load_entities
+
+# More teams than a matchup means a list of teams, not a game to filter on
+MAX_FILTER_TEAMS = 2
+NUMBER_PATTERN = re.compile(r"\d+")
+
+
+def extract_filters(question, entities):
+    '''
+    Filters for a question as {"season", "date", "team_ids", "person_ids"}, or None if it names nothing selective.
+    '''
+    folded = fold(question)
+    q = folded.lower()
+    season = find_season(q)
+    try:
+        game_date = resolve_date(q, season)
+    except ValueError:
+        game_date = None
+    team_ids = [int(t["team_id"]) for t, _, _ in find_teams(folded, entities)]
+    if len(team_ids) > MAX_FILTER_TEAMS:
+        team_ids = []
+    person_ids = find_players(folded, entities)
+    if game_date is None and not team_ids and not person_ids:
+        return None
+    return {"season": season, "date": game_date, "team_ids": team_ids, "person_ids": person_ids}
+
+
+def cache_key(question, entities):
+    '''
+    What a question asks about, as a hashable key for the answer cache: (stat, season, date, numbers, team_ids,
+    person_ids). Questions that differ only in a year, team or player embed almost identically but need other answers.
+    '''
+    folded = fold(question)
+    q = folded.lower()
+    season = find_season(q)
+    try:
+        game_date = resolve_date(q, season)
+    except ValueError:
+        game_date = None
+    team_ids = sorted(int(t["team_id"]) for t, _, _ in find_teams(folded, entities))
+    return (find_stat(q), season, game_date, tuple(NUMBER_PATTERN.findall(q)), tuple(team_ids),
+            tuple(sorted(find_players(folded, entities))))
+
+
+def question_filters(cx, question):
+    '''
+    extract_filters() with the name lookups loaded over a connection (cached after the first call).
+    '''
+    return extract_filters(question, load_entities(cx))
+
+
+def question_cache_key(cx, question):
+    '''
+    cache_key() with the name lookups loaded over a connection (cached after the first call).
+    '''
+    return cache_key(question, load_entities(cx))
+
+
+def game_clauses(filters):
+    '''
+    SQL predicates on game_details g, and their parameters, for the game part of the filters (empty if none).
+    '''
+    clauses, params = [], {}
+    if filters["date"] is not None:
+        year, month, day = filters["date"]
+        clauses += ["EXTRACT(MONTH FROM CAST(g.game_timestamp AS timestamp)) = CAST(:f_month AS int)",
+                    "EXTRACT(DAY FROM CAST(g.game_timestamp AS timestamp)) = CAST(:f_day AS int)"]
+        params.update(f_month=month, f_day=day)
+        if year is not None:
+            clauses.append("EXTRACT(YEAR FROM CAST(g.game_timestamp AS timestamp)) = CAST(:f_year AS int)")
+            params["f_year"] = year
+    for i, team_id in enumerate(filters["team_ids"]):
+        clauses.append(f"CAST(:f_team_{i} AS bigint) IN (g.home_team_id, g.away_team_id)")
+        params[f"f_team_{i}"] = team_id
+    if clauses and filters["season"] is not None:
+        clauses.append("g.season = CAST(:f_season AS int)")
+        params["f_season"] = filters["season"]
+    return clauses, params
+
+
+def player_clauses(filters):
+    '''
+    SQL predicates on player_box_scores pbs (joined to game_details g), and their parameters.
+    '''
+    clauses, params = game_clauses(filters)
+    if filters["person_ids"]:
+        clauses.append("pbs.person_id = ANY(CAST(:f_person_ids AS bigint[]))")
+        params["f_person_ids"] = filters["person_ids"]
+    return clauses, params
+
+
+def where(clauses):
+    return ("WHERE " + " AND ".join(clauses) + "\n") if clauses else ""
+
+
+def candidate_rows(keys, game_ids=None, person_ids=None):
+    '''
+    Indices of the key rows ((game_id,) or (person_id, game_id)) that pass the filters, for LocalIndex.search(rows=...).
+    None when nothing is filtered.
+    '''
+    # Game keys have no person column
+    person_ids = person_ids if keys.shape[1] > 1 else None
+    if game_ids is None and not person_ids:
+        return None
+    mask = np.ones(len(keys), dtype=bool)
+    if game_ids is not None:
+        mask &= np.isin(keys[:, -1], np.asarray(game_ids, dtype=np.int64))
+    if person_ids:
+        mask &= np.isin(keys[:, 0], np.asarray(person_ids, dtype=np.int64))
+    return np.flatnonzero(mask)
+
+
+def filtered_game_ids(cx, filters):
+    '''
+    game_ids passing the game part of the filters, or None if it has no game clauses (local backend).
+    '''
+    clauses, params = game_clauses(filters)
+    if not clauses:
+        return None
+    return [int(g) for g in cx.execute(text("SELECT g.game_id FROM game_details g " + where(clauses)), params).scalars()]
@@ -0,0 +1,36 @@
+'''
+Inputs of backend.embed.row_texts_game / row_texts_player built with pandas from whole tables held in memory
+(the bundled CSVs or a snapshot) instead of SQL. Only depends on pandas, so it is safe to import before
+backend.config has read its environment (benchmarks).
+'''
+import pandas as pd
+
+
+def game_frame(tables):
+    '''
+    Build the embed_games input frame from whole tables (same columns as the SQL in backend.embed.embed_games).
+    '''
+    teams = tables["teams"]
+    home = teams.rename(columns={"team_id": "home_team_id", "city": "home_city", "name": "home_team_name", "abbreviation": "home_abbrev"})
+    away = teams.rename(columns={"team_id": "away_team_id", "city": "away_city", "name": "away_team_name", "abbreviation": "away_abbrev"})
+    return (tables["game_details"]
+            .merge(home[["home_team_id", "home_city", "home_team_name", "home_abbrev"]], on="home_team_id")
+            .merge(away[["away_team_id", "away_city", "away_team_name", "away_abbrev"]], on="away_team_id"))
+
+
+def player_frame(tables):
+    '''
+    Build the embed_players input frame from whole tables (same columns as the SQL in backend.embed.embed_players).
+    Box scores without player metadata are dropped, as with the inner join in SQL.
+    '''
+    teams = tables["teams"]
+    games = game_frame(tables)[["game_id", "season", "game_timestamp", "home_team_id", "away_team_id", "home_abbrev", "away_abbrev"]]
+    df = (tables["player_box_scores"]
+          .merge(tables["players"][["player_id", "first_name", "last_name"]], left_on="person_id", right_on="player_id")
+          .merge(games, on="game_id")
+          .merge(teams.rename(columns={"city": "team_city", "name": "team_name", "abbreviation": "team_abbrev"})
+                 [["team_id", "team_city", "team_name", "team_abbrev"]], on="team_id"))
+    df["opp_team_id"] = df["away_team_id"].where(df["team_id"] == df["home_team_id"], df["home_team_id"])
+    df = df.merge(teams.rename(columns={"team_id": "opp_team_id", "city": "opp_city", "name": "opp_name", "abbreviation": "opp_abbrev"})
+                  [["opp_team_id", "opp_city", "opp_name", "opp_abbrev"]], on="opp_team_id")
+    return df.rename(columns={"offensive_reb": "oreb", "defensive_reb": "dreb"})
@@ -1,25 +1,511 @@
+import io
 import os
+import sys
+import time
+import argparse
+import numpy as np
 import pandas as pd
 import sqlalchemy as sa
 from sqlalchemy import text
 from pathlib import Path
-from backend.config import DB_DSN
+from backend.config import DB_DSN, INGEST_CHUNK_SIZE
+from backend.quantize import create_vector_index
+from backend.aggregates import build_aggregates, refresh_aggregates, aggregates_exist, AGGREGATE_TABLES
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 TABLES = ["game_details", "player_box_scores", "players", "teams"]
 DATA_DIR = Path(__file__).resolve().parent / "data"
 
-def main():
-    print('Starting Database Ingestion')
+# Column types, primary keys and secondary indexes used by --mode copy (columns in CSV order)
+SCHEMAS = {
+    "game_details": {
+        "columns": [
+            ("game_id", "bigint"), ("season", "integer"), ("game_timestamp", "timestamp"),
+            ("home_team_id", "bigint"), ("away_team_id", "bigint"), ("home_points", "integer"),
+            ("away_points", "integer"), ("winning_team_id", "bigint"),
+        ],
+        "primary_key": ["game_id"],
+        "indexes": ["season", "home_team_id", "away_team_id"],
+        "foreign_keys": [("home_team_id", "teams"), ("away_team_id", "teams"), ("winning_team_id", "teams")],
+    },
+    "player_box_scores": {
+        "columns": [
+            ("game_id", "bigint"), ("person_id", "bigint"), ("team_id", "bigint"), ("starter", "boolean"),
+            ("seconds", "double precision"), ("points", "integer"), ("fg2_made", "integer"),
+            ("fg2_attempted", "integer"), ("fg3_made", "integer"), ("fg3_attempted", "integer"),
+            ("ft_attempted", "integer"), ("ft_made", "integer"), ("offensive_reb", "integer"),
+            ("defensive_reb", "integer"), ("assists", "integer"), ("steals", "integer"), ("blocks", "integer"),
+            ("turnovers", "integer"), ("defensive_fouls", "integer"), ("offensive_fouls", "integer"),
+        ],
+        # person_id leads the primary key, so lookups by player need no separate index
+        "primary_key": ["person_id", "game_id"],
+        "indexes": ["game_id", "team_id"],
+        # No key on person_id: box scores include players that are missing from players.csv
+        "foreign_keys": [("game_id", "game_details"), ("team_id", "teams")],
+    },
+    "players": {
+        "columns": [
+            ("player_id", "bigint"), ("team_id", "bigint"), ("first_name", "text"), ("last_name", "text"),
+            ("birth_date", "date"), ("height", "integer"), ("weight", "integer"), ("position", "text"),
+            ("draft_year", "integer"), ("season_exp", "integer"),
+        ],
+        "primary_key": ["player_id"],
+        "indexes": ["team_id"],
+        "foreign_keys": [("team_id", "teams")],
+    },
+    "teams": {
+        "columns": [
+            ("team_id", "bigint"), ("city", "text"), ("name", "text"), ("abbreviation", "text"),
+            ("conference", "text"), ("division", "text"),
+        ],
+        "primary_key": ["team_id"],
+        "indexes": [],
+        "foreign_keys": [],
+    },
+}
+
+# Swap mode builds a complete copy of the database here, then moves it into public in one transaction
+STAGING_SCHEMA = "ingest_staging"
+RETIRED_SCHEMA = "ingest_retired"
+
+# Embedding columns kept across ingests (their {column}_hash is cleared on changed rows)
+EMBEDDING_COLUMNS = {"game_details": "game_embedding", "player_box_scores": "player_embedding"}
+
+
+# Column types read as strings; numbers and booleans are left to the fast C parser and checked afterwards
+TEXT_TYPES = ("text", "timestamp", "date")
+BOOLEAN_VALUES = {"true": True, "t": True, "1": True, "false": False, "f": False, "0": False}
+# Postgres integer types as [low, high)
+INTEGER_RANGES = {"integer": (-2**31, 2**31), "bigint": (-2**63, 2**63)}
+
+
+def csv_path(table):
+    return os.path.join(DATA_DIR, f"{table}.csv")
+
+
+def validate_chunk(chunk, table, first_row):
+    '''
+    Check a parsed chunk against the table schema and convert it to the column types;
+    raises ValueError naming the first bad CSV line.
+    Integer columns with blanks become nullable Int64, and timestamps and dates are rewritten as ISO strings.
+    '''
+    schema = SCHEMAS[table]
+    expected = [c for c, _ in schema["columns"]]
+    if list(chunk.columns) != expected:
+        raise ValueError(f"{table}: expected columns {expected}, got {list(chunk.columns)}")
+
+    def fail(mask, problem):
+        line = first_row + int(np.asarray(mask).nonzero()[0][0]) + 2   # 1-based, after the header
+        raise ValueError(f"{table}.csv line {line}: {problem}")
+
+    missing = chunk[schema["primary_key"]].isna().any(axis=1)
+    if missing.any():
+        fail(missing, f"missing primary key {schema['primary_key']}")
+
+    for col, pg_type in schema["columns"]:
+        values = chunk[col]
+        if pg_type in ("timestamp", "date"):
+            parsed = pd.to_datetime(values, errors="coerce", format="ISO8601")
+            bad = parsed.isna() & values.notna()
+            if bad.any():
+                fail(bad, f"invalid {pg_type} in {col}")
+            fmt = "%Y-%m-%d %H:%M:%S.%f" if pg_type == "timestamp" else "%Y-%m-%d"
+            chunk[col] = parsed.dt.strftime(fmt)
+        elif pg_type == "boolean":
+            if values.dtype != bool:
+                parsed = values.astype(str).str.lower().map(BOOLEAN_VALUES)
+                bad = parsed.isna() & values.notna()
+                if bad.any():
+                    fail(bad, f"invalid boolean in {col}")
+                chunk[col] = parsed.astype("boolean")
+        elif pg_type != "text":
+            if not pd.api.types.is_numeric_dtype(values):
+                # Text in a number column, or integers too large for int64 (read as Python ints)
+                parsed = pd.to_numeric(values, errors="coerce")
+                bad = parsed.isna() & values.notna()
+                if bad.any():
+                    fail(bad, f"invalid {pg_type} in {col}")
+                values = parsed
+            if pg_type in INTEGER_RANGES:
+                if values.dtype.kind == "f":
+                    # Blank cells make pandas read an integer column as float
+                    bad = (values % 1 != 0) & values.notna()
+                    if bad.any():
+                        fail(bad, f"non-integer value in {col}")
+                low, high = INTEGER_RANGES[pg_type]
+                bad = ((values < low) | (values >= high)) & values.notna()
+                if bad.any():
+                    fail(bad, f"{pg_type} out of range in {col}")
+                if values.dtype.kind != "i":
+                    chunk[col] = values.astype("Int64")
+            elif values.dtype.kind not in "fi":
+                chunk[col] = values.astype("float64")
+    return chunk
+
+
+def read_chunks(path, table, chunksize=INGEST_CHUNK_SIZE):
+    '''
+    Yield validated DataFrames of at most chunksize rows from a CSV, so memory use does not grow with the file.
+    '''
+    dtype = {c: str for c, t in SCHEMAS[table]["columns"] if t in TEXT_TYPES}
+    first_row = 0
+    for chunk in pd.read_csv(path, dtype=dtype, chunksize=chunksize):
+        yield validate_chunk(chunk, table, first_row)
+        first_row += len(chunk)
+
+
+def copy_chunks(cx, target, cols, chunks):
+    '''
+    COPY DataFrame chunks into a table one chunk at a time. Returns the number of rows copied.
+    '''
+    cur = cx.connection.cursor()
+    rows = 0
+    try:
+        for chunk in chunks:
+            buf = io.StringIO()
+            chunk.to_csv(buf, index=False, header=False)
+            buf.seek(0)
+            cur.copy_expert(f"COPY {target} ({', '.join(cols)}) FROM STDIN WITH (FORMAT csv)", buf)
+            rows += len(chunk)
+    finally:
+        cur.close()
+    return rows
+
+
+def has_primary_key(cx, table):
+    sql = "SELECT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = to_regclass(:t) AND contype = 'p')"
+    return cx.execute(text(sql), {"t": table}).scalar()
+
+
+def create_table(cx, table):
+    '''
+    Create a typed table with its primary key and indexes.
+    Tables left by --mode replace (untyped, no primary key) are converted in place, keeping their embeddings.
+    '''
+    schema = SCHEMAS[table]
+    pk = ", ".join(schema["primary_key"])
+    if cx.execute(text("SELECT to_regclass(:t) IS NULL"), {"t": table}).scalar():
+        cols = ", ".join(f"{c} {t}" for c, t in schema["columns"])
+        cx.execute(text(f"CREATE TABLE {table} ({cols}, PRIMARY KEY ({pk}))"))
+    elif not has_primary_key(cx, table):
+        print(f"  Converting {table} to typed columns")
+        alters = ", ".join(f"ALTER COLUMN {c} TYPE {t} USING {c}::{t}" for c, t in schema["columns"])
+        cx.execute(text(f"ALTER TABLE {table} {alters}"))
+        cx.execute(text(f"ALTER TABLE {table} ADD PRIMARY KEY ({pk})"))
+    for col in schema["indexes"]:
+        cx.execute(text(f"CREATE INDEX IF NOT EXISTS idx_{table}_{col} ON {table} ({col})"))
+
+
+def copy_csv(cx, table, path, chunksize=INGEST_CHUNK_SIZE):
+    '''
+    Stream a CSV into a temporary staging table, validating and COPYing one chunk at a time.
+    Returns (staging table, rows copied). A malformed row aborts the whole load.
+    '''
+    stage = f"stage_{table}"
+    cols = [c for c, _ in SCHEMAS[table]["columns"]]
+    cx.execute(text(f"CREATE TEMP TABLE {stage} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP"))
+    return stage, copy_chunks(cx, stage, cols, read_chunks(path, table, chunksize))
+
+
+def has_column(cx, table, column):
+    sql = """
+        SELECT EXISTS (SELECT 1 FROM information_schema.columns
+                       WHERE table_schema = 'public' AND table_name = :t AND column_name = :c)
+    """
+    return cx.execute(text(sql), {"t": table, "c": column}).scalar()
+
+
+def upsert(cx, table, stage):
+    '''
+    Merge a staging table into its target: insert new rows, update changed ones, delete rows missing from the CSV.
+    Embeddings are never written, so unchanged rows keep them. Changed rows have their content hash cleared,
+    which invalidates cached answers built from them (server.deps_unchanged) and makes embed.py re-embed them.
+    Returns (changed keys, deleted keys), each the game_id (or first primary key column) of the affected rows.
+    '''
+    schema = SCHEMAS[table]
+    pk = schema["primary_key"]
+    cols = [c for c, _ in schema["columns"]]
+    updates = [c for c in cols if c not in pk]
+    key = "game_id" if "game_id" in cols else pk[0]
+    sets = [f"{c} = EXCLUDED.{c}" for c in updates]
+    if table in EMBEDDING_COLUMNS and has_column(cx, table, f"{EMBEDDING_COLUMNS[table]}_hash"):
+        sets.append(f"{EMBEDDING_COLUMNS[table]}_hash = NULL")
+
+    insert = f"""
+        INSERT INTO {table} ({", ".join(cols)})
+        SELECT DISTINCT ON ({", ".join(pk)}) {", ".join(cols)} FROM {stage}
+        ON CONFLICT ({", ".join(pk)}) DO UPDATE SET {", ".join(sets)}
+        WHERE ({", ".join(f"{table}.{c}" for c in updates)}) IS DISTINCT FROM ({", ".join(f"EXCLUDED.{c}" for c in updates)})
+        RETURNING {key}
+    """
+    changed = cx.execute(text(insert)).scalars().all()
+
+    delete = f"""
+        DELETE FROM {table} x
+        WHERE NOT EXISTS (SELECT 1 FROM {stage} s WHERE {" AND ".join(f"s.{c} = x.{c}" for c in pk)})
+        RETURNING {key}
+    """
+    deleted = cx.execute(text(delete)).scalars().all()
+    return changed, deleted
+
+
+def previous_seasons(cx, stage):
+    '''
+    Seasons of games that are about to move to another season or be deleted, so their aggregates are refreshed too.
+    '''
+    sql = f"""
+        SELECT DISTINCT g.season FROM game_details g
+        LEFT JOIN {stage} s ON s.game_id = g.game_id
+        WHERE s.game_id IS NULL OR s.season IS DISTINCT FROM g.season
+    """
+    return {int(s) for s in cx.execute(text(sql)).scalars()}
+
+
+def ingest_copy(cx, chunksize=INGEST_CHUNK_SIZE):
+    '''
+    Load every CSV with COPY and merge it into typed tables. Returns (touched game_ids, touched seasons).
+    '''
+    game_ids, seasons = set(), set()
+    report = []
+    for t in TABLES:
+        start = time.perf_counter()
+        create_table(cx, t)
+        stage, rows = copy_csv(cx, t, csv_path(t), chunksize)
+        copied = time.perf_counter()
+        if t == "game_details":
+            seasons |= previous_seasons(cx, stage)
+        changed, deleted = upsert(cx, t, stage)
+        if t in ("game_details", "player_box_scores"):
+            game_ids |= {int(g) for g in changed + deleted}
+        done = time.perf_counter()
+        report.append((t, rows, len(changed), len(deleted), copied - start, done - copied))
+
+    if game_ids:
+        sql = "SELECT DISTINCT season FROM game_details WHERE game_id = ANY(:ids)"
+        seasons |= {int(s) for s in cx.execute(text(sql), {"ids": sorted(game_ids)}).scalars()}
+
+    print(f"  {'table':<18} {'rows':>8} {'changed':>8} {'deleted':>8} {'copy':>8} {'merge':>8} {'rows/s':>10}")
+    for t, rows, changed, deleted, copy_s, merge_s in report:
+        total = copy_s + merge_s
+        print(f"  {t:<18} {rows:>8} {changed:>8} {deleted:>8} {copy_s:>7.2f}s {merge_s:>7.2f}s {rows / total:>10,.0f}")
+    return game_ids, seasons
+
+
+def parents(table):
+    return {parent for _, parent in SCHEMAS[table]["foreign_keys"]}
+
+
+def carry_embeddings(cx, table):
+    '''
+    Copy embeddings and full-text search terms from the live table into the staged one, matching on primary key,
+    then build the HNSW and GIN indexes. Content hashes are only carried for rows whose columns are unchanged:
+    changed rows get a NULL hash, which invalidates cached answers built from them and makes embed.py re-embed them.
+    '''
+    column = EMBEDDING_COLUMNS[table]
+    if not has_column(cx, table, column):
+        return 0
+    has_terms = has_column(cx, table, f"{column}_terms")
+    staged = f"{STAGING_SCHEMA}.{table}"
+    cx.execute(text(f"ALTER TABLE {staged} ADD COLUMN {column} vector(768), ADD COLUMN {column}_hash text, "
+                    f"ADD COLUMN {column}_terms tsvector"))
+    pk = SCHEMAS[table]["primary_key"]
+    match = " AND ".join(f"s.{c} = live.{c}" for c in pk)
+    others = [c for c, _ in SCHEMAS[table]["columns"] if c not in pk]
+    unchanged = f"({', '.join(f's.{c}' for c in others)}) IS NOT DISTINCT FROM ({', '.join(f'live.{c}' for c in others)})"
+    terms = f", {column}_terms = live.{column}_terms" if has_terms else ""
+    carried = cx.execute(text(f"""
+        UPDATE {staged} s SET {column} = live.{column},
+            {column}_hash = CASE WHEN {unchanged} THEN live.{column}_hash END{terms}
+        FROM public.{table} live
+        WHERE {match} AND live.{column} IS NOT NULL
+    """)).rowcount
+    create_vector_index(cx, table, column, staged)
+    cx.execute(text(f"CREATE INDEX IF NOT EXISTS idx_{table}_{column}_terms ON {staged} USING gin ({column}_terms)"))
+    return carried
+
+
+def load_staged_table(eng, table, chunksize):
+    '''
+    Load one CSV into a bare table in the staging schema on its own connection, then add its primary key,
+    foreign keys (its parents are already loaded) and indexes, and carry over embeddings.
+    Returns per-table timings.
+    '''
+    schema = SCHEMAS[table]
+    staged = f"{STAGING_SCHEMA}.{table}"
+    cols = [c for c, _ in schema["columns"]]
+    start = time.perf_counter()
+    with eng.begin() as cx:
+        cx.execute(text(f"CREATE TABLE {staged} ({', '.join(f'{c} {t}' for c, t in schema['columns'])})"))
+        rows = copy_chunks(cx, staged, cols, read_chunks(csv_path(table), table, chunksize))
+        loaded = time.perf_counter()
+
+        # Indexes and constraints are built once over the full table rather than maintained row by row
+        cx.execute(text(f"ALTER TABLE {staged} ADD PRIMARY KEY ({', '.join(schema['primary_key'])})"))
+        for col, parent in schema["foreign_keys"]:
+            pk = SCHEMAS[parent]["primary_key"][0]
+            cx.execute(text(f"ALTER TABLE {staged} ADD FOREIGN KEY ({col}) REFERENCES {STAGING_SCHEMA}.{parent} ({pk})"))
+        for col in schema["indexes"]:
+            cx.execute(text(f"CREATE INDEX idx_{table}_{col} ON {staged} ({col})"))
+        indexed = time.perf_counter()
+
+        carried = carry_embeddings(cx, table) if table in EMBEDDING_COLUMNS else 0
+    return {"table": table, "rows": rows, "load": loaded - start, "index": indexed - loaded,
+            "embeddings": carried, "carry": time.perf_counter() - indexed}
+
+
+def load_staging(eng, chunksize, workers):
+    '''
+    Load every table into the staging schema, running tables concurrently as soon as their parents are loaded.
+    '''
+    report, done, running = [], set(), {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest") as pool:
+        while len(done) < len(TABLES):
+            for t in TABLES:
+                if t not in done and t not in running.values() and parents(t) <= done:
+                    running[pool.submit(load_staged_table, eng, t, chunksize)] = t
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                report.append(future.result())
+                done.add(running.pop(future))
+    return report
+
+
+def swap_staging(cx):
+    '''
+    Replace the live tables with the staged ones in a single transaction; readers see either the old or the new data.
+    '''
+    tables = TABLES + AGGREGATE_TABLES
+    cx.execute(text(f"DROP SCHEMA IF EXISTS {RETIRED_SCHEMA} CASCADE"))
+    cx.execute(text(f"CREATE SCHEMA {RETIRED_SCHEMA}"))
+    for t in tables:
+        cx.execute(text(f"ALTER TABLE IF EXISTS public.{t} SET SCHEMA {RETIRED_SCHEMA}"))
+    for t in tables:
+        cx.execute(text(f"ALTER TABLE {STAGING_SCHEMA}.{t} SET SCHEMA public"))
+    cx.execute(text(f"DROP SCHEMA {RETIRED_SCHEMA} CASCADE"))
+    cx.execute(text(f"DROP SCHEMA {STAGING_SCHEMA} CASCADE"))
+
+
+def ingest_swap(chunksize=INGEST_CHUNK_SIZE, workers=len(TABLES)):
+    '''
+    Build a complete new copy of every table and aggregate in a staging schema, loading independent tables in
+    parallel, then swap it in atomically. The live tables stay untouched and queryable until the swap.
+    '''
+    eng = sa.create_engine(DB_DSN, pool_size=workers, max_overflow=1)
+    with eng.begin() as cx:
+        # Ensure pgvector extension is available for the `vector` type used to store embeddings
+        cx.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        cx.execute(text(f"DROP SCHEMA IF EXISTS {STAGING_SCHEMA} CASCADE"))
+        cx.execute(text(f"CREATE SCHEMA {STAGING_SCHEMA}"))
+
+    start = time.perf_counter()
+    try:
+        report = load_staging(eng, chunksize, workers)
+        loaded = time.perf_counter()
+
+        with eng.begin() as cx:
+            cx.execute(text(f"SET LOCAL search_path TO {STAGING_SCHEMA}, public"))
+            build_aggregates(cx, STAGING_SCHEMA)
+            cx.execute(text("SET LOCAL search_path TO public"))
+            swap_staging(cx)
+    except Exception:
+        with eng.begin() as cx:
+            cx.execute(text(f"DROP SCHEMA IF EXISTS {STAGING_SCHEMA} CASCADE"))
+        raise
+
+    print(f"  {'table':<18} {'rows':>8} {'load':>8} {'index':>8} {'embeds':>8} {'carry':>8}")
+    for r in sorted(report, key=lambda r: TABLES.index(r["table"])):
+        print(f"  {r['table']:<18} {r['rows']:>8} {r['load']:>7.2f}s {r['index']:>7.2f}s {r['embeddings']:>8} {r['carry']:>7.2f}s")
+    serial = sum(r["load"] + r["index"] + r["carry"] for r in report)
+    print(f"  Tables loaded in {loaded - start:.2f}s ({serial:.2f}s of table work across {workers} connections), "
+          f"swapped in after {time.perf_counter() - start:.2f}s")
+
+
+def changed_game_ids(cx, table, df):
+    '''
+    game_ids whose rows were added, removed or modified between the current table and the new CSV frame.
+    '''
+    cols = ", ".join(df.columns)
+    old = pd.read_sql(text(f"SELECT {cols} FROM {table}"), cx)
+    # Typed tables (swap and copy modes) return timestamps, which never equal the CSV's strings
+    df = df.assign(**{c: pd.to_datetime(df[c]) for c in old.columns if pd.api.types.is_datetime64_any_dtype(old[c])})
+    old = old.astype(df.dtypes.to_dict(), errors="ignore")
+    diff = pd.concat([old, df], ignore_index=True).drop_duplicates(keep=False)
+    return set(diff["game_id"].astype("int64").tolist())
+
+
+def touched_games(cx, frames):
+    '''
+    (game_ids, seasons) affected by the new CSVs.
+    Seasons come from both the old and new game rows, so games moved between seasons refresh both.
+    '''
+    game_ids = changed_game_ids(cx, "game_details", frames["game_details"])
+    game_ids |= changed_game_ids(cx, "player_box_scores", frames["player_box_scores"])
+
+    games = frames["game_details"]
+    seasons = set(games.loc[games["game_id"].isin(game_ids), "season"].astype("int64").tolist())
+    old = cx.execute(text("SELECT DISTINCT season FROM game_details WHERE game_id = ANY(:ids)"), {"ids": sorted(game_ids)})
+    seasons |= {int(s) for s in old.scalars()}
+    return game_ids, seasons
+
+
+def ingest_replace(cx, diff):
+    '''
+    Original ingestion: read each CSV with pandas and replace the table (drops embeddings and indexes).
+    Returns (touched game_ids, touched seasons) when diff is set, else None.
+    '''
+    frames = {t: pd.read_csv(csv_path(t)) for t in TABLES}
+    touched = touched_games(cx, frames) if diff else None
+    for t in TABLES:
+        start = time.perf_counter()
+        frames[t].to_sql(t, cx, if_exists="replace", index=False, method="multi", chunksize=5000)
+        print(f"  {t:<18} {len(frames[t]):>8} rows {time.perf_counter() - start:>7.2f}s")
+    # Lookup indexes for the structured stat queries in backend.stats_query
+    cx.execute(text("CREATE INDEX IF NOT EXISTS idx_player_box_scores_game_id ON player_box_scores (game_id)"))
+    cx.execute(text("CREATE INDEX IF NOT EXISTS idx_player_box_scores_person_id ON player_box_scores (person_id)"))
+    cx.execute(text("CREATE INDEX IF NOT EXISTS idx_game_details_season ON game_details (season)"))
+    return touched
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load the CSVs into Postgres and refresh the aggregate tables.")
+    parser.add_argument("--mode", choices=["swap", "copy", "replace"], default="swap",
+                        help="swap: load a staging schema in parallel and swap it in atomically (default; "
+                             "it was replace before, see the README); "
+                             "copy: COPY and upsert into the live tables in place; "
+                             "replace: recreate every table with pandas to_sql. All but replace keep embeddings")
+    parser.add_argument("--chunk-size", type=int, default=INGEST_CHUNK_SIZE,
+                        help="CSV rows validated and copied at a time in swap and copy modes (bounds memory)")
+    parser.add_argument("--workers", type=int, default=len(TABLES),
+                        help="Tables loaded concurrently in swap mode, each on its own connection")
+    parser.add_argument("--rebuild-aggregates", action="store_true",
+                        help="Rebuild every aggregate table instead of refreshing the games and seasons that changed")
+    args = parser.parse_args(argv)
+
+    print(f'Starting Database Ingestion ({args.mode})')
+    start = time.perf_counter()
+    if args.mode == "swap":
+        # Aggregates are always rebuilt in full alongside the staged tables
+        ingest_swap(args.chunk_size, max(args.workers, 1))
+        print(f'Finished Database Ingestion in {time.perf_counter() - start:.2f}s')
+        return
+
     eng = sa.create_engine(DB_DSN)
     with eng.begin() as cx:
         # Ensure pgvector extension is available for the `vector` type used to store embeddings
         cx.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
-        for t in TABLES:
-            path = os.path.join(DATA_DIR, f"{t}.csv")
-            df = pd.read_csv(path)
-            df.to_sql(t, cx, if_exists="replace", index=False, method="multi", chunksize=5000)
-    print('Finished Database Ingestion')
+        incremental = not args.rebuild_aggregates and aggregates_exist(cx)
+
+        if args.mode == "copy":
+            touched = ingest_copy(cx, args.chunk_size)
+        else:
+            touched = ingest_replace(cx, incremental)
+
+        if incremental:
+            refresh_aggregates(cx, *touched)
+        else:
+            build_aggregates(cx)
+    print(f'Finished Database Ingestion in {time.perf_counter() - start:.2f}s')
 
 
 if __name__ == "__main__":
-    main()
+    main(sys.argv[1:])
@@ -0,0 +1,17 @@
+'''
+Latency summaries shared by backend.quantize's report and the benchmarks. Imports nothing from backend.config,
+so benchmark scripts can set configuration environment variables after importing it.
+'''
+
+
+def percentile(values, p):
+    '''
+    p-th percentile (0-100) of a list of numbers, linear interpolation; 0.0 for an empty list.
+    '''
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * p / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo)
@@ -0,0 +1,187 @@
+'''
+Full-text side of hybrid retrieval (HYBRID_RETRIEVAL): exact names, dates and abbreviations in the question are
+matched against the same row texts that are embedded (backend.embed.row_texts_*), and the resulting ranking is
+merged with the vector ranking by weighted reciprocal rank fusion:
+
+    score(row) = HYBRID_WEIGHT_VECTOR / (HYBRID_RRF_K + vector rank) + HYBRID_WEIGHT_LEXICAL / (HYBRID_RRF_K + text rank)
+
+- pgvector: backend.embed stores tokenize() of each row text as a tsvector ({embedding column}_terms, GIN indexed)
+  and fused_cte() ranks and fuses both sides inside the retrieval query
+- local: the text ranking comes from the same column (lexical_sql()), fused in-process with fuse()
+- snapshot: LexicalIndex, an in-process BM25 index over the row texts rebuilt from the snapshot tables
+'''
+import re
+import numpy as np
+from backend.config import (HYBRID_K_VECTOR, HYBRID_K_LEXICAL, HYBRID_WEIGHT_VECTOR, HYBRID_WEIGHT_LEXICAL,
+                            HYBRID_RRF_K)
+from backend.vector_store import EMBEDDED_TABLES
+from backend.stats_query import fold
+from backend.quantize import nearest_sql
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Question words that would otherwise match every row text
+STOPWORDS = frozenset("""
+a an and are as at be by did do does for from game games had has have how in is it many much of on or played
+the their them they this to vs versus was were what when where which who whom with
+""".split())
+
+
+def tokenize(s):
+    '''
+    Lowercased ASCII words and numbers of s, without stopwords. Numbers lose leading zeros so "01/30" matches "1/30".
+    '''
+    tokens = []
+    for tok in TOKEN_RE.findall(fold(s).lower()):
+        if tok in STOPWORDS:
+            continue
+        tokens.append((tok.lstrip("0") or "0") if tok.isdigit() else tok)
+    return tokens
+
+
+def search_terms(texts):
+    '''
+    Space-joined tokens of each row text, stored with to_tsvector('simple', ...) so Postgres sees the same tokens.
+    '''
+    return [" ".join(tokenize(t)) for t in texts]
+
+
+def tsquery(question):
+    '''
+    to_tsquery('simple', ...) text matching rows that share any token with the question.
+    '''
+    return " | ".join(sorted(set(tokenize(question))))
+
+
+def fuse(rankings, weights, k=HYBRID_RRF_K):
+    '''
+    Weighted reciprocal rank fusion of rankings (lists of keys, best first).
+    Returns [(key, fused score), ...], best first.
+    '''
+    scores = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, key in enumerate(ranking, 1):
+            scores[key] = scores.get(key, 0.0) + weight / (k + rank)
+    return sorted(scores.items(), key=lambda kv: -kv[1])
+
+
+def hybrid_params(question):
+    return {"terms": tsquery(question), "k_vector": HYBRID_K_VECTOR, "k_lexical": HYBRID_K_LEXICAL,
+            "w_vector": HYBRID_WEIGHT_VECTOR, "w_lexical": HYBRID_WEIGHT_LEXICAL, "rrf_k": HYBRID_RRF_K}
+
+
+def fused_cte(name, vector="CAST(:q AS vector)"):
+    '''
+    WITH-clause entries ranking one embedded table (see backend.vector_store.EMBEDDED_TABLES) by vector distance
+    and by full-text rank, then fusing them into {name}_fused (key columns, score).
+    Parameters: hybrid_params() and backend.quantize.rerank_params(). The vector side is nearest_sql(), so it is
+    still served by the HNSW index.
+    '''
+    table, column, key_cols = EMBEDDED_TABLES[name]
+    keys = ", ".join(key_cols)
+    return f"""
+{name}_vector AS (
+    SELECT {keys}, ROW_NUMBER() OVER (ORDER BY distance) AS rank
+    FROM ({nearest_sql(name, vector, ":k_vector")}) nearest
+),
+{name}_lexical AS (
+    SELECT {keys}, ROW_NUMBER() OVER (ORDER BY ts_rank_cd({column}_terms, query) DESC) AS rank
+    FROM {table}, to_tsquery('simple', CAST(:terms AS text)) query
+    WHERE {column}_terms @@ query
+    ORDER BY rank
+    LIMIT :k_lexical
+),
+{name}_fused AS (
+    SELECT {keys},
+        COALESCE(CAST(:w_vector AS float8) / (CAST(:rrf_k AS int) + v.rank), 0)
+        + COALESCE(CAST(:w_lexical AS float8) / (CAST(:rrf_k AS int) + l.rank), 0) AS score
+    FROM {name}_vector v FULL JOIN {name}_lexical l USING ({keys})
+)"""
+
+
+def lexical_sql(name):
+    '''
+    Primary keys of one embedded table ranked by full-text match, best first (local backend).
+    Parameters: terms, k_lexical.
+    '''
+    table, column, key_cols = EMBEDDED_TABLES[name]
+    return f"""
+    SELECT {", ".join(key_cols)}
+    FROM {table}, to_tsquery('simple', CAST(:terms AS text)) query
+    WHERE {column}_terms @@ query
+    ORDER BY ts_rank_cd({column}_terms, query) DESC
+    LIMIT :k_lexical
+    """
+
+
+class LexicalIndex:
+    '''
+    BM25 over tokenize()d documents, stored as postings sorted by term: docs[indptr[t]:indptr[t + 1]] are the
+    documents containing term t and weights[...] their precomputed BM25 term weights, so a query only sums
+    the postings of its own terms. Document i is row i of the LocalIndex it sits next to.
+    '''
+
+    def __init__(self, texts, k1=1.2, b=0.75):
+        self.vocab = {}
+        term_ids, doc_ids = [], []
+        lengths = np.zeros(len(texts), dtype=np.float32)
+        for d, t in enumerate(texts):
+            tokens = tokenize(t) if t else []
+            lengths[d] = len(tokens)
+            for tok in tokens:
+                term_ids.append(self.vocab.setdefault(tok, len(self.vocab)))
+                doc_ids.append(d)
+        n = max(len(texts), 1)
+        pairs, tf = np.unique(np.asarray(term_ids, dtype=np.int64) * n + np.asarray(doc_ids, dtype=np.int64),
+                              return_counts=True)
+        terms = pairs // n
+        self.docs = pairs % n
+        self.indptr = np.searchsorted(terms, np.arange(len(self.vocab) + 1))
+        df = np.diff(self.indptr)
+        idf = np.log(1 + (len(texts) - df + 0.5) / (df + 0.5))
+        norm = k1 * (1 - b + b * lengths[self.docs] / max(lengths.mean() if len(texts) else 0, 1e-9))
+        self.weights = (idf[terms] * tf * (k1 + 1) / (tf + norm)).astype(np.float32)
+        self.size = len(texts)
+
+    def __len__(self):
+        return self.size
+
+    def search(self, query, k, rows=None):
+        '''
+        Return (row indices, BM25 scores) of the k best matching rows with a non-zero score, best first.
+        rows restricts the search to those row indices, as in LocalIndex.search().
+        '''
+        scores = np.zeros(self.size, dtype=np.float32)
+        for tok in set(tokenize(query)):
+            t = self.vocab.get(tok)
+            if t is not None:
+                start, end = self.indptr[t], self.indptr[t + 1]
+                # A term appears once per document in its postings, so plain fancy-index addition is safe
+                scores[self.docs[start:end]] += self.weights[start:end]
+        candidates = np.flatnonzero(scores) if rows is None else rows[scores[rows] > 0]
+        k = min(k, len(candidates))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        top = np.argpartition(-scores[candidates], k - 1)[:k]
+        top = candidates[top[np.argsort(-scores[candidates][top], kind="stable")]]
+        return top, scores[top]
+
+
+def hybrid_search(index, lexical, qvec, question, k, rows=None):
+    '''
+    Fused top-k of a LocalIndex and its LexicalIndex: (row indices, fused scores), best first.
+    '''
+    vector_idx, _ = index.search(qvec, HYBRID_K_VECTOR, rows)
+    lexical_idx, _ = lexical.search(question, HYBRID_K_LEXICAL, rows)
+    fused = fuse([vector_idx.tolist(), lexical_idx.tolist()], [HYBRID_WEIGHT_VECTOR, HYBRID_WEIGHT_LEXICAL])[:k]
+    return (np.array([i for i, _ in fused], dtype=np.int64),
+            np.array([s for _, s in fused], dtype=np.float32))
+
+
+def hybrid_keys(index, qvec, lexical_keys, k):
+    '''
+    Fused top-k of a LocalIndex's vector ranking and a full-text ranking of primary keys (from lexical_sql()),
+    as [(key tuple, fused score), ...] like LocalIndex.search_keys().
+    '''
+    vector_keys = [key for key, _ in index.search_keys(qvec, HYBRID_K_VECTOR)]
+    return fuse([vector_keys, lexical_keys], [HYBRID_WEIGHT_VECTOR, HYBRID_WEIGHT_LEXICAL])[:k]
@@ -0,0 +1,236 @@
+'''
+Per-stage latency instrumentation for the chat pipeline, with no extra dependencies:
+- stage(name) times one pipeline stage into the nba_chat_stage_seconds histogram
+- trace(name) wraps a request; its stages become child spans, and with TRACE_FILE set the finished trace is
+  appended to that file as one OTLP/JSON line (readable by the OpenTelemetry collector's otlpjsonfile receiver)
+- render() produces the Prometheus text exposition format served at /metrics
+'''
+import os
+import json
+import asyncio
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from backend.config import TRACE_FILE, TRACE_SERVICE_NAME
+
+# Seconds; covers cache hits (sub-millisecond) through slow LLM calls
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    '''
+    Cumulative-bucket histogram keyed by a tuple of label values, as in the Prometheus data model.
+    '''
+
+    def __init__(self, name, help, labels, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, series in sorted(self._series.items()):
+                labels = ",".join(f'{k}="{v}"' for k, v in zip(self.labels, label_values))
+                sep = "," if labels else ""
+                for bound, count in zip(self.buckets, series["counts"]):
+                    lines.append(f'{self.name}_bucket{{{labels}{sep}le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{labels}{sep}le="+Inf"}} {series["count"]}')
+                lines.append(f"{self.name}_sum{{{labels}}} {series['sum']:.6f}")
+                lines.append(f"{self.name}_count{{{labels}}} {series['count']}")
+        return lines
+
+
+STAGE_SECONDS = Histogram("nba_chat_stage_seconds", "Time spent in each chat pipeline stage.", ("endpoint", "stage"))
+REQUEST_SECONDS = Histogram("nba_chat_request_seconds", "End-to-end chat request time by how it was answered.",
+                            ("endpoint", "outcome"))
+
+
+class Span:
+    '''
+    One timed operation in a trace, with OpenTelemetry-style ids and attributes.
+    '''
+
+    def __init__(self, name, trace, parent=None):
+        self.name = name
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent is not None else None
+        self.attributes = {}
+        self.error = None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self._start = time.perf_counter()
+        self.seconds = None
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def elapsed(self):
+        return time.perf_counter() - self._start
+
+    def end(self):
+        self.end_ns = time.time_ns()
+        self.seconds = time.perf_counter() - self._start
+
+    def otlp(self):
+        span = {
+            "traceId": self.trace.trace_id, "spanId": self.span_id, "name": self.name, "kind": 1,
+            "startTimeUnixNano": str(self.start_ns), "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": k, "value": otlp_value(v)} for k, v in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class Trace:
+    def __init__(self, endpoint):
+        self.trace_id = os.urandom(16).hex()
+        self.endpoint = endpoint
+        self.spans = []
+
+
+def otlp_value(v):
+    if isinstance(v, bool):
+        return {"boolValue": v}
+    if isinstance(v, int):
+        return {"intValue": str(v)}
+    if isinstance(v, float):
+        return {"doubleValue": v}
+    return {"stringValue": str(v)}
+
+
+_current = contextvars.ContextVar("nba_chat_span", default=None)
+_trace_lock = threading.Lock()
+
+
+def export_trace(trace):
+    '''
+    Append a finished trace to TRACE_FILE as one OTLP/JSON ExportTraceServiceRequest line.
+    '''
+    if not TRACE_FILE:
+        return
+    payload = {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": TRACE_SERVICE_NAME}}]},
+        "scopeSpans": [{"scope": {"name": "backend.metrics"}, "spans": [s.otlp() for s in trace.spans]}],
+    }]}
+    line = json.dumps(payload, separators=(",", ":")) + "\n"
+    with _trace_lock, open(TRACE_FILE, "a", encoding="utf-8") as f:
+        f.write(line)
+
+
+@contextmanager
+def trace(endpoint):
+    '''
+    Root span for one request. Set span.set("outcome", ...) to label the request histogram
+    (defaults to "error" if the body raises, "disconnected" if it is closed or cancelled before it finishes, as a
+    streaming response is when the client goes away, else "ok").
+    '''
+    root = Span(endpoint, Trace(endpoint))
+    token = _current.set(root)
+    try:
+        yield root
+    except (GeneratorExit, asyncio.CancelledError):
+        root.attributes["outcome"] = "disconnected"
+        raise
+    except BaseException as e:
+        root.error = type(e).__name__
+        raise
+    finally:
+        _current.reset(token)
+        root.end()
+        root.trace.spans.append(root)
+        outcome = "error" if root.error else root.attributes.get("outcome", "ok")
+        REQUEST_SECONDS.observe(root.seconds, endpoint, outcome)
+        export_trace(root.trace)
+
+
+@contextmanager
+def stage(name, **attributes):
+    '''
+    Time one pipeline stage. Inside trace() it is also recorded as a child span of the request.
+    '''
+    parent = _current.get()
+    if parent is None:
+        start = time.perf_counter()
+        try:
+            yield None
+        finally:
+            STAGE_SECONDS.observe(time.perf_counter() - start, "", name)
+        return
+
+    span = Span(name, parent.trace, parent)
+    span.attributes.update(attributes)
+    token = _current.set(span)
+    try:
+        yield span
+    except (GeneratorExit, asyncio.CancelledError):
+        raise
+    except BaseException as e:
+        span.error = type(e).__name__
+        raise
+    finally:
+        _current.reset(token)
+        span.end()
+        parent.trace.spans.append(span)
+        STAGE_SECONDS.observe(span.seconds, parent.trace.endpoint, name)
+
+
+async def in_own_context(agen):
+    '''
+    Iterate the async generator agen (a streaming response body) with every step run as a task in one context of its
+    own. The trace() and stage() spans it holds open across yields then set and reset the current span in that
+    context, instead of leaking it into the server's task between chunks and resetting it from another context when
+    a disconnected client's generator is finalized.
+    '''
+    context = contextvars.copy_context()
+
+    async def step(awaitable):
+        return await awaitable
+
+    try:
+        while True:
+            try:
+                item = await asyncio.create_task(step(agen.__anext__()), context=context)
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        await asyncio.create_task(step(agen.aclose()), context=context)
+
+
+def observe(name, seconds):
+    '''
+    Record a duration measured by the caller (e.g. time to first streamed token) as a stage of the current request.
+    Returns seconds.
+    '''
+    current = _current.get()
+    STAGE_SECONDS.observe(seconds, current.trace.endpoint if current is not None else "", name)
+    return seconds
+
+
+def render(gauges=None):
+    '''
+    Prometheus text exposition of the histograms plus any {name: (help, value)} gauges.
+    '''
+    lines = STAGE_SECONDS.render() + REQUEST_SECONDS.render()
+    for name, (help, value) in (gauges or {}).items():
+        lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
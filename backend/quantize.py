@@ -0,0 +1,209 @@
+'''
+Quantized first-pass vector search with exact re-ranking (VECTOR_QUANTIZATION).
+
+The vector(768) columns stay the source of truth; what changes is the HNSW index the nearest neighbour search walks:
+- halfvec: HNSW over embedding::halfvec(768), half the size of the float32 index
+- binary:  HNSW over binary_quantize(embedding)::bit(768) with Hamming distance, 1/32 of the vector data
+The first pass returns QUANTIZED_RERANK candidates, which nearest_sql() re-ranks by exact cosine distance over the
+full-precision column, so the rows come back in the same order as before and only recall is traded for size.
+The local and snapshot backends quantize in-process instead (int8 or binary codes, see backend.vector_store).
+
+Usage:
+    python -m backend.quantize build [--method halfvec|binary] [--drop-full]   # create the quantized indexes
+    python -m backend.quantize report [--queries N] [--k K] [--keep]           # size, build time, latency, recall
+'''
+import sys
+import time
+import argparse
+import numpy as np
+import sqlalchemy as sa
+from sqlalchemy import text, event
+from backend.config import DB_DSN, VECTOR_QUANTIZATION, QUANTIZED_RERANK
+from backend.latency import percentile
+from backend.vector_store import EMBEDDED_TABLES
+
+DIM = 768
+# halfvec, bit and binary_quantize() arrived in pgvector 0.7.0
+PG_QUANTIZATION_MIN_VERSION = (0, 7, 0)
+
+# Index expression, operator class and first-pass distance of each pgvector quantization
+PG_QUANTIZATIONS = {
+    "halfvec": {
+        "expr": "({column}::halfvec({dim}))",
+        "ops": "halfvec_cosine_ops",
+        "distance": "{column}::halfvec({dim}) <=> CAST({q} AS halfvec({dim}))",
+    },
+    "binary": {
+        "expr": "(binary_quantize({column})::bit({dim}))",
+        "ops": "bit_hamming_ops",
+        "distance": "binary_quantize({column})::bit({dim}) <~> binary_quantize({q})",
+    },
+}
+
+
+def rerank_params():
+    return {"k_rerank": QUANTIZED_RERANK}
+
+
+def nearest_sql(name, vector="CAST(:q AS vector)", limit=":k", method=VECTOR_QUANTIZATION):
+    '''
+    SELECT of the key columns and exact cosine distance of the `limit` rows of an embedded table
+    (backend.vector_store.EMBEDDED_TABLES) nearest to `vector`, served by the HNSW index of create_vector_index().
+    With a pgvector quantization the quantized index picks max(:k_rerank, limit) candidates that are re-ranked exactly.
+    '''
+    table, column, key_cols = EMBEDDED_TABLES[name]
+    keys = ", ".join(key_cols)
+    exact = f"{column} <=> {vector}"
+    if method not in PG_QUANTIZATIONS:
+        return f"SELECT {keys}, {exact} AS distance FROM {table} ORDER BY {exact} LIMIT {limit}"
+    first_pass = PG_QUANTIZATIONS[method]["distance"].format(column=column, q=vector, dim=DIM)
+    return f"""SELECT {keys}, {exact} AS distance
+        FROM (SELECT {keys}, {column} FROM {table}
+              ORDER BY {first_pass} LIMIT GREATEST(CAST(:k_rerank AS int), {limit})) candidates
+        ORDER BY {exact} LIMIT {limit}"""
+
+
+def index_sql(table, column, method, relation=None, name=None):
+    if method in PG_QUANTIZATIONS:
+        q = PG_QUANTIZATIONS[method]
+        name = name or f"idx_{table}_{column}_{method}"
+        return (f"CREATE INDEX IF NOT EXISTS {name} ON {relation or table} "
+                f"USING hnsw ({q['expr'].format(column=column, dim=DIM)} {q['ops']})")
+    name = name or f"idx_{table}_{column}"
+    return f"CREATE INDEX IF NOT EXISTS {name} ON {relation or table} USING hnsw ({column} vector_cosine_ops)"
+
+
+def pgvector_version(cx):
+    version = cx.execute(text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")).scalar()
+    return tuple(int(part) for part in version.split(".")) if version else None
+
+
+def check_pgvector(cx, method):
+    '''
+    Raise if the database's pgvector is too old for a pgvector quantization `method` (the error would otherwise be
+    an unknown type or function halfway through an index build).
+    '''
+    if method not in PG_QUANTIZATIONS:
+        return
+    version = pgvector_version(cx)
+    if version is None or version < PG_QUANTIZATION_MIN_VERSION:
+        found = ".".join(map(str, version)) if version else "not installed"
+        need = ".".join(map(str, PG_QUANTIZATION_MIN_VERSION))
+        raise RuntimeError(f"VECTOR_QUANTIZATION={method} needs pgvector >= {need} (found {found}); "
+                           f"upgrade the extension (ALTER EXTENSION vector UPDATE) or set VECTOR_QUANTIZATION=none")
+
+
+def create_vector_index(cx, table, column, relation=None, method=VECTOR_QUANTIZATION):
+    '''
+    Create the HNSW index nearest_sql() searches for one embedding column: over the full vectors, or over their
+    quantized form with a pgvector VECTOR_QUANTIZATION. relation is the table to build it on when it is not
+    `table` itself (ingest's staging schema).
+    '''
+    check_pgvector(cx, method)
+    cx.execute(text(index_sql(table, column, method, relation)))
+
+
+def build_indexes(eng, method, drop_full=False):
+    '''
+    Create the quantized index of every embedded table; with drop_full, drop the float32 HNSW index afterwards.
+    '''
+    with eng.connect() as cx:
+        check_pgvector(cx, method)
+    for name, (table, column, _) in EMBEDDED_TABLES.items():
+        start = time.perf_counter()
+        with eng.begin() as cx:
+            create_vector_index(cx, table, column, method=method)
+            if drop_full:
+                cx.execute(text(f"DROP INDEX IF EXISTS idx_{table}_{column}"))
+        print(f"Built {method} index on {table}.{column} in {time.perf_counter() - start:.1f}s"
+              + (" (dropped the float32 index)" if drop_full else ""))
+
+
+def sample_queries(cx, table, column, n, noise, seed=0):
+    '''
+    n stored embeddings perturbed with Gaussian noise, standing in for questions near real rows.
+    '''
+    cx.execute(text("SELECT setseed(:s)"), {"s": seed / 10})
+    rows = cx.execute(text(f"SELECT {column} FROM {table} WHERE {column} IS NOT NULL ORDER BY random() LIMIT :n"),
+                      {"n": n}).scalars()
+    vecs = np.array([np.asarray(v, dtype=np.float32) for v in rows])
+    vecs += np.random.default_rng(seed).standard_normal(vecs.shape).astype(np.float32) * noise
+    return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+
+def other_hnsw_indexes(cx, table, index):
+    return cx.execute(text("SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() "
+                           "AND tablename = :t AND indexname <> :i AND indexdef ILIKE '%USING hnsw%'"),
+                      {"t": table, "i": index}).scalars().all()
+
+
+def report(eng, queries=200, k=5, noise=0.05, keep=False):
+    '''
+    Build the float32, halfvec and binary indexes side by side under report names and compare their size,
+    build time, query latency and recall@k against exact search. Each layout is measured with the table's other
+    HNSW indexes dropped inside a transaction that is rolled back, so the planner can only use the one under test.
+    '''
+    with eng.connect() as cx:
+        for method in PG_QUANTIZATIONS:
+            check_pgvector(cx, method)
+    print(f"  {'table':<18} {'method':<8} {'index MB':>9} {'build':>8} {'p50':>9} {'p99':>9} {'recall@' + str(k):>9}")
+    for name, (table, column, key_cols) in EMBEDDED_TABLES.items():
+        with eng.connect() as cx:
+            qvecs = sample_queries(cx, table, column, queries, noise)
+            keys = ", ".join(key_cols)
+            exact = text(f"SELECT {keys} FROM {table} ORDER BY ({column} <=> CAST(:q AS vector)) + 0 LIMIT :k")
+            truth = [set(map(tuple, cx.execute(exact, {"q": q, "k": k}).all())) for q in qvecs]
+
+        for method in ["none", *PG_QUANTIZATIONS]:
+            index = f"idx_report_{table}_{method}"
+            start = time.perf_counter()
+            with eng.begin() as cx:
+                cx.execute(text(f"DROP INDEX IF EXISTS {index}"))
+                cx.execute(text(index_sql(table, column, method, name=index)))
+            build = time.perf_counter() - start
+
+            sql = text(nearest_sql(name, limit=":k", method=method))
+            latencies, recalls = [], []
+            with eng.connect() as cx, cx.begin() as tx:
+                size = cx.execute(text("SELECT pg_relation_size(CAST(:i AS regclass))"), {"i": index}).scalar()
+                for other in other_hnsw_indexes(cx, table, index):
+                    cx.execute(text(f"DROP INDEX {other}"))
+                for q, expected in zip(qvecs, truth):
+                    t0 = time.perf_counter()
+                    found = {tuple(r[:len(key_cols)]) for r in cx.execute(sql, {"q": q, "k": k, **rerank_params()})}
+                    latencies.append(time.perf_counter() - t0)
+                    recalls.append(len(found & expected) / len(expected))
+                tx.rollback()
+            print(f"  {table:<18} {method:<8} {size / 2**20:>9.1f} {build:>7.1f}s "
+                  f"{percentile(latencies, 50) * 1000:>7.2f}ms {percentile(latencies, 99) * 1000:>7.2f}ms "
+                  f"{np.mean(recalls):>9.3f}")
+            if not keep:
+                with eng.begin() as cx:
+                    cx.execute(text(f"DROP INDEX IF EXISTS {index}"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Quantized HNSW indexes for the embedding columns.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Create the quantized HNSW indexes")
+    build.add_argument("--method", choices=sorted(PG_QUANTIZATIONS),
+                       default=VECTOR_QUANTIZATION if VECTOR_QUANTIZATION in PG_QUANTIZATIONS else "halfvec")
+    build.add_argument("--drop-full", action="store_true", help="Drop the float32 HNSW indexes afterwards")
+    rep = sub.add_parser("report", help="Compare index size, build time, latency and recall of each layout")
+    rep.add_argument("--queries", type=int, default=200)
+    rep.add_argument("--k", type=int, default=5)
+    rep.add_argument("--noise", type=float, default=0.05)
+    rep.add_argument("--keep", action="store_true", help="Keep the report indexes instead of dropping them")
+    args = parser.parse_args(argv)
+
+    from pgvector.psycopg2 import register_vector
+    eng = sa.create_engine(DB_DSN)
+    event.listen(eng, "connect", lambda dbapi_connection, _: register_vector(dbapi_connection))
+    if args.command == "build":
+        build_indexes(eng, args.method, args.drop_full)
+    else:
+        report(eng, args.queries, args.k, args.noise, args.keep)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,10 +1,23 @@
 import os
-import json
+import re
 import sys
-import sqlalchemy as sa
+import json
+import time
+import asyncio
+import argparse
+from contextlib import nullcontext
 from sqlalchemy import text
-from backend.config import DB_DSN, EMBED_MODEL, LLM_MODEL
-from backend.utils import ollama_embed, ollama_generate
+from backend.config import (EMBED_MODEL, LLM_MODEL, RETRIEVAL_BACKEND, STAT_QUERIES, LLM_CONCURRENCY, FILTERED_RETRIEVAL,
+                            HYBRID_RETRIEVAL, HYBRID_K_LEXICAL)
+from backend.utils import embed_queries, ollama_generate, generate_with_retry
+from backend.vector_store import get_local_store
+from backend.snapshot import get_snapshot
+from backend.db import read_only
+from backend.stats_query import answer_question
+from backend.filters import (extract_filters, question_filters, game_clauses, player_clauses, where, candidate_rows,
+                             filtered_game_ids)
+from backend.lexical import fused_cte, hybrid_params, lexical_sql, hybrid_keys, tsquery
+from backend.quantize import nearest_sql, rerank_params
 
 BASE_DIR = os.path.dirname(__file__)
 QUESTIONS_PATH = os.path.normpath(os.path.join(BASE_DIR, "..", "part1", "questions.json"))
@@ -42,27 +55,179 @@ def extract_requested_stats(question):
     return stats
 
 
-def retrieve(cx, qvec, question):
-    """
-    Retrieve games_details and player_box_scores rows depending on question type.
-    """
-    # Determine if we need to retrieve addtional player_box_scores rows
-    is_leader = is_leader_question(question)
-    
-    # Retrieve game_details rows
-    game_sql = """
+GAME_SELECT = """
     SELECT g.game_id, g.season, g.game_timestamp,
             h.name AS home_name, h.city AS home_city, h.abbreviation AS home_abbrev, g.home_points, 
             a.name AS away_name, a.city AS away_city, a.abbreviation AS away_abbrev, g.away_points, 
-            1 - (g.game_embedding <=> (:q)::vector) AS score, 'game_details' AS source
+            {score} AS score, 'game_details' AS source
     FROM game_details g
     JOIN teams h ON g.home_team_id = h.team_id
     JOIN teams a ON g.away_team_id = a.team_id
-    ORDER BY g.game_embedding <-> (:q)::vector
+    """
+
+PLAYER_SELECT = """
+        SELECT pbs.person_id, pbs.game_id, p.first_name, p.last_name, t.name AS team_name,
+                pbs.points, pbs.offensive_reb AS oreb, pbs.defensive_reb AS dreb, pbs.assists,
+                pbs.steals, pbs.blocks, pbs.turnovers,
+                g.game_timestamp,
+                {score} AS score, 'player_box_scores' AS source
+        FROM player_box_scores pbs
+        JOIN players p ON pbs.person_id = p.player_id
+        JOIN teams t ON pbs.team_id = t.team_id
+        JOIN game_details g ON pbs.game_id = g.game_id
+        """
+
+
+def hydrate(rows, ranked):
+    '''
+    Order rows fetched by key to match a local index ranking [(key, score), ...] and attach the scores.
+    '''
+    scores = dict(ranked)
+    by_key = {}
+    for r in rows:
+        key = (int(r["person_id"]), int(r["game_id"])) if r["source"] == "player_box_scores" else (int(r["game_id"]),)
+        by_key[key] = {**r, "score": scores[key]}
+    return [by_key[k] for k, _ in ranked if k in by_key]
+
+
+def local_candidates(cx, index, filters):
+    '''
+    Row indices of a LocalIndex passing the filters, or None to search every row (no filters, or nothing matched).
+    '''
+    if filters is None:
+        return None
+    rows = candidate_rows(index.keys, filtered_game_ids(cx, filters), filters["person_ids"])
+    return rows if rows is None or len(rows) else None
+
+
+def lexical_keys(cx, name, question):
+    '''
+    Primary keys of games or box scores ranked by full-text match with the question (local backend).
+    '''
+    params = {"terms": tsquery(question), "k_lexical": HYBRID_K_LEXICAL}
+    return [tuple(int(v) for v in r) for r in cx.execute(text(lexical_sql(name)), params)]
+
+
+def local_ranking(cx, name, qvec, k, filters, question):
+    '''
+    Top-k (key, score) of a local index: within the filtered rows if any match, else fused with the full-text
+    ranking when HYBRID_RETRIEVAL is on and there is a question, else by similarity alone.
+    '''
+    index = getattr(get_local_store(), name)
+    rows = local_candidates(cx, index, filters)
+    if rows is None and HYBRID_RETRIEVAL and question:
+        return hybrid_keys(index, qvec, lexical_keys(cx, name, question), k)
+    return index.search_keys(qvec, k, rows)
+
+
+def retrieve_games(cx, qvec, k, filters=None, question=None):
+    '''
+    Top-k game_details rows by similarity, from pgvector, the local index or the snapshot (RETRIEVAL_BACKEND).
+    With filters (backend.filters), only matching games are ranked, unless there are none.
+    Otherwise, with HYBRID_RETRIEVAL and the question, vector and full-text ranks are fused (backend.lexical).
+    '''
+    if RETRIEVAL_BACKEND == "snapshot":
+        return get_snapshot().search_games(qvec, k, filters, question)
+    if RETRIEVAL_BACKEND == "local":
+        ranked = local_ranking(cx, "games", qvec, k, filters, question)
+        sql = GAME_SELECT.format(score="NULL::float8") + "WHERE g.game_id = ANY(CAST(:ids AS bigint[]))"
+        rows = cx.execute(text(sql), {"ids": [key[0] for key, _ in ranked]}).mappings()
+        return hydrate(rows, ranked)
+
+    clauses, params = game_clauses(filters) if filters is not None else ([], {})
+    if clauses:
+        # "+ 0" keeps the planner off the HNSW index: the few matching games are ranked exactly
+        sql = GAME_SELECT.format(score="1 - (g.game_embedding <=> (:q)::vector)") + where(clauses) + """
+        ORDER BY (g.game_embedding <=> (:q)::vector) + 0
+        LIMIT :k
+        """
+        rows = list(cx.execute(text(sql), {"q": qvec, "k": k, **params}).mappings())
+        if rows:
+            return rows
+
+    if HYBRID_RETRIEVAL and question:
+        sql = f"WITH {fused_cte('games', '(:q)::vector')}" + GAME_SELECT.format(score="f.score") + """
+        JOIN games_fused f ON f.game_id = g.game_id
+        ORDER BY f.score DESC
+        LIMIT :k
+        """
+        return list(cx.execute(text(sql), {"q": qvec, "k": k, **hybrid_params(question), **rerank_params()}).mappings())
+
+    sql = GAME_SELECT.format(score="1 - n.distance") + f"""
+    JOIN ({nearest_sql("games", "(:q)::vector")}) n ON n.game_id = g.game_id
+    ORDER BY n.distance
     LIMIT :k
     """
+    return list(cx.execute(text(sql), {"q": qvec, "k": k, **rerank_params()}).mappings())
+
+
+def retrieve_players(cx, qvec, k, filters=None, question=None):
+    '''
+    Top-k player_box_scores rows by similarity, from pgvector, the local index or the snapshot (RETRIEVAL_BACKEND).
+    With filters (backend.filters), only matching box scores are ranked, unless there are none.
+    Otherwise, with HYBRID_RETRIEVAL and the question, vector and full-text ranks are fused (backend.lexical).
+    '''
+    if RETRIEVAL_BACKEND == "snapshot":
+        return get_snapshot().search_players(qvec, k, filters, question)
+    if RETRIEVAL_BACKEND == "local":
+        ranked = local_ranking(cx, "players", qvec, k, filters, question)
+        sql = PLAYER_SELECT.format(score="NULL::float8") + """
+        WHERE (pbs.person_id, pbs.game_id) IN (
+            SELECT * FROM unnest(CAST(:person_ids AS bigint[]), CAST(:game_ids AS bigint[]))
+        )
+        """
+        params = {"person_ids": [key[0] for key, _ in ranked], "game_ids": [key[1] for key, _ in ranked]}
+        return hydrate(cx.execute(text(sql), params).mappings(), ranked)
+
+    clauses, params = player_clauses(filters) if filters is not None else ([], {})
+    if clauses:
+        sql = PLAYER_SELECT.format(score="1 - (pbs.player_embedding <=> (:q)::vector)") + where(clauses) + """
+        ORDER BY (pbs.player_embedding <=> (:q)::vector) + 0
+        LIMIT :k
+        """
+        rows = list(cx.execute(text(sql), {"q": qvec, "k": k, **params}).mappings())
+        if rows:
+            return rows
+
+    if HYBRID_RETRIEVAL and question:
+        sql = f"WITH {fused_cte('players', '(:q)::vector')}" + PLAYER_SELECT.format(score="f.score") + """
+        JOIN players_fused f ON f.person_id = pbs.person_id AND f.game_id = pbs.game_id
+        ORDER BY f.score DESC
+        LIMIT :k
+        """
+        return list(cx.execute(text(sql), {"q": qvec, "k": k, **hybrid_params(question), **rerank_params()}).mappings())
+
+    sql = PLAYER_SELECT.format(score="1 - n.distance") + f"""
+        JOIN ({nearest_sql("players", "(:q)::vector")}) n ON n.person_id = pbs.person_id AND n.game_id = pbs.game_id
+        ORDER BY n.distance
+        LIMIT :k
+        """
+    return list(cx.execute(text(sql), {"q": qvec, "k": k, **rerank_params()}).mappings())
+
+
+def retrieval_filters(cx, question):
+    '''
+    Teams, players and date named in the question (backend.filters), or None if FILTERED_RETRIEVAL is off.
+    '''
+    if not FILTERED_RETRIEVAL:
+        return None
+    if RETRIEVAL_BACKEND == "snapshot":
+        return extract_filters(question, get_snapshot().entities())
+    return question_filters(cx, question)
+
+
+def retrieve(cx, qvec, question):
+    """
+    Retrieve games_details and player_box_scores rows depending on question type.
+    """
+    # Determine if we need to retrieve addtional player_box_scores rows
+    is_leader = is_leader_question(question)
     
-    game_rows = list(cx.execute(text(game_sql), {"q": qvec, "k": 3}).mappings())
+    # Narrow the search to the teams, players and date named in the question
+    filters = retrieval_filters(cx, question)
+    
+    # Retrieve game_details rows
+    game_rows = retrieve_games(cx, qvec, 3, filters, question)
     
     # Retrieve player_box_scores rows
     if is_leader and game_rows:
@@ -71,16 +236,10 @@ def retrieve(cx, qvec, question):
         print(game_ids)
         
         # Get ALL players from the top 2 retrieved games if "leader"
-        player_sql = """
-        SELECT pbs.person_id, pbs.game_id, p.first_name, p.last_name, t.name AS team_name,
-                pbs.points, pbs.offensive_reb AS oreb, pbs.defensive_reb AS dreb, pbs.assists,
-                pbs.steals, pbs.blocks, pbs.turnovers,
-                g.game_timestamp,
-                'player_box_scores' AS source
-        FROM player_box_scores pbs
-        JOIN players p ON pbs.person_id = p.player_id
-        JOIN teams t ON pbs.team_id = t.team_id
-        JOIN game_details g ON pbs.game_id = g.game_id
+        if RETRIEVAL_BACKEND == "snapshot":
+            return game_rows + get_snapshot().players_in_games(game_ids)
+        
+        player_sql = PLAYER_SELECT.format(score="NULL::float8") + """
         WHERE pbs.game_id = ANY(:game_ids)
         ORDER BY pbs.game_id, pbs.points DESC
         """
@@ -90,21 +249,7 @@ def retrieve(cx, qvec, question):
     else:
         
         # Retrieve top 5 players by vector similarity
-        player_sql = """
-        SELECT pbs.person_id, pbs.game_id, p.first_name, p.last_name, t.name AS team_name,
-                pbs.points, pbs.offensive_reb AS oreb, pbs.defensive_reb AS dreb, pbs.assists,
-                pbs.steals, pbs.blocks, pbs.turnovers,
-                g.game_timestamp,
-                1 - (pbs.player_embedding <=> (:q)::vector) AS score, 'player_box_scores' AS source
-        FROM player_box_scores pbs
-        JOIN players p ON pbs.person_id = p.player_id
-        JOIN teams t ON pbs.team_id = t.team_id
-        JOIN game_details g ON pbs.game_id = g.game_id
-        ORDER BY pbs.player_embedding <-> (:q)::vector
-        LIMIT 5
-        """
-        
-        player_rows = list(cx.execute(text(player_sql), {"q": qvec}).mappings())
+        player_rows = retrieve_players(cx, qvec, 5, filters, question)
     
     return game_rows + player_rows
 
@@ -180,20 +325,14 @@ def build_context(rows, requested_stats):
     return "\n".join(context)
 
 
-def answer(question, rows, requested_stats, question_id):
+def build_prompt(question, rows, requested_stats, expected):
     """
-    Generate answer using LLM.
+    LLM prompt for one question: the template's result structure, the retrieved context and the question.
     """
     ctx = build_context(rows, requested_stats)
-    
-    # Load answer template 
-    with open(TEMPLATE_PATH, encoding="utf-8") as f:
-        template = json.load(f)
-    
-    expected = template[question_id - 1]["result"]  # Retrieve `result` field of current question for LLM context
 
     # LLM Prompt with guidelines for response accuracy
-    prompt = f"""Return ONLY the JSON result object matching this exact structure:
+    return f"""Return ONLY the JSON result object matching this exact structure:
     {json.dumps(expected, indent=2)}
 
     Requirements:
@@ -214,142 +353,228 @@ def answer(question, rows, requested_stats, question_id):
     Question: {question}
 
     Return only the JSON object:"""
-    
-    return ollama_generate(LLM_MODEL, prompt)
 
 
-def process_question(question_id):
+def load_json(path, default=None):
+    if default is not None and not os.path.exists(path):
+        return default
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def answer(question, rows, requested_stats, question_id):
     """
-    Answer a single question by ID.
+    Generate answer using LLM.
     """
-    print(f"\n{'='*60}")
-    print(f"Processing Question {question_id}")
-    print(f"Model: {LLM_MODEL}")
-    print('='*60)
-    
-    # Load questions
-    with open(QUESTIONS_PATH, encoding="utf-8") as f:
-        questions = json.load(f)
-    
-    # Input Error Handling
-    if question_id < 1 or question_id > len(questions):
-        print(f"Error: Question {question_id} not found")
-        return
-    
-    q = questions[question_id - 1]
-    print(f"Question: {q['question']}")
-    
-    # Load existing answers or create new
-    if os.path.exists(ANSWERS_PATH):
-        with open(ANSWERS_PATH, encoding="utf-8") as f:
-            answers = json.load(f)
-    else:
-        answers = []
+    # Retrieve `result` field of current question for LLM context
+    expected = load_json(TEMPLATE_PATH)[question_id - 1]["result"]
+    return ollama_generate(LLM_MODEL, build_prompt(question, rows, requested_stats, expected))
+
+
+# Template result keys -> field names produced by backend.stats_query
+FIELD_ALIASES = {
+    "player": "player_name", "name": "player_name", "team_name": "team",
+    "total": "value", "average": "value", "games_played": "games",
+}
+
+
+def stat_result(stat, expected):
+    """
+    Fill the template's result fields (expected) from a structured stat answer.
+    Returns None if any field has no computed value, so the question goes through the LLM instead.
+    """
+    if not isinstance(expected, dict):
+        return None
+    
+    result = {}
+    for key in expected:
+        if key == "evidence":
+            continue
+        field = FIELD_ALIASES.get(key, key)
+        if field not in stat["fields"]:
+            return None
+        result[key] = stat["fields"][field]
+    return result
+
+
+def parse_result(ans):
+    """
+    Parse the LLM response as JSON, attempting regex extraction if the response has text around the object.
+    """
+    try:
+        result = json.loads(ans)
+        print(f"  Result: {result}")
+        return result
+    except json.JSONDecodeError as e:
+        print(f"  JSON Error: {e}")
+    
+    match = re.search(r'\{.*\}', ans, re.DOTALL)
+    if match:
+        try:
+            result = json.loads(match.group())
+            print(f"  Recovered: {result}")
+            return result
+        except json.JSONDecodeError:
+            pass
+    return None
+
+
+def build_evidence(rows):
+    """
+    Evidence entries for the answers file, one per retrieved row.
+    """
+    evidence = []
+    for r in rows:  
+        
+        if r["source"] == "game_details":
+            evidence.append({
+                "table": "game_details",
+                "id": int(r["game_id"])
+            })
+            
+        elif r["source"] == "player_box_scores":
+            evidence.append({
+                "table": "player_box_score",                            # Note: template shows "player_box_score" (singular) not "player_box_scores"
+                "id": f"{int(r['person_id'])}_{int(r['game_id'])}"      # Include both player ID and game ID (player ID alone isn't a primary key)
+            })                                                          # Formatted as: "playerid_gameid"
+    return evidence
+
+
+def write_answers(answers):
+    """
+    Write answers.json (one answer per line) to a temporary file and rename it into place,
+    so an interrupted run never leaves a truncated file.
+    """
+    tmp = f"{ANSWERS_PATH}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write('[\n') 
+        for i, ans in enumerate(answers):  
+            if i > 0:
+                f.write(',\n')
+            f.write(json.dumps(ans, separators=(',', ':')))
+        f.write('\n]')
+    os.replace(tmp, ANSWERS_PATH)
+
+
+async def generate_all(prompts, concurrency):
+    """
+    Run the LLM over every prompt with at most `concurrency` calls in flight. Returns responses in prompt order.
+    """
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def generate(prompt):
+        async with semaphore:
+            return await generate_with_retry(LLM_MODEL, prompt)
+
+    return await asyncio.gather(*(generate(p) for p in prompts))
+
+
+def run_batch(question_ids=None, concurrency=LLM_CONCURRENCY):
+    """
+    Answer the given questions (all of them by default) in stages and write answers.json once at the end:
+    1. stat:     leader / season total / average questions computed exactly with SQL
+    2. embed:    every remaining question encoded in one batch
+    3. retrieve: context rows for each question over one read-only pooled connection
+    4. llm:      LLM calls issued concurrently (LLM_CONCURRENCY), with retry on rate limits
+    """
+    timings = {}
+    start = time.perf_counter()
+    questions = load_json(QUESTIONS_PATH)
+    template = load_json(TEMPLATE_PATH)
+    answers = load_json(ANSWERS_PATH, default=[])
     
     # Ensure list is long enough
     while len(answers) < len(questions):
         answers.append({"id": len(answers) + 1, "result": None, "evidence": []})
     
-    # Start processing 
-    eng = sa.create_engine(DB_DSN)
-    with eng.begin() as cx:
-        # Analyze question
-        is_leader = is_leader_question(q["question"])
-        requested_stats = extract_requested_stats(q["question"])
-        
-        print(f"  Type: {'Leader' if is_leader else 'Regular'}")
-        print(f"  Stats: {requested_stats}")
-        
-        # Embed question and retrieve rows
-        qvec = ollama_embed(EMBED_MODEL, q["question"])
-        rows = retrieve(cx, qvec, q["question"])
-        
-        games = [r for r in rows if r["source"] == "game_details"]
-        players = [r for r in rows if r["source"] == "player_box_scores"]
-        
-        print(f"  Retrieved: {len(games)} games, {len(players)} players")
-        
-        # Generate answer
-        ans = answer(q["question"], rows, requested_stats, question_id)
+    question_ids = question_ids or list(range(1, len(questions) + 1))
+    for qid in question_ids:
+        # Input Error Handling
+        if qid < 1 or qid > len(questions):
+            raise ValueError(f"Question {qid} not found (1-{len(questions)})")
+    timings["load"] = time.perf_counter() - start
+
+    print(f"Answering {len(question_ids)} questions with {LLM_MODEL} (concurrency {concurrency})")
+    results, rows, pending = {}, {}, []
+    
+    # The snapshot backend reads local files and needs no connection
+    snapshot = RETRIEVAL_BACKEND == "snapshot"
+    with (nullcontext() if snapshot else read_only()) as cx:
+        start = time.perf_counter()
+        for qid in question_ids:
+            question = questions[qid - 1]["question"]
+            stat = answer_question(cx, question) if STAT_QUERIES and not snapshot else None
+            result = stat_result(stat, template[qid - 1]["result"]) if stat else None
+            if result is None:
+                pending.append(qid)
+                continue
+            print(f"  Q{qid} structured: {stat['answer']}")
+            results[qid] = result
+            rows[qid] = ([{**r, "source": "game_details"} for r in stat["game_rows"]] +
+                         [{**r, "source": "player_box_scores"} for r in stat["player_rows"]])
+        timings["stat"] = time.perf_counter() - start
         
-        # Parse LLM response as JSON, attempting regex extraction if not found
-        try:
-            result = json.loads(ans)
-            print(f"  Result: {result}")
-        except json.JSONDecodeError as e:
-            print(f"  JSON Error: {e}")
-            # Try to extract JSON
-            import re
-            match = re.search(r'\{.*\}', ans, re.DOTALL)
-            if match:
-                try:
-                    result = json.loads(match.group())
-                    print(f"  Recovered: {result}")
-                except:
-                    result = None
-            else:
-                result = None
+        start = time.perf_counter()
+        qvecs = embed_queries(EMBED_MODEL, [questions[qid - 1]["question"] for qid in pending]) if pending else []
+        timings["embed"] = time.perf_counter() - start
         
-        # Build evidence
-        evidence = []
-        for r in rows:  
-            
-            if r["source"] == "game_details":
-                evidence.append({
-                    "table": "game_details",
-                    "id": int(r["game_id"])
-                })
-                
-            elif r["source"] == "player_box_scores":
-                evidence.append({
-                    "table": "player_box_score",                            # Note: template shows "player_box_score" (singular) not "player_box_scores"
-                    "id": f"{int(r['person_id'])}_{int(r['game_id'])}"      # Include both player ID and game ID (player ID alone isn't a primary key)
-                })                                                          # Formatted as: "playerid_gameid"
-
+        start = time.perf_counter()
+        for qid, qvec in zip(pending, qvecs):
+            rows[qid] = retrieve(cx, qvec, questions[qid - 1]["question"])
+        timings["retrieve"] = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    prompts = [build_prompt(questions[qid - 1]["question"], rows[qid],
+                            extract_requested_stats(questions[qid - 1]["question"]), template[qid - 1]["result"])
+               for qid in pending]
+    responses = asyncio.run(generate_all(prompts, concurrency)) if prompts else []
+    timings["llm"] = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    for qid, ans in zip(pending, responses):
+        print(f"  Q{qid}:")
+        results[qid] = parse_result(ans)
+    
+    for qid in question_ids:
         # Add evidence to the result 
+        evidence = build_evidence(rows[qid])
+        result = results.get(qid)
         if result:
             result["evidence"] = evidence
         else:
             result = {"evidence": evidence}
-
-        print(f"  Evidence: {len(evidence)} rows")
-
+        
         # Update answer with question id and result (which contains evidence)
-        answers[question_id - 1] = {
-            "id": question_id,
+        answers[qid - 1] = {
+            "id": qid,
             "result": result
         }
     
-    # Save answers
-    with open(ANSWERS_PATH, "w", encoding="utf-8") as f:
-        f.write('[\n') 
-        for i, ans in enumerate(answers):  
-            if i > 0:
-                f.write(',\n')
-            f.write(json.dumps(ans, separators=(',', ':')))
-        f.write('\n]')
+    write_answers(answers)
+    timings["write"] = time.perf_counter() - start
     
+    total = sum(timings.values())
+    print(f"\n  {'stage':<10} {'seconds':>8} {'share':>7}")
+    for stage, seconds in timings.items():
+        print(f"  {stage:<10} {seconds:>7.2f}s {seconds / total:>7.1%}")
+    print(f"  {'total':<10} {total:>7.2f}s   ({len(question_ids) - len(pending)} structured, {len(pending)} via LLM)")
     print(f"\n✅ Updated answers.json")
 
 
+def process_question(question_id):
+    """
+    Answer a single question by ID.
+    """
+    run_batch([question_id])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Answer part1/questions.json into part1/answers.json.")
+    parser.add_argument("question_ids", nargs="*", type=int, help="Questions to answer (default: all)")
+    parser.add_argument("--concurrency", type=int, default=LLM_CONCURRENCY, help="LLM calls in flight at once")
+    args = parser.parse_args(argv)
+    run_batch(args.question_ids, args.concurrency)
+
+
 if __name__ == "__main__":
-    
-    # 1 arg provided => answer all questions
-    if len(sys.argv) != 2:
-        print("Processing all questions...")
-        with open(QUESTIONS_PATH, encoding="utf-8") as f:
-            questions = json.load(f)
-        
-        for i in range(1, len(questions) + 1):
-            process_question(i)
-            
-    # 2 args provided => answer given question only
-    else:
-        try:
-            qid = int(sys.argv[1])
-            process_question(qid)
-        except ValueError:
-            print("Usage: python -m backend.rag [question_number]")
-            print("Or: python -m backend.rag  (to run all)")
-            sys.exit(1)
-            
\ No newline at end of file
+    main(sys.argv[1:])
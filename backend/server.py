@@ -1,14 +1,59 @@
+import time
+# Taken before the imports below, so GET /ready can report how long importing the server took
+IMPORT_STARTED = time.perf_counter()
+
 from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
 from pydantic import BaseModel
-import sqlalchemy as sa
-from backend.config import DB_DSN, EMBED_MODEL, LLM_MODEL
-from backend.utils import ollama_embed, ollama_generate
-from sqlalchemy import text
+from backend.config import (EMBED_MODEL, LLM_MODEL, EMBED_EXECUTOR_WORKERS,
+                            ANSWER_CACHE_SIZE, ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_TTL, RETRIEVAL_BACKEND,
+                            STAT_QUERIES, FILTERED_RETRIEVAL, HYBRID_RETRIEVAL, HYBRID_K_LEXICAL,
+                            LLM_BACKEND, DB_POOL_SIZE, WARMUP, WARMUP_CONNECTIONS, WARMUP_PREWARM)
+from backend.utils import (embed_query, ollama_embed, ollama_generate_async, ollama_stream_async, query_cache,
+                           get_async_groq_client)
+from backend.cache import SemanticCache
+from backend.vector_store import get_local_store, EMBEDDED_TABLES
+from backend.db import make_async_engine, read_connection
+from backend.metrics import trace, stage, observe, render, in_own_context
+from backend.filters import extract_filters, question_filters, cache_key, question_cache_key, game_clauses, player_clauses, where, candidate_rows, filtered_game_ids
+from backend.stats_query import classify, answer_question, load_entities
+from backend.lexical import fused_cte, hybrid_params, lexical_sql, hybrid_keys, tsquery
+from backend.quantize import nearest_sql, rerank_params
+from sqlalchemy import text, event
+from sqlalchemy.exc import ProgrammingError
+from pgvector.asyncpg import register_vector
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, suppress
 import re
+import json
+import asyncio
+import numpy as np
 from datetime import datetime
 
-app = FastAPI()
+# Startup state served by GET /ready: import and warm-up times, seconds per warm-up stage, and any failure
+readiness = {"ready": False, "error": None, "import_s": None, "warmup_s": None, "stages": {}}
+
+
+@asynccontextmanager
+async def lifespan(app):
+    '''
+    Run warm_up() in the background once the server is up (with WARMUP=0 it is ready at once);
+    on shutdown, stop it and close the connection pool and the encoder threads.
+    '''
+    task = asyncio.create_task(warm_up()) if WARMUP else None
+    readiness["ready"] = task is None
+    yield
+    if task is not None and not task.done():
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    await aeng.dispose()
+    embed_executor.shutdown(wait=False, cancel_futures=True)
+
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     # allow_origins=["http://localhost:4200"],
@@ -17,7 +62,15 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-eng = sa.create_engine(DB_DSN)
+aeng, pool_metrics = make_async_engine()
+embed_executor = ThreadPoolExecutor(max_workers=EMBED_EXECUTOR_WORKERS, thread_name_prefix="embed")
+answer_cache = SemanticCache(threshold=ANSWER_CACHE_THRESHOLD, maxsize=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL)
+
+
+@event.listens_for(aeng.sync_engine, "connect")
+def register_vector_codec(dbapi_connection, connection_record):
+    # Teach asyncpg the pgvector type so query vectors are bound as native parameters
+    dbapi_connection.run_async(register_vector)
 
 
 @app.get("/")
@@ -25,9 +78,99 @@ def root():
     return {"status": "ok", "message": "NBA Stats API is running"}
 
 
+@app.get("/ready")
+def ready():
+    '''
+    Readiness probe: 200 once the startup warm-up has finished, 503 while it runs or if it failed.
+    '''
+    return JSONResponse(readiness, status_code=200 if readiness["ready"] else 503)
+
+
+@app.get("/api/stats")
+def stats():
+    '''
+    Cache and connection pool counters for monitoring.
+    '''
+    return {"query_embedding_cache": query_cache.stats(), "answer_cache": answer_cache.stats(),
+            "db_pool": pool_metrics.stats()}
+
+
+@app.get("/metrics")
+def metrics():
+    '''
+    Per-stage and per-request latency histograms, plus cache and pool gauges, in Prometheus text format.
+    '''
+    pool = pool_metrics.stats()
+    gauges = {
+        "nba_db_pool_checked_out": ("Connections currently checked out of the pool.", pool["checked_out"]),
+        "nba_db_pool_overflow": ("Overflow connections currently open.", pool["overflow"]),
+        "nba_db_pool_timeouts": ("Requests that timed out waiting for a connection.", pool["timeouts"]),
+        "nba_db_pool_wait_seconds_max": ("Longest wait for a pooled connection.", pool["wait_ms_max"] / 1000),
+        "nba_query_cache_hits": ("Question embedding cache hits.", query_cache.stats()["hits"]),
+        "nba_answer_cache_hits": ("Semantic answer cache hits.", answer_cache.stats()["hits"]),
+    }
+    return PlainTextResponse(render(gauges), media_type="text/plain; version=0.0.4")
+
+
+class Invalidate(BaseModel):
+    game_ids: list[int] | None = None
+
+
+@app.post("/api/cache/invalidate")
+def invalidate_cache(req: Invalidate):
+    '''
+    Drop cached answers that depend on any of the given games (all cached answers if game_ids is omitted).
+    '''
+    if req.game_ids is None:
+        dropped = answer_cache.invalidate()
+    else:
+        game_ids = set(req.game_ids)
+        dropped = answer_cache.invalidate(lambda deps: not game_ids.isdisjoint(deps["game_ids"]))
+    return {"invalidated": dropped}
+
+
 class Q(BaseModel):
     question: str
 
+
+def answer_deps(game_rows, player_rows):
+    '''
+    Record the rows (and their content hashes from backend.embed) an answer was built from, for the answer cache.
+    '''
+    return {
+        "game_ids": {int(r["game_id"]) for r in game_rows} | {int(r["game_id"]) for r in player_rows},
+        "games": {int(r["game_id"]): r["row_hash"] for r in game_rows},
+        "players": {(int(r["person_id"]), int(r["game_id"])): r["row_hash"] for r in player_rows},
+    }
+
+
+def deps_unchanged(cx, deps):
+    '''
+    True if every row a cached answer depends on still exists with the same content hash.
+    Re-ingested rows lose or change their hash, which invalidates the answers built from them.
+    Tables without hash columns (re-created by ingest --mode replace, not yet embedded) count as changed.
+    '''
+    try:
+        if deps["games"]:
+            current = dict(cx.execute(
+                text("SELECT game_id, game_embedding_hash FROM game_details WHERE game_id = ANY(:ids)"),
+                {"ids": list(deps["games"])}
+            ).all())
+            if current != deps["games"]:
+                return False
+        if deps["players"]:
+            current = {(pid, gid): h for pid, gid, h in cx.execute(
+                text("SELECT person_id, game_id, player_embedding_hash FROM player_box_scores "
+                     "WHERE person_id = ANY(:pids) AND game_id = ANY(:gids)"),
+                {"pids": list({k[0] for k in deps["players"]}), "gids": list({k[1] for k in deps["players"]})}
+            ).all()}
+            if any(current.get(k) != h for k, h in deps["players"].items()):
+                return False
+    except ProgrammingError:
+        # The failed statement aborts the read transaction, which is rolled back when the connection is returned
+        return False
+    return True
+
     
 def game_context(r):
     """
@@ -52,51 +195,171 @@ def player_context(r):
     )
 
 
-@app.post("/api/chat")
-def answer(q: Q):
+GAME_COLUMNS = ["game_id", "season", "game_timestamp", "home_name", "home_city", "home_abbrev", "home_points",
+                "away_name", "away_city", "away_abbrev", "away_points", "row_hash", "score", "source"]
+PLAYER_COLUMNS = ["person_id", "game_id", "first_name", "last_name", "team_name", "points", "oreb", "dreb", "assists",
+                  "steals", "blocks", "turnovers", "game_timestamp", "row_hash", "score", "source"]
+
+GAME_SELECT = """
+    SELECT 'game_details' AS source, g.game_id, g.season, g.game_timestamp,
+        h.name AS home_name, h.city AS home_city, h.abbreviation AS home_abbrev, g.home_points,
+        a.name AS away_name, a.city AS away_city, a.abbreviation AS away_abbrev, g.away_points,
+        NULL::bigint AS person_id, NULL AS first_name, NULL AS last_name, NULL AS team_name,
+        NULL::bigint AS points, NULL::bigint AS oreb, NULL::bigint AS dreb, NULL::bigint AS assists,
+        NULL::bigint AS steals, NULL::bigint AS blocks, NULL::bigint AS turnovers,
+        g.game_embedding_hash AS row_hash,
+        {score} AS score
+    FROM game_details g
+    JOIN teams h ON g.home_team_id = h.team_id
+    JOIN teams a ON g.away_team_id = a.team_id
+"""
+
+PLAYER_SELECT = """
+    SELECT 'player_box_scores' AS source, pbs.game_id, g.season, g.game_timestamp,
+        NULL, NULL, NULL, NULL,
+        NULL, NULL, NULL, NULL,
+        pbs.person_id, p.first_name, p.last_name, t.name,
+        pbs.points, pbs.offensive_reb, pbs.defensive_reb, pbs.assists,
+        pbs.steals, pbs.blocks, pbs.turnovers,
+        pbs.player_embedding_hash,
+        {score}
+    FROM player_box_scores pbs
+    JOIN players p ON pbs.person_id = p.player_id
+    JOIN teams t ON pbs.team_id = t.team_id
+    JOIN game_details g ON g.game_id = pbs.game_id
+"""
+
+# Top-k games and top-k player box scores by vector similarity in one round-trip.
+# The SQL text is constant and the query vector is a bound parameter (sent in pgvector's binary format),
+# so asyncpg prepares the statement once per pooled connection and reuses it for every request.
+# The nearest keys come from backend.quantize.nearest_sql(), ordered by the cosine operator so an HNSW index
+# serves the search: over the full vectors, or over their quantized form re-ranked exactly (VECTOR_QUANTIZATION).
+GAME_NEAREST = f"""JOIN ({nearest_sql("games", limit=":k_games")}) n ON n.game_id = g.game_id"""
+PLAYER_NEAREST = f"""JOIN ({nearest_sql("players", limit=":k_players")}) n
+        ON n.person_id = pbs.person_id AND n.game_id = pbs.game_id"""
+
+RETRIEVAL_SQL = f"""
+({GAME_SELECT.format(score="1 - n.distance")}
+    {GAME_NEAREST}
+    ORDER BY n.distance
+    LIMIT :k_games)
+UNION ALL
+({PLAYER_SELECT.format(score="1 - n.distance")}
+    {PLAYER_NEAREST}
+    ORDER BY n.distance
+    LIMIT :k_players)
+"""
+
+
+# RETRIEVAL_SQL with vector and full-text ranks fused per table (HYBRID_RETRIEVAL, see backend.lexical).
+# Still one constant statement: the question's terms, candidate counts and weights are bound parameters.
+HYBRID_SQL = f"""
+WITH {fused_cte("games")},
+{fused_cte("players")}
+({GAME_SELECT.format(score="f.score")}
+    JOIN games_fused f ON f.game_id = g.game_id
+    ORDER BY f.score DESC
+    LIMIT :k_games)
+UNION ALL
+({PLAYER_SELECT.format(score="f.score")}
+    JOIN players_fused f ON f.person_id = pbs.person_id AND f.game_id = pbs.game_id
+    ORDER BY f.score DESC
+    LIMIT :k_players)
+"""
+
+
+def filtered_retrieval_sql(filters):
     '''
-    Process a user question by retrieving relevant game and player data, generating an LLM-based answer, and returning evidence. 
-    The evidence algorithm extracts cited rows from the model output or falls back to top-ranked game and player rows when no explicit citation is found.
-    Evidence is used to visualize data associated with the question and answer in the UI.
+    RETRIEVAL_SQL restricted to the rows matching backend.filters filters. Returns (sql, params).
+    A side with predicates orders by the distance plus zero, which the HNSW index cannot serve: Postgres then finds
+    the few matching rows through the btree indexes and ranks them exactly, instead of walking the graph and
+    discarding non-matching neighbours (which can leave fewer than k rows). A side without stays as in RETRIEVAL_SQL.
+    '''
+    game_where, game_params = game_clauses(filters)
+    player_where, player_params = player_clauses(filters)
+    if game_where:
+        games = f"""{GAME_SELECT.format(score="1 - (g.game_embedding <=> CAST(:q AS vector))")}{where(game_where)}
+    ORDER BY (g.game_embedding <=> CAST(:q AS vector)) + 0"""
+    else:
+        games = f"""{GAME_SELECT.format(score="1 - n.distance")}
+    {GAME_NEAREST}
+    ORDER BY n.distance"""
+    if player_where:
+        players = f"""{PLAYER_SELECT.format(score="1 - (pbs.player_embedding <=> CAST(:q AS vector))")}{where(player_where)}
+    ORDER BY (pbs.player_embedding <=> CAST(:q AS vector)) + 0"""
+    else:
+        players = f"""{PLAYER_SELECT.format(score="1 - n.distance")}
+    {PLAYER_NEAREST}
+    ORDER BY n.distance"""
+    sql = f"""
+({games}
+    LIMIT :k_games)
+UNION ALL
+({players}
+    LIMIT :k_players)
+"""
+    return sql, {**game_params, **player_params}
+
+
+# Rows for keys ranked by the local index (RETRIEVAL_BACKEND=local), fetched by primary key in one round-trip
+HYDRATE_SQL = f"""
+{GAME_SELECT.format(score="NULL::float8")}
+    WHERE g.game_id = ANY(CAST(:game_ids AS bigint[]))
+UNION ALL
+{PLAYER_SELECT.format(score="NULL::float8")}
+    WHERE (pbs.person_id, pbs.game_id) IN (
+        SELECT * FROM unnest(CAST(:person_ids AS bigint[]), CAST(:player_game_ids AS bigint[]))
+    )
+"""
+
+
+def format_date(ts):
+    '''
+    Format a game timestamp as MM/DD/YY for evidence display.
+    '''
+    game_date_str = str(ts).split()[0]
+    return datetime.strptime(game_date_str, '%Y-%m-%d').strftime('%m/%d/%y')
+
+
+def game_evidence(r):
+    '''
+    Evidence object for a game_details row.
+    '''
+    formatted_date = format_date(r['game_timestamp'])
+    return {
+        "table": "game_details",
+        "id": int(r["game_id"]),
+        "home_team": f"{r['home_city']} {r['home_name']}",
+        "away_team": f"{r['away_city']} {r['away_name']}",
+        "home_points": r["home_points"],
+        "away_points": r["away_points"],
+        "game_date": {formatted_date},
+        "display_name": f"{r['away_abbrev']}@{r['home_abbrev']} {formatted_date}"
+    }
+
+
+def player_evidence(r):
+    '''
+    Evidence object for a player_box_scores row.
+    '''
+    formatted_date = format_date(r['game_timestamp'])
+    return {
+        "table": "player_box_scores",
+        "id": f"{int(r['person_id'])}_{int(r['game_id'])}",
+        "player_name": f"{r['first_name']} {r['last_name']}",
+        "team": r["team_name"],
+        "points": r["points"],
+        "rebounds": r['oreb'] + r['dreb'],
+        "assists": r['assists'],
+        "game_id": int(r["game_id"]),
+        "display_name": f"{r['first_name']} {r['last_name']} {formatted_date}"
+    }
+
+
+def build_prompt(question, game_rows, player_rows):
+    '''
+    Format retrieved rows as context and wrap them in the chat prompt.
     '''
-    # Embed question
-    print('Received question')
-    qvec = ollama_embed(EMBED_MODEL, q.question)
-    
-    with eng.begin() as cx:
-        # Query games with team information
-        game_rows = list(cx.execute(
-            text(
-                "SELECT g.game_id, g.season, g.game_timestamp, "
-                "h.name AS home_name, h.city AS home_city, h.abbreviation AS home_abbrev, g.home_points, "
-                "a.name AS away_name, a.city AS away_city, a.abbreviation AS away_abbrev, g.away_points, "
-                "1 - (g.game_embedding <=> (:q)::vector) AS score, 'game_details' AS source "
-                "FROM game_details g "
-                "JOIN teams h ON g.home_team_id = h.team_id "
-                "JOIN teams a ON g.away_team_id = a.team_id "
-                f"ORDER BY game_embedding <-> ARRAY{qvec}::vector "
-                "LIMIT :k"
-            ),
-            {"q": qvec, "k": 5}
-        ).mappings())
-        
-        # Query players with team information
-        player_rows = list(cx.execute(
-            text(
-                "SELECT pbs.person_id, pbs.game_id, p.first_name, p.last_name, t.name AS team_name, "
-                "pbs.points, pbs.offensive_reb AS oreb, pbs.defensive_reb AS dreb, pbs.assists, "
-                "pbs.steals, pbs.blocks, pbs.turnovers, g.game_id, g.game_timestamp, "
-                "1 - (pbs.player_embedding <=> (:q)::vector) AS score, 'player_box_scores' AS source "
-                "FROM player_box_scores pbs "
-                "JOIN players p ON pbs.person_id = p.player_id "
-                "JOIN teams t ON pbs.team_id = t.team_id "
-                "JOIN game_details g ON g.game_id = pbs.game_id "
-                f"ORDER BY player_embedding <-> ARRAY{qvec}::vector "
-                "LIMIT :k"
-            ),
-            {"q": qvec, "k": 5}
-        ).mappings())
-    
     # Build context
     game_ctx = "\n".join([game_context(r) for r in game_rows])
     player_ctx = "\n".join([player_context(r) for r in player_rows])
@@ -112,7 +375,7 @@ def answer(q: Q):
         ctx = "No relevant data found."
 
     # LLM Prompt 
-    prompt = f"""Use context only:
+    return f"""Use context only:
     {ctx}
 
     Answer the question based on the context above. 
@@ -132,18 +395,107 @@ def answer(q: Q):
     
     Answer in 1-2 full sentences, feel free to restate game related details mentioned in the question, but don't include anything extra that wasn't requested.
     
-    Question: {q.question}
+    Question: {question}
     Answer:"""
 
-    resp = ollama_generate(LLM_MODEL, prompt)
-    print(resp)
-    
+
+EVIDENCE_PATTERN = r'\|\|\|EVIDENCE:([^:]+):([^\|]+)\|\|\|'
+
+
+class EvidenceTagFilter:
+    '''
+    Incrementally remove EVIDENCE_PATTERN tags from streamed LLM output, leaving the same text as the re.sub in
+    resolve_evidence(). feed() returns the text that is safe to show so far: anything that could still turn out to be
+    part of a tag (or trailing whitespace before one) is held back until later chunks decide it. close() flushes the rest.
+    The unfiltered text is kept in raw for evidence resolution.
+    '''
+    OPEN = "|||EVIDENCE:"
+    CLOSE = "|||"
+
+    def __init__(self):
+        self.raw = ""
+        self._pending = ""
+        self._ws = ""
+        self._started = False
+
+    def _partial_open(self):
+        # Length of the longest suffix of _pending that is a prefix of OPEN
+        for n in range(min(len(self.OPEN) - 1, len(self._pending)), 0, -1):
+            if self.OPEN.startswith(self._pending[-n:]):
+                return n
+        return 0
+
+    def _tag_end(self, start):
+        # End of the EVIDENCE_PATTERN match at _pending[start], False if there is none, None if more text is needed.
+        # The pattern is OPEN, text up to the first colon, then text up to the first pipe, which must start CLOSE
+        colon = self._pending.find(":", start + len(self.OPEN))
+        if colon == start + len(self.OPEN):
+            return False
+        if colon == -1:
+            return None
+        bar = self._pending.find("|", colon + 1)
+        if bar == colon + 1:
+            return False
+        if bar == -1:
+            return None
+        tail = self._pending[bar:bar + len(self.CLOSE)]
+        if tail == self.CLOSE:
+            return bar + len(self.CLOSE)
+        return None if self.CLOSE.startswith(tail) else False
+
+    def _visible(self, text):
+        # Hold back trailing whitespace until more visible text follows it, and drop leading whitespace,
+        # matching the .strip() on the non-streaming answer
+        text = self._ws + text
+        ready = text.rstrip()
+        self._ws = text[len(ready):]
+        if not self._started:
+            ready = ready.lstrip()
+            self._started = bool(ready)
+        return ready
+
+    def feed(self, chunk):
+        self.raw += chunk
+        self._pending += chunk
+        out = []
+        while True:
+            start = self._pending.find(self.OPEN)
+            if start == -1:
+                hold = self._partial_open()
+                out.append(self._visible(self._pending[:len(self._pending) - hold]))
+                self._pending = self._pending[len(self._pending) - hold:]
+                break
+            out.append(self._visible(self._pending[:start]))
+            self._pending = self._pending[start:]
+            end = self._tag_end(0)
+            if end is None:
+                break
+            if end is False:
+                # Not a tag: the regex moves on one character, so only that much is known to be visible
+                out.append(self._visible(self._pending[:1]))
+                self._pending = self._pending[1:]
+            else:
+                self._pending = self._pending[end:]
+        return "".join(out)
+
+    def close(self):
+        # Whatever is still undecided is settled by the regex itself now that the text is complete
+        rest = re.sub(EVIDENCE_PATTERN, "", self._pending)
+        self._pending = ""
+        return self._visible(rest)
+
+
+def resolve_evidence(resp, question, game_rows, player_rows):
+    '''
+    Extract the evidence tag from the LLM response and resolve it to evidence objects.
+    Falls back to the top-ranked game (and player, for player questions) rows when no tag matches.
+    Returns (answer without the tag, evidence list).
+    '''
     # Extract the evidence tag 
-    evidence_pattern = r'\|\|\|EVIDENCE:([^:]+):([^\|]+)\|\|\|'
-    evidence_match = re.search(evidence_pattern, resp)
+    evidence_match = re.search(EVIDENCE_PATTERN, resp)
     
     # Remove the evidence tag from the visible answer
-    clean_answer = re.sub(evidence_pattern, '', resp).strip()
+    clean_answer = re.sub(EVIDENCE_PATTERN, '', resp).strip()
     
     # Find the specific evidence that was used
     used_evidence = []
@@ -158,120 +510,435 @@ def answer(q: Q):
             
             # Add game evidence
             for r in game_rows:
-                game_date_str = str(r['game_timestamp']).split()[0]  
-                game_date = datetime.strptime(game_date_str, '%Y-%m-%d')
-                formatted_date = game_date.strftime('%m/%d/%y')
                 if str(r["game_id"]) == game_id:
-                    used_evidence.append({
-                        "table": "game_details",
-                        "id": int(r["game_id"]),
-                        "home_team": f"{r['home_city']} {r['home_name']}",
-                        "away_team": f"{r['away_city']} {r['away_name']}",
-                        "home_points": r["home_points"],
-                        "away_points": r["away_points"],
-                        "game_date": {formatted_date},
-                        "display_name": f"{r['away_abbrev']}@{r['home_abbrev']} {formatted_date}"
-                    })
+                    used_evidence.append(game_evidence(r))
                     break
             
             # Add player evidence
             for r in player_rows:
-                game_date_str = str(r['game_timestamp']).split()[0]  
-                game_date = datetime.strptime(game_date_str, '%Y-%m-%d')
-                formatted_date = game_date.strftime('%m/%d/%y')
                 if str(r['person_id']) == player_id and str(r['game_id']) == game_id:
-                    used_evidence.append({
-                        "table": "player_box_scores",
-                        "id": f"{int(r['person_id'])}_{int(r['game_id'])}",
-                        "player_name": f"{r['first_name']} {r['last_name']}",
-                        "team": r["team_name"],
-                        "points": r["points"],
-                        "rebounds": r['oreb'] + r['dreb'],
-                        "assists": r['assists'],
-                        "game_id": int(r["game_id"]),
-                        "display_name": f"{r['first_name']} {r['last_name']} {formatted_date}"
-                    })
+                    used_evidence.append(player_evidence(r))
                     break
                     
         # For game questions, we only want game evidence
         elif table_name == "game_details":
             for r in game_rows:
-                game_date_str = str(r['game_timestamp']).split()[0]  
-                game_date = datetime.strptime(game_date_str, '%Y-%m-%d')
-                formatted_date = game_date.strftime('%m/%d/%y')
                 if str(r["game_id"]) == row_id:
-                    used_evidence.append({
-                        "table": "game_details",
-                        "id": int(r["game_id"]),
-                        "home_team": f"{r['home_city']} {r['home_name']}",
-                        "away_team": f"{r['away_city']} {r['away_name']}",
-                        "home_points": r["home_points"],
-                        "away_points": r["away_points"],
-                        "game_date": {formatted_date},
-                        "display_name": f"{r['away_abbrev']}@{r['home_abbrev']} {formatted_date}"
-                    })
+                    used_evidence.append(game_evidence(r))
                     break
 
     # If no evidence found, use top results as fallback
     if not used_evidence:
-        question_lower = q.question.lower()
+        question_lower = question.lower()
         
         if any(word in question_lower for word in ['scored', 'points', 'player', 'who']):
             
             # Add top game and player rows as evidence for player-related questions
             if game_rows:
-                r = game_rows[0]
-                game_date_str = str(r['game_timestamp']).split()[0]  
-                game_date = datetime.strptime(game_date_str, '%Y-%m-%d')
-                formatted_date = game_date.strftime('%m/%d/%y')
-                used_evidence.append({
-                    "table": "game_details",
-                    "id": int(r["game_id"]),
-                    "home_team": f"{r['home_city']} {r['home_name']}",
-                    "away_team": f"{r['away_city']} {r['away_name']}",
-                    "home_points": r["home_points"],
-                    "away_points": r["away_points"],
-                    "game_date": {formatted_date},
-                    "display_name": f"{r['away_abbrev']}@{r['home_abbrev']} {formatted_date}"
-                })
-                
+                used_evidence.append(game_evidence(game_rows[0]))
             if player_rows:
-                r = player_rows[0]
-                game_date_str = str(r['game_timestamp']).split()[0]  
-                game_date = datetime.strptime(game_date_str, '%Y-%m-%d')
-                formatted_date = game_date.strftime('%m/%d/%y')
-                used_evidence.append({
-                    "table": "player_box_scores",
-                    "id": f"{int(r['person_id'])}_{int(r['game_id'])}",
-                    "player_name": f"{r['first_name']} {r['last_name']}",
-                    "team": r["team_name"],
-                    "points": r["points"],
-                    "rebounds": r['oreb'] + r['dreb'],
-                    "assists": r['assists'],
-                    "game_id": int(r["game_id"]),
-                   "display_name": f"{r['first_name']} {r['last_name']} {formatted_date}"
-                })
+                used_evidence.append(player_evidence(player_rows[0]))
         
         # Add top game only as game evidence        
-        else:
-            if game_rows:
-                r = game_rows[0]
-                game_date_str = str(r['game_timestamp']).split()[0]  
-                game_date = datetime.strptime(game_date_str, '%Y-%m-%d')
-                formatted_date = game_date.strftime('%m/%d/%y')
-                used_evidence.append({
-                    "table": "game_details",
-                    "id": int(r["game_id"]),
-                    "home_team": f"{r['home_city']} {r['home_name']}",
-                    "away_team": f"{r['away_city']} {r['away_name']}",
-                    "home_points": r["home_points"],
-                    "away_points": r["away_points"],
-                    "game_date": {formatted_date},
-                    "display_name": f"{r['away_abbrev']}@{r['home_abbrev']} {formatted_date}"
-                })
+        elif game_rows:
+            used_evidence.append(game_evidence(game_rows[0]))
             
-    return {
-        "answer": clean_answer,
-        "evidence": used_evidence
+    return clean_answer, used_evidence
+
+
+# Rows shown as evidence for season-level stat answers (the answer itself uses every game)
+STAT_EVIDENCE_ROWS = 5
+
+
+async def stat_answer(question):
+    '''
+    Answer recognized leader / season total / per-game average questions directly from SQL.
+    Returns the /api/chat payload, or None to fall through to retrieval and the LLM.
+    '''
+    if not STAT_QUERIES or RETRIEVAL_BACKEND == "snapshot" or classify(question) is None:
+        return None
+    async with read_connection(aeng, pool_metrics) as cx:
+        result = await cx.run_sync(answer_question, question, STAT_EVIDENCE_ROWS)
+    if result is None:
+        return None
+    evidence = [game_evidence(r) for r in result["game_rows"]] + [player_evidence(r) for r in result["player_rows"]]
+    return {"answer": result["answer"], "evidence": evidence}
+
+
+async def deps_unchanged_async(deps):
+    if RETRIEVAL_BACKEND == "snapshot":
+        return True     # A snapshot is read-only, its rows never change under a cached answer
+    async with read_connection(aeng, pool_metrics) as cx:
+        return await cx.run_sync(deps_unchanged, deps)
+
+
+async def embed_question(question):
+    '''
+    Encode the question on the embed thread pool so the event loop stays free.
+    '''
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(embed_executor, embed_query, EMBED_MODEL, question)
+
+
+async def answer_cache_key(question):
+    '''
+    Key for the answer cache: the stat, season, date, numbers, teams and players the question names (backend.filters).
+    None when the cache is off, so no connection is taken.
+    '''
+    if ANSWER_CACHE_SIZE <= 0:
+        return None
+    if RETRIEVAL_BACKEND == "snapshot":
+        from backend.snapshot import get_snapshot
+        return cache_key(question, get_snapshot().entities())
+    async with read_connection(aeng, pool_metrics) as cx:
+        return await cx.run_sync(question_cache_key, question)
+
+
+async def cached_answer(qvec, key):
+    '''
+    Return the cached answer to a near-identical earlier question about the same things (key) if its source rows
+    are unchanged, else None.
+    '''
+    found = answer_cache.candidate(qvec, key)
+    if found is None:
+        return None
+    entry_id, deps = found
+    if await deps_unchanged_async(deps):
+        return answer_cache.accept(entry_id)
+    answer_cache.reject(entry_id)
+    return None
+
+
+def split_rows(rows):
+    '''
+    Split combined retrieval rows into (game_rows, player_rows) dicts with their own columns.
+    '''
+    game_rows = [{c: r[c] for c in GAME_COLUMNS} for r in rows if r["source"] == "game_details"]
+    player_rows = [{c: r[c] for c in PLAYER_COLUMNS} for r in rows if r["source"] == "player_box_scores"]
+    return game_rows, player_rows
+
+
+def rank_rows(rows, ranked, key):
+    '''
+    Order rows to match a local index ranking [(key, score), ...] and attach the scores.
+    '''
+    by_key = {key(r): r for r in rows}
+    return [{**by_key[k], "score": score} for k, score in ranked if k in by_key]
+
+
+def local_candidates(index, game_ids, filters):
+    '''
+    Row indices of a LocalIndex passing the filters, or None to search every row (no filters, or nothing matched).
+    '''
+    if filters is None:
+        return None
+    rows = candidate_rows(index.keys, game_ids, filters["person_ids"])
+    return rows if rows is None or len(rows) else None
+
+
+async def lexical_ranking(question):
+    '''
+    Primary keys of games and box scores ranked by full-text match with the question, {name: [key tuple, ...]}.
+    '''
+    params = {"terms": tsquery(question), "k_lexical": HYBRID_K_LEXICAL}
+    ranking = {}
+    async with read_connection(aeng, pool_metrics) as cx:
+        for name in ("games", "players"):
+            rows = (await cx.execute(text(lexical_sql(name)), params)).all()
+            ranking[name] = [tuple(int(v) for v in r) for r in rows]
+    return ranking
+
+
+async def retrieve_rows_local(qvec, k_games, k_players, question=None):
+    '''
+    Rank with the in-process index, then fetch the ranked rows by primary key.
+    '''
+    store = get_local_store()
+    loop = asyncio.get_running_loop()
+    filters, game_ids, lexical = None, None, None
+    if FILTERED_RETRIEVAL and question:
+        with stage("filters"):
+            async with read_connection(aeng, pool_metrics) as cx:
+                filters = await cx.run_sync(question_filters, question)
+                if filters is not None:
+                    game_ids = await cx.run_sync(filtered_game_ids, filters)
+    if HYBRID_RETRIEVAL and question and filters is None:
+        with stage("lexical_search"):
+            lexical = await lexical_ranking(question)
+
+    def search(name, k):
+        index = getattr(store, name)
+        if lexical is not None:
+            return hybrid_keys(index, qvec, lexical[name], k)
+        return index.search_keys(qvec, k, local_candidates(index, game_ids, filters))
+
+    with stage("vector_search"):
+        games, players = await loop.run_in_executor(None, lambda: (search("games", k_games),
+                                                                   search("players", k_players)))
+    params = {
+        "game_ids": [k[0] for k, _ in games],
+        "person_ids": [k[0] for k, _ in players],
+        "player_game_ids": [k[1] for k, _ in players],
     }
-    
\ No newline at end of file
+    with stage("hydrate"):
+        async with read_connection(aeng, pool_metrics) as cx:
+            rows = (await cx.execute(text(HYDRATE_SQL), params)).mappings().all()
+
+    game_rows, player_rows = split_rows(rows)
+    return (rank_rows(game_rows, games, lambda r: (int(r["game_id"]),)),
+            rank_rows(player_rows, players, lambda r: (int(r["person_id"]), int(r["game_id"]))))
+
+
+async def retrieve_rows_snapshot(qvec, k_games, k_players, question=None):
+    '''
+    Rank and fetch rows from the memory-mapped snapshot, off the event loop. No database involved.
+    '''
+    from backend.snapshot import get_snapshot
+    snapshot = get_snapshot()
+    loop = asyncio.get_running_loop()
+
+    def search():
+        filters = extract_filters(question, snapshot.entities()) if FILTERED_RETRIEVAL and question else None
+        return (snapshot.search_games(qvec, k_games, filters, question),
+                snapshot.search_players(qvec, k_players, filters, question))
+
+    game_rows, player_rows = await loop.run_in_executor(None, search)
+    return ([{c: r[c] for c in GAME_COLUMNS} for r in game_rows],
+            [{c: r[c] for c in PLAYER_COLUMNS} for r in player_rows])
+
+
+async def retrieve_rows(qvec, question=None, k_games=5, k_players=5):
+    '''
+    Retrieve the top games and player box scores with team information in a single round-trip.
+    With a question, the search is narrowed to the teams, players and date it names (FILTERED_RETRIEVAL);
+    if nothing matches those, every row is searched, fusing vector and full-text ranks with HYBRID_RETRIEVAL.
+    Returns (game_rows, player_rows), each ordered by similarity (or fused score).
+    '''
+    if RETRIEVAL_BACKEND == "local":
+        return await retrieve_rows_local(qvec, k_games, k_players, question)
+    if RETRIEVAL_BACKEND == "snapshot":
+        return await retrieve_rows_snapshot(qvec, k_games, k_players, question)
+
+    params = {"q": np.asarray(qvec, dtype=np.float32), "k_games": k_games, "k_players": k_players,
+              **rerank_params()}
+    async with read_connection(aeng, pool_metrics) as cx:
+        if FILTERED_RETRIEVAL and question:
+            with stage("filters"):
+                filters = await cx.run_sync(question_filters, question)
+            if filters is not None:
+                sql, filter_params = filtered_retrieval_sql(filters)
+                rows = (await cx.execute(text(sql), {**params, **filter_params})).mappings().all()
+                if rows:
+                    return split_rows(rows)
+        if HYBRID_RETRIEVAL and question:
+            rows = (await cx.execute(text(HYBRID_SQL), {**params, **hybrid_params(question)})).mappings().all()
+        else:
+            rows = (await cx.execute(text(RETRIEVAL_SQL), params)).mappings().all()
+    return split_rows(rows)
+
+
+def local_index(name):
+    '''
+    The in-process index searched for one embedded table (RETRIEVAL_BACKEND local or snapshot).
+    '''
+    if RETRIEVAL_BACKEND == "snapshot":
+        from backend.snapshot import get_snapshot
+        return get_snapshot().index(name)
+    return getattr(get_local_store(), name)
+
+
+# HNSW indexes on the embedded tables, for pg_prewarm
+HNSW_INDEXES_SQL = """
+    SELECT CAST(CAST(i.indexrelid AS regclass) AS text)
+    FROM pg_index i
+    JOIN pg_class c ON c.oid = i.indexrelid
+    JOIN pg_am am ON am.oid = c.relam
+    WHERE am.amname = 'hnsw' AND i.indrelid = ANY(CAST(:tables AS regclass[]))
+"""
+
+
+async def warm_database():
+    '''
+    Open WARMUP_CONNECTIONS pooled connections at once (each registers the pgvector codec on connect)
+    and load the team and player name lookups used by the filters and stat questions.
+    '''
+    async def connect(load_names):
+        async with read_connection(aeng, pool_metrics) as cx:
+            await cx.execute(text("SELECT 1"))
+            if load_names:
+                await cx.run_sync(load_entities)
+
+    n = max(1, min(WARMUP_CONNECTIONS, DB_POOL_SIZE))
+    await asyncio.gather(*(connect(i == 0 and (FILTERED_RETRIEVAL or STAT_QUERIES)) for i in range(n)))
+
+
+async def prewarm_indexes():
+    '''
+    Load the vector indexes into memory before the first search: pgvector's HNSW indexes with pg_prewarm
+    (when the extension is installed), or the memory-mapped vectors of the local and snapshot backends.
+    Returns what was loaded, for /ready.
+    '''
+    if RETRIEVAL_BACKEND in ("local", "snapshot"):
+        loop = asyncio.get_running_loop()
+        size = await loop.run_in_executor(None, lambda: sum(local_index(name).prewarm() for name in EMBEDDED_TABLES))
+        return f"{size / 2**20:.0f} MB of vectors"
+    async with aeng.connect() as cx:
+        if not (await cx.execute(text("SELECT count(*) FROM pg_extension WHERE extname = 'pg_prewarm'"))).scalar():
+            return "skipped: pg_prewarm is not installed (CREATE EXTENSION pg_prewarm)"
+        tables = [table for table, _, _ in EMBEDDED_TABLES.values()]
+        indexes = (await cx.execute(text(HNSW_INDEXES_SQL), {"tables": tables})).scalars().all()
+        blocks = 0
+        for index in indexes:
+            blocks += (await cx.execute(text("SELECT pg_prewarm(CAST(:i AS regclass))"), {"i": index})).scalar()
+    return f"{len(indexes)} HNSW indexes, {blocks} blocks"
+
+
+async def timed(name, work):
+    start = time.perf_counter()
+    result = await work
+    readiness["stages"][name] = round(time.perf_counter() - start, 4)
+    return result
+
+
+async def warm_up():
+    '''
+    Load what the first request would otherwise wait for: the encoder (with one encode), the LLM client,
+    pooled database connections and name lookups, optionally the vector index pages, and the retrieval path
+    itself with one dummy search, which loads the local index or snapshot (and its full-text index) or
+    prepares the retrieval statement. Sets readiness["ready"] when done, or readiness["error"] on failure.
+    '''
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    try:
+        qvec = await timed("encoder", loop.run_in_executor(embed_executor, ollama_embed, EMBED_MODEL, "warm-up"))
+        if LLM_BACKEND != "fake":
+            await timed("llm_client", loop.run_in_executor(None, get_async_groq_client))
+        if RETRIEVAL_BACKEND != "snapshot":
+            await timed("database", warm_database())
+        if WARMUP_PREWARM:
+            readiness["prewarm"] = await timed("prewarm", prewarm_indexes())
+        await timed("retrieval", retrieve_rows(qvec, "warm-up"))
+        readiness["ready"] = True
+    except Exception as e:
+        readiness["error"] = f"{type(e).__name__}: {e}"
+        print(f"Warm-up failed: {readiness['error']}")
+    readiness["warmup_s"] = round(time.perf_counter() - start, 4)
+
+
+@app.post("/api/chat")
+async def answer(q: Q):
+    '''
+    Process a user question by retrieving relevant game and player data, generating an LLM-based answer, and returning evidence. 
+    The evidence algorithm extracts cited rows from the model output or falls back to top-ranked game and player rows when no explicit citation is found.
+    Evidence is used to visualize data associated with the question and answer in the UI.
+    The encode runs on a worker thread and retrieval is a single non-blocking query, so the event loop is never blocked.
+    '''
+    print('Received question')
+
+    with trace("/api/chat") as span:
+        # Leader and aggregate questions are computed exactly, no retrieval or LLM needed
+        with stage("stat"):
+            stat = await stat_answer(q.question)
+        if stat is not None:
+            span.set("outcome", "stat")
+            return stat
+
+        # Embed question
+        with stage("embed"):
+            qvec = await embed_question(q.question)
+        
+        # Reuse the answer to a near-identical earlier question if its source rows are unchanged
+        with stage("answer_cache"):
+            key = await answer_cache_key(q.question)
+            cached = await cached_answer(qvec, key)
+        if cached is not None:
+            span.set("outcome", "cached")
+            return cached
+
+        with stage("retrieve", backend=RETRIEVAL_BACKEND):
+            game_rows, player_rows = await retrieve_rows(qvec, q.question)
+
+        with stage("prompt"):
+            prompt = build_prompt(q.question, game_rows, player_rows)
+        with stage("llm"):
+            resp = await ollama_generate_async(LLM_MODEL, prompt)
+        print(resp)
+        
+        with stage("evidence"):
+            clean_answer, used_evidence = resolve_evidence(resp, q.question, game_rows, player_rows)
+        payload = {
+            "answer": clean_answer,
+            "evidence": used_evidence
+        }
+        answer_cache.store(qvec, payload, answer_deps(game_rows, player_rows), key)
+        span.set("outcome", "llm")
+        return payload
+
+
+def ndjson(event):
+    return json.dumps(jsonable_encoder(event)) + "\n"
+
+
+@app.post("/api/chat/stream")
+async def answer_stream(q: Q):
+    '''
+    Streaming variant of /api/chat, as newline-delimited JSON events:
+    - {"type": "token", "text": ...} for each piece of the answer as the LLM produces it (evidence tag removed)
+    - {"type": "evidence", "evidence": [...]} once the answer is complete, same objects as /api/chat
+    - {"type": "done"}
+    '''
+    async def events():
+        with trace("/api/chat/stream") as span:
+            with stage("stat"):
+                stat = await stat_answer(q.question)
+            if stat is not None:
+                span.set("outcome", "stat")
+                yield ndjson({"type": "token", "text": stat["answer"]})
+                yield ndjson({"type": "evidence", "evidence": stat["evidence"]})
+                yield ndjson({"type": "done"})
+                return
+
+            with stage("embed"):
+                qvec = await embed_question(q.question)
+
+            with stage("answer_cache"):
+                key = await answer_cache_key(q.question)
+                cached = await cached_answer(qvec, key)
+            if cached is not None:
+                span.set("outcome", "cached")
+                yield ndjson({"type": "token", "text": cached["answer"]})
+                yield ndjson({"type": "evidence", "evidence": cached["evidence"]})
+                yield ndjson({"type": "done"})
+                return
+
+            with stage("retrieve", backend=RETRIEVAL_BACKEND):
+                game_rows, player_rows = await retrieve_rows(qvec, q.question)
+
+            with stage("prompt"):
+                prompt = build_prompt(q.question, game_rows, player_rows)
+
+            # The llm stage includes the time the client takes to read the stream; llm_first_token does not
+            tag_filter = EvidenceTagFilter()
+            with stage("llm") as llm:
+                async for delta in ollama_stream_async(LLM_MODEL, prompt):
+                    if "first_token_seconds" not in llm.attributes:
+                        llm.set("first_token_seconds", observe("llm_first_token", llm.elapsed()))
+                    visible = tag_filter.feed(delta)
+                    if visible:
+                        yield ndjson({"type": "token", "text": visible})
+            visible = tag_filter.close()
+            if visible:
+                yield ndjson({"type": "token", "text": visible})
+
+            with stage("evidence"):
+                clean_answer, used_evidence = resolve_evidence(tag_filter.raw, q.question, game_rows, player_rows)
+            yield ndjson({"type": "evidence", "evidence": used_evidence})
+            yield ndjson({"type": "done"})
+            answer_cache.store(qvec, {"answer": clean_answer, "evidence": used_evidence}, answer_deps(game_rows, player_rows),
+                               key)
+            span.set("outcome", "llm")
+
+    return StreamingResponse(in_own_context(events()), media_type="application/x-ndjson")
+
+
+readiness["import_s"] = round(time.perf_counter() - IMPORT_STARTED, 4)
@@ -0,0 +1,496 @@
+'''
+Columnar snapshot of the four tables plus embeddings, for running retrieval without Postgres.
+
+Layout of a snapshot directory (SNAPSHOT_DIR):
+- manifest.json:             row counts, primary keys and per-column type and encoding
+- tables/{table}.{col}.npy:  one array per column, rows sorted by primary key
+    - integers, floats and booleans are stored as-is (with {col}.nulls.npy when the column has blanks)
+    - text columns are dictionary-encoded: int32 codes plus {col}.dict.json (-1 for NULL)
+    - timestamps and dates are datetime64
+- {name}_keys.npy, {name}_vectors.npy, {name}_hashes.npy: embeddings (see backend.vector_store)
+
+Every array is memory-mapped read-only, so opening a snapshot costs only the manifest read, pages are
+shared between processes, and RETRIEVAL_BACKEND=snapshot answers questions with no database at all.
+
+Usage:
+    python -m backend.snapshot export [--out DIR]            # from Postgres, with embeddings
+    python -m backend.snapshot export --from-csv [--out DIR] # tables only, from backend/data
+    python -m backend.snapshot import [--dir DIR]            # restore a snapshot into Postgres
+'''
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import numpy as np
+import pandas as pd
+import sqlalchemy as sa
+from pathlib import Path
+from sqlalchemy import text
+from backend.config import DB_DSN, SNAPSHOT_DIR, LOCAL_INDEX, INGEST_CHUNK_SIZE, HYBRID_RETRIEVAL
+from backend.ingest import TABLES, SCHEMAS, csv_path, read_chunks
+from backend.vector_store import EMBEDDED_TABLES, LocalStore, save_array, export_embeddings
+from backend.stats_query import build_entities
+from backend.filters import candidate_rows
+from backend.lexical import LexicalIndex, hybrid_search, search_terms
+from backend.frames import game_frame, player_frame
+
+MANIFEST = "manifest.json"
+SNAPSHOT_VERSION = 1
+
+
+def encode_column(values, pg_type):
+    '''
+    Convert one column to (arrays to save by suffix, encoding name).
+    '''
+    nulls = values.isna().to_numpy()
+    if pg_type == "text":
+        codes, uniques = pd.factorize(values, use_na_sentinel=True)
+        return {"npy": codes.astype(np.int32), "dict.json": [str(u) for u in uniques]}, "dict"
+    if pg_type in ("timestamp", "date"):
+        unit = "datetime64[ns]" if pg_type == "timestamp" else "datetime64[D]"
+        return {"npy": pd.to_datetime(values).to_numpy().astype(unit)}, "datetime"
+    if pg_type == "double precision":
+        return {"npy": values.to_numpy(dtype=np.float64, na_value=np.nan)}, "plain"
+
+    dtype = {"bigint": np.int64, "integer": np.int32, "boolean": np.bool_}[pg_type]
+    arrays = {"npy": values.to_numpy(dtype=dtype, na_value=0)}
+    if nulls.any():
+        arrays["nulls.npy"] = nulls
+    return arrays, "plain"
+
+
+def write_table(out_dir, table, df):
+    '''
+    Write one table as per-column arrays sorted by primary key. Returns its manifest entry.
+    '''
+    schema = SCHEMAS[table]
+    df = df.sort_values(schema["primary_key"], kind="stable").reset_index(drop=True)
+    tables_dir = Path(out_dir) / "tables"
+    tables_dir.mkdir(parents=True, exist_ok=True)
+
+    columns = {}
+    for col, pg_type in schema["columns"]:
+        arrays, encoding = encode_column(df[col], pg_type)
+        for suffix, arr in arrays.items():
+            path = tables_dir / f"{table}.{col}.{suffix}"
+            if suffix == "dict.json":
+                tmp = f"{path}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(arr, f, ensure_ascii=False)
+                os.replace(tmp, path)
+            else:
+                save_array(path, arr)
+        columns[col] = {"type": pg_type, "encoding": encoding, "nulls": "nulls.npy" in arrays}
+    return {"rows": len(df), "primary_key": schema["primary_key"], "columns": columns}
+
+
+def write_manifest(out_dir, tables, embeddings):
+    manifest = {"version": SNAPSHOT_VERSION, "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "tables": tables, "embeddings": embeddings}
+    path = Path(out_dir) / MANIFEST
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+
+def export_hashes(eng, out_dir):
+    '''
+    Write {name}_hashes.npy, row-aligned with the {name}_keys.npy written by export_embeddings().
+    '''
+    counts = {}
+    with eng.connect() as cx:
+        for name, (table, column, key_cols) in EMBEDDED_TABLES.items():
+            keys = ", ".join(key_cols)
+            hashes = cx.execute(text(
+                f"SELECT COALESCE({column}_hash, '') FROM {table} WHERE {column} IS NOT NULL ORDER BY {keys}"
+            )).scalars().all()
+            save_array(Path(out_dir) / f"{name}_hashes.npy", np.array(hashes, dtype="S64"))
+            counts[name] = {"rows": len(hashes)}
+    return counts
+
+
+def export_snapshot(out_dir=SNAPSHOT_DIR, from_csv=False):
+    '''
+    Write a snapshot of the four tables (from Postgres, or from the CSVs with from_csv) and, from Postgres,
+    the embeddings.
+    '''
+    start = time.perf_counter()
+    tables, embeddings = {}, {}
+    if from_csv:
+        for t in TABLES:
+            df = pd.concat(read_chunks(csv_path(t), t), ignore_index=True)
+            tables[t] = write_table(out_dir, t, df)
+            print(f"  {t:<18} {len(df):>8} rows")
+    else:
+        eng = sa.create_engine(DB_DSN)
+        with eng.connect() as cx:
+            for t in TABLES:
+                cols = ", ".join(c for c, _ in SCHEMAS[t]["columns"])
+                df = pd.read_sql(text(f"SELECT {cols} FROM {t}"), cx)
+                tables[t] = write_table(out_dir, t, df)
+                print(f"  {t:<18} {len(df):>8} rows")
+        export_embeddings(eng, out_dir)
+        embeddings = export_hashes(eng, out_dir)
+    write_manifest(out_dir, tables, embeddings)
+
+    size = sum(f.stat().st_size for f in Path(out_dir).rglob("*") if f.is_file()
+               and not f.name.endswith((".hnsw", ".int8.npy", ".int8_scale.npy", ".binary.npy")))
+    print(f"Wrote snapshot to {out_dir} ({size / 2**20:.1f} MB) in {time.perf_counter() - start:.2f}s")
+
+
+class SnapshotTable:
+    '''
+    Read-only view of one snapshot table. Columns are memory-mapped on first use.
+    '''
+
+    def __init__(self, snapshot_dir, name, meta):
+        self.name = name
+        self.meta = meta
+        self.rows = meta["rows"]
+        self._dir = Path(snapshot_dir) / "tables"
+        self._arrays = {}
+        self._dicts = {}
+
+    def _load(self, path):
+        return np.load(self._dir / path, mmap_mode="r")
+
+    def column(self, col):
+        '''
+        Raw column array (dictionary codes for text columns).
+        '''
+        if col not in self._arrays:
+            self._arrays[col] = self._load(f"{self.name}.{col}.npy")
+        return self._arrays[col]
+
+    def values(self, col, idx):
+        '''
+        Decoded values of a column at the given row indices, as a list (None for NULL).
+        '''
+        info = self.meta["columns"][col]
+        raw = self.column(col)[idx]
+        if info["encoding"] == "dict":
+            if col not in self._dicts:
+                with open(self._dir / f"{self.name}.{col}.dict.json", encoding="utf-8") as f:
+                    self._dicts[col] = np.array(json.load(f) + [None], dtype=object)   # code -1 -> None
+            return self._dicts[col][raw].tolist()
+        if info["encoding"] == "datetime":
+            return [None if pd.isna(v) else pd.Timestamp(v) for v in raw]
+        values = raw.tolist()
+        if info["nulls"]:
+            nulls = self._load(f"{self.name}.{col}.nulls.npy")[idx]
+            values = [None if n else v for v, n in zip(values, nulls.tolist())]
+        return values
+
+    def frame(self, idx=None, cols=None):
+        '''
+        Decode rows (all rows if idx is None) into a DataFrame.
+        '''
+        idx = np.arange(self.rows) if idx is None else np.asarray(idx, dtype=np.int64)
+        cols = cols or list(self.meta["columns"])
+        # Nullable integers stay integers (not floats), so the frame can be COPYed straight into typed tables
+        nullable_int = {c for c in cols if self.meta["columns"][c]["type"] in ("bigint", "integer")}
+        return pd.DataFrame({c: pd.array(self.values(c, idx), dtype="Int64") if c in nullable_int else self.values(c, idx)
+                             for c in cols})
+
+    def find(self, keys):
+        '''
+        Row indices for primary keys (tuples, in primary key order); -1 where a key is missing.
+        Rows are sorted by primary key, so each lookup is a binary search on the memory-mapped key columns.
+        '''
+        pk = [self.column(c) for c in self.meta["primary_key"]]
+        out = np.full(len(keys), -1, dtype=np.int64)
+        for i, key in enumerate(keys):
+            lo, hi = 0, self.rows
+            for col, value in zip(pk, key):
+                lo, hi = lo + np.searchsorted(col[lo:hi], value, "left"), lo + np.searchsorted(col[lo:hi], value, "right")
+            if hi > lo:
+                out[i] = lo
+        return out
+
+    def where_in(self, col, values):
+        '''
+        Row indices whose column value is in values.
+        '''
+        return np.flatnonzero(np.isin(self.column(col), np.asarray(values)))
+
+
+class Snapshot:
+    '''
+    All four tables plus the vector indexes of a snapshot directory, with the joins retrieval needs.
+    Rows come back with the same columns as the retrieval SQL in backend.rag and backend.server.
+    '''
+
+    def __init__(self, snapshot_dir=SNAPSHOT_DIR, method=LOCAL_INDEX):
+        snapshot_dir = Path(snapshot_dir)
+        with open(snapshot_dir / MANIFEST, encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {self.manifest.get('version')} in {snapshot_dir}")
+        self.dir = snapshot_dir
+        self.method = method
+        self.tables = {t: SnapshotTable(snapshot_dir, t, meta) for t, meta in self.manifest["tables"].items()}
+        # Vector indexes are opened on first search, so table-only snapshots (export --from-csv) still load
+        self.store = None
+        self._hashes = {}
+        self._teams = None
+        self._entities = None
+        self._lexical = {}
+        self._lexical_lock = threading.Lock()
+
+    def teams(self):
+        '''
+        team_id -> (city, name, abbreviation); there are only a few dozen teams, so this is decoded once.
+        '''
+        if self._teams is None:
+            t = self.tables["teams"]
+            idx = np.arange(t.rows)
+            self._teams = dict(zip(t.values("team_id", idx),
+                                   zip(t.values("city", idx), t.values("name", idx), t.values("abbreviation", idx))))
+        return self._teams
+
+    def game_rows(self, game_ids):
+        '''
+        Game rows with home and away team names, in the order of game_ids (missing ids are skipped).
+        '''
+        games = self.tables["game_details"]
+        idx = games.find([(g,) for g in game_ids])
+        idx = idx[idx >= 0]
+        cols = {c: games.values(c, idx) for c in
+                ["game_id", "season", "game_timestamp", "home_team_id", "away_team_id", "home_points", "away_points"]}
+        teams = self.teams()
+        rows = []
+        for i in range(len(idx)):
+            home, away = teams[cols["home_team_id"][i]], teams[cols["away_team_id"][i]]
+            rows.append({
+                "game_id": cols["game_id"][i], "season": cols["season"][i], "game_timestamp": cols["game_timestamp"][i],
+                "home_name": home[1], "home_city": home[0], "home_abbrev": home[2], "home_points": cols["home_points"][i],
+                "away_name": away[1], "away_city": away[0], "away_abbrev": away[2], "away_points": cols["away_points"][i],
+                "source": "game_details",
+            })
+        return rows
+
+    def _player_rows(self, idx):
+        pbs = self.tables["player_box_scores"]
+        cols = {c: pbs.values(c, idx) for c in
+                ["person_id", "game_id", "team_id", "points", "offensive_reb", "defensive_reb", "assists",
+                 "steals", "blocks", "turnovers"]}
+        players = self.tables["players"]
+        pidx = players.find([(p,) for p in cols["person_id"]])
+        first = players.values("first_name", np.maximum(pidx, 0))
+        last = players.values("last_name", np.maximum(pidx, 0))
+        games = self.tables["game_details"]
+        gidx = games.find([(g,) for g in cols["game_id"]])
+        stamps = games.values("game_timestamp", np.maximum(gidx, 0))
+        seasons = games.values("season", np.maximum(gidx, 0))
+        teams = self.teams()
+
+        rows = []
+        for i in range(len(idx)):
+            # Inner joins, as in the SQL: skip box scores without player metadata
+            if pidx[i] < 0 or gidx[i] < 0:
+                continue
+            rows.append({
+                "person_id": cols["person_id"][i], "game_id": cols["game_id"][i],
+                "first_name": first[i], "last_name": last[i], "team_name": teams[cols["team_id"][i]][1],
+                "points": cols["points"][i], "oreb": cols["offensive_reb"][i], "dreb": cols["defensive_reb"][i],
+                "assists": cols["assists"][i], "steals": cols["steals"][i], "blocks": cols["blocks"][i],
+                "turnovers": cols["turnovers"][i], "season": seasons[i], "game_timestamp": stamps[i],
+                "source": "player_box_scores",
+            })
+        return rows
+
+    def player_rows(self, keys):
+        '''
+        Box score rows for (person_id, game_id) keys, in the order given (missing keys are skipped).
+        '''
+        idx = self.tables["player_box_scores"].find(keys)
+        return self._player_rows(idx[idx >= 0])
+
+    def players_in_games(self, game_ids):
+        '''
+        Every box score row of the given games, ordered by game and then points, highest first.
+        '''
+        rows = self._player_rows(self.tables["player_box_scores"].where_in("game_id", game_ids))
+        return sorted(rows, key=lambda r: (r["game_id"], -r["points"]))
+
+    def entities(self):
+        '''
+        Team and player name lookups for backend.filters, as stats_query.load_entities() builds them from the database.
+        '''
+        if self._entities is None:
+            teams = self.tables["teams"].frame(cols=["team_id", "city", "name", "abbreviation"])
+            players = self.tables["players"].frame(cols=["player_id", "first_name", "last_name"])
+            self._entities = build_entities(teams.to_dict("records"), players.to_dict("records"))
+        return self._entities
+
+    def filtered_game_ids(self, filters):
+        '''
+        game_ids passing the game part of backend.filters filters, or None if it has no game clauses.
+        Same predicates as filters.game_clauses(), evaluated on the memory-mapped columns.
+        '''
+        if filters["date"] is None and not filters["team_ids"]:
+            return None
+        games = self.tables["game_details"]
+        mask = np.ones(games.rows, dtype=bool)
+        if filters["date"] is not None:
+            year, month, day = filters["date"]
+            stamps = pd.DatetimeIndex(np.asarray(games.column("game_timestamp")))
+            mask &= (stamps.month == month) & (stamps.day == day)
+            if year is not None:
+                mask &= stamps.year == year
+        for team_id in filters["team_ids"]:
+            mask &= (games.column("home_team_id") == team_id) | (games.column("away_team_id") == team_id)
+        if filters["season"] is not None:
+            mask &= games.column("season") == filters["season"]
+        return np.asarray(games.column("game_id"))[mask]
+
+    def index(self, name):
+        if self.store is None:
+            self.store = LocalStore(self.dir, self.method)
+        return getattr(self.store, name)
+
+    def row_texts(self, name):
+        '''
+        Embedding texts (backend.embed.row_texts_*) of one embedded table, row-aligned with its LocalIndex,
+        rebuilt from the snapshot tables (None for rows missing from them).
+        '''
+        from backend.embed import row_texts_game, row_texts_player
+
+        frame, row_texts = {"games": (game_frame, row_texts_game), "players": (player_frame, row_texts_player)}[name]
+        df = frame({t: table.frame() for t, table in self.tables.items()})
+        key_cols = EMBEDDED_TABLES[name][2]
+        texts = df[key_cols].astype("int64").assign(row_text=row_texts(df).to_numpy())
+        keys = pd.DataFrame(self.index(name).keys, columns=key_cols)
+        aligned = keys.merge(texts, on=key_cols, how="left")["row_text"]
+        return [t if isinstance(t, str) else None for t in aligned]
+
+    def lexical(self, name):
+        '''
+        BM25 index over row_texts(name), built on first use (HYBRID_RETRIEVAL).
+        '''
+        if name not in self._lexical:
+            with self._lexical_lock:
+                if name not in self._lexical:
+                    self._lexical[name] = LexicalIndex(self.row_texts(name))
+        return self._lexical[name]
+
+    def _search(self, name, qvec, k, filters=None, question=None):
+        '''
+        (key tuples, scores, content hashes) of the top-k embedded rows of one table,
+        among the rows passing filters when any pass (see backend.filters).
+        Otherwise, with HYBRID_RETRIEVAL and a question, vector and full-text ranks are fused (backend.lexical).
+        '''
+        if name not in self._hashes:
+            self._hashes[name] = np.load(self.dir / f"{name}_hashes.npy", mmap_mode="r")
+        index = self.index(name)
+        rows = None
+        if filters is not None:
+            rows = candidate_rows(index.keys, self.filtered_game_ids(filters), filters["person_ids"])
+            if rows is not None and len(rows) == 0:
+                rows = None
+        # Filtered candidates are already few enough to rank exactly, so fusion only applies to unfiltered searches
+        if HYBRID_RETRIEVAL and question and rows is None:
+            idx, scores = hybrid_search(index, self.lexical(name), qvec, question, k, rows)
+        else:
+            idx, scores = index.search(qvec, k, rows)
+        keys = [tuple(int(v) for v in index.keys[i]) for i in idx]
+        return keys, scores.tolist(), [h.decode() or None for h in self._hashes[name][idx]]
+
+    def search_games(self, qvec, k, filters=None, question=None):
+        '''
+        Top-k game rows by similarity, with their scores and content hashes.
+        '''
+        keys, scores, hashes = self._search("games", qvec, k, filters, question)
+        extra = {key: {"score": s, "row_hash": h} for key, s, h in zip(keys, scores, hashes)}
+        return [{**r, **extra[(r["game_id"],)]} for r in self.game_rows([key[0] for key in keys])]
+
+    def search_players(self, qvec, k, filters=None, question=None):
+        '''
+        Top-k box score rows by similarity, with their scores and content hashes.
+        '''
+        keys, scores, hashes = self._search("players", qvec, k, filters, question)
+        extra = {key: {"score": s, "row_hash": h} for key, s, h in zip(keys, scores, hashes)}
+        return [{**r, **extra[(r["person_id"], r["game_id"])]} for r in self.player_rows(keys)]
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def get_snapshot():
+    '''
+    Lazily open the process-wide Snapshot (RETRIEVAL_BACKEND=snapshot).
+    '''
+    global _snapshot
+    if _snapshot is None:
+        with _snapshot_lock:
+            if _snapshot is None:
+                _snapshot = Snapshot()
+    return _snapshot
+
+
+def import_snapshot(snapshot_dir=SNAPSHOT_DIR, chunksize=INGEST_CHUNK_SIZE):
+    '''
+    Restore a snapshot into Postgres in one transaction: typed tables, embeddings with their hashes and full-text
+    search terms, aggregates.
+    '''
+    from backend.ingest import create_table, copy_chunks
+    from backend.embed import write_embeddings
+    from backend.quantize import create_vector_index
+    from backend.aggregates import build_aggregates
+
+    snap = Snapshot(snapshot_dir, "exact")
+    start = time.perf_counter()
+    eng = sa.create_engine(DB_DSN)
+    with eng.begin() as cx:
+        cx.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        for t in TABLES:
+            create_table(cx, t)
+        cx.execute(text(f"TRUNCATE {', '.join(TABLES)}"))
+        for t in TABLES:
+            table = snap.tables[t]
+            cols = [c for c, _ in SCHEMAS[t]["columns"]]
+            chunks = (table.frame(np.arange(i, min(i + chunksize, table.rows)), cols) for i in range(0, table.rows, chunksize))
+            print(f"  {t:<18} {copy_chunks(cx, t, cols, chunks):>8} rows")
+
+        for name, (t, column, key_cols) in EMBEDDED_TABLES.items():
+            if name not in snap.manifest["embeddings"]:
+                continue
+            cx.execute(text(f"ALTER TABLE {t} ADD COLUMN IF NOT EXISTS {column} vector(768)"))
+            cx.execute(text(f"ALTER TABLE {t} ADD COLUMN IF NOT EXISTS {column}_hash text"))
+            cx.execute(text(f"ALTER TABLE {t} ADD COLUMN IF NOT EXISTS {column}_terms tsvector"))
+            index = snap.index(name)
+            hashes = np.load(Path(snapshot_dir) / f"{name}_hashes.npy")
+            terms = search_terms(row_text or "" for row_text in snap.row_texts(name))
+            for i in range(0, len(index), chunksize):
+                write_embeddings(cx, t, column, key_cols, index.keys[i:i + chunksize],
+                                 np.asarray(index.vectors[i:i + chunksize]), [h.decode() for h in hashes[i:i + chunksize]],
+                                 terms[i:i + chunksize])
+            create_vector_index(cx, t, column)
+            cx.execute(text(f"CREATE INDEX IF NOT EXISTS idx_{t}_{column}_terms ON {t} USING gin ({column}_terms)"))
+            print(f"  {name:<18} {len(index):>8} embeddings")
+        build_aggregates(cx)
+    print(f"Imported snapshot from {snapshot_dir} in {time.perf_counter() - start:.2f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export, import and inspect columnar snapshots of the database.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="Write a snapshot from Postgres (or from the CSVs with --from-csv)")
+    export.add_argument("--out", default=SNAPSHOT_DIR)
+    export.add_argument("--from-csv", action="store_true", help="Build the tables from backend/data without a database")
+    restore = sub.add_parser("import", help="Load a snapshot into Postgres, replacing the four tables")
+    restore.add_argument("--dir", default=SNAPSHOT_DIR)
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        export_snapshot(args.out, args.from_csv)
+    else:
+        import_snapshot(args.dir)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,616 @@
+'''
+Deterministic answers for stat questions the database can compute directly, without the LLM:
+- leader:       who led a game (or one team in a game) in a stat, or the league / a team over a season
+- season_total: a player's total for a stat over a season
+- average:      a player's per-game average for a stat (over a season, or every loaded game)
+
+plan_question() turns a question into a plan dict, or None when the question is not one of these shapes;
+run_plan() executes the plan with indexed lookups on player_box_scores (game_id, person_id) and
+game_details (season). Questions that are not recognized, or that match no rows, fall back to RAG.
+'''
+import re
+import threading
+import unicodedata
+import numpy as np
+from datetime import date
+from sqlalchemy import text
+
+# Categories at 10 or more in a box score, for double- and triple-doubles
+DOUBLE_DIGITS = """(CAST(pbs.points >= 10 AS int) + CAST(pbs.offensive_reb + pbs.defensive_reb >= 10 AS int)
+    + CAST(pbs.assists >= 10 AS int) + CAST(pbs.steals >= 10 AS int) + CAST(pbs.blocks >= 10 AS int))"""
+
+# stat -> (SQL expression over player_box_scores pbs, keywords naming it in a question)
+STATS = {
+    "points": ("pbs.points", ["points", "point", "scorer", "scoring", "scored"]),
+    "rebounds": ("pbs.offensive_reb + pbs.defensive_reb", ["rebounds", "rebound", "rebounder", "rebounding", "boards"]),
+    "assists": ("pbs.assists", ["assists", "assist", "dimes"]),
+    "steals": ("pbs.steals", ["steals", "steal"]),
+    "blocks": ("pbs.blocks", ["blocks", "block", "blocked shots"]),
+    "turnovers": ("pbs.turnovers", ["turnovers", "turnover"]),
+    "threes": ("pbs.fg3_made", ["threes", "three pointers", "three-pointers", "3-pointers", "3 pointers", "3pm"]),
+    "double_doubles": (f"CAST({DOUBLE_DIGITS} >= 2 AS int)", ["double-doubles", "double doubles", "double-double", "double double"]),
+    "triple_doubles": (f"CAST({DOUBLE_DIGITS} >= 3 AS int)", ["triple-doubles", "triple doubles", "triple-double", "triple double"]),
+}
+STAT_LABELS = {"threes": "three-pointers", "double_doubles": "double-doubles", "triple_doubles": "triple-doubles"}
+# Stats with a per-game leader (a game has no double-double "leader")
+LEADER_STATS = ["points", "rebounds", "assists", "steals", "blocks", "turnovers", "threes"]
+# Team season stats (team_season_stats); wins and losses are only asked about teams
+TEAM_STATS = LEADER_STATS + ["wins", "losses"]
+TEAM_RESULT_PATTERN = re.compile(r"\b(?:(wins|win|won)|(losses|loss|lost))\b")
+
+STAT_PATTERN = re.compile(
+    r"\b(" + "|".join(sorted((re.escape(w) for _, words in STATS.values() for w in words), key=len, reverse=True)) + r")\b"
+)
+STAT_BY_WORD = {w: stat for stat, (_, words) in STATS.items() for w in words}
+
+LEADER_PATTERN = re.compile(r"\b(led|lead|leads|leading|leader|leaders|most|highest|top)\b")
+# Leader plans name a player: a game's leader, or a season's leader by total
+PLAYER_SUBJECT_PATTERN = re.compile(r"\b(?:who|whom|whose)\b|\b(?:which|what)\b(?:\s+[\w.'-]+){0,3}?\s+players?\b")
+# Single-game highs, and questions about a team or a game rather than a player, which no plan answers
+NOT_A_LEADER_PATTERN = re.compile(
+    r"\b(?:single|one|a|any|individual)[- ]game\b|\bhighest[- ]scoring games?\b|\b(?:game|career|season)[- ]highs?\b"
+    r"|\b(?:which|what)\s+(?:teams?|games?|franchise|club)\b"
+)
+AVERAGE_PATTERN = re.compile(r"\b(average|averaged|averages|averaging|avg|per game)\b")
+TOTAL_PATTERN = re.compile(r"\b(how many|total|totals|totaled|combined)\b")
+
+MONTHS = {
+    "january": 1, "jan": 1, "february": 2, "feb": 2, "march": 3, "mar": 3, "april": 4, "apr": 4, "may": 5,
+    "june": 6, "jun": 6, "july": 7, "jul": 7, "august": 8, "aug": 8, "september": 9, "sept": 9, "sep": 9,
+    "october": 10, "oct": 10, "november": 11, "nov": 11, "december": 12, "dec": 12,
+}
+HOLIDAYS = {
+    "christmas eve": (12, 24), "christmas": (12, 25), "new year's eve": (12, 31), "new years eve": (12, 31),
+    "new year's day": (1, 1), "new years day": (1, 1), "halloween": (10, 31), "valentine's day": (2, 14),
+    "valentines day": (2, 14),
+}
+ISO_DATE = re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b")
+NUMERIC_DATE = re.compile(r"\b(\d{1,2})/(\d{1,2})(?:/(\d{4}|\d{2}))?\b")
+NAMED_DATE = re.compile(
+    r"\b(" + "|".join(sorted(MONTHS, key=len, reverse=True)) + r")\.?\s+(\d{1,2})(?:st|nd|rd|th)?\b(?:,?\s+(\d{4}))?"
+)
+HOLIDAY_PATTERN = re.compile(r"\b(" + "|".join(re.escape(h) for h in HOLIDAYS) + r")\b(?:,?\s+(\d{4})\b(?!\s*[-/]))?")
+SEASON_PATTERN = re.compile(
+    r"\b(\d{4})(?:\s*[-/]\s*(?:\d{4}|\d{2}))?\s+(?:nba\s+)?(?:regular\s+)?season\b|\bseason\s+(\d{4})\b"
+)
+
+# Words around a single team mention that mean the whole game is meant ("Nuggets game", "against the Nuggets")
+GAME_SCOPE_WORDS = ("game", "vs", "v.", "versus", "against", "@", "at ", "matchup", "-")
+# After the first of two teams, joins them into one matchup ("Lakers and Celtics game")
+MATCHUP_WORDS = ("and ", "& ")
+# After a team, makes it the subject of the question ("Which Lakers player")
+TEAM_PLAYER_WORDS = ("player", "players")
+OPPONENT_PATTERN = re.compile(r"\b(?:vs\.?|versus|against|at|@)\s+(?:the\s+)?$")
+
+GAME_SELECT = """
+    SELECT g.game_id, g.season, g.game_timestamp,
+            h.name AS home_name, h.city AS home_city, h.abbreviation AS home_abbrev, g.home_points,
+            a.name AS away_name, a.city AS away_city, a.abbreviation AS away_abbrev, g.away_points
+    FROM game_details g
+    JOIN teams h ON g.home_team_id = h.team_id
+    JOIN teams a ON g.away_team_id = a.team_id
+    """
+
+# Players missing from the players table still count towards aggregates, under a placeholder name
+PLAYER_SELECT = """
+    SELECT pbs.person_id, pbs.game_id,
+            COALESCE(p.first_name, 'Player') AS first_name, COALESCE(p.last_name, CAST(pbs.person_id AS text)) AS last_name,
+            t.name AS team_name, pbs.points, pbs.offensive_reb AS oreb, pbs.defensive_reb AS dreb, pbs.assists,
+            pbs.steals, pbs.blocks, pbs.turnovers, g.game_timestamp, g.season,
+            {stat} AS value
+    FROM player_box_scores pbs
+    LEFT JOIN players p ON pbs.person_id = p.player_id
+    JOIN teams t ON pbs.team_id = t.team_id
+    JOIN game_details g ON pbs.game_id = g.game_id
+    """
+
+SEASON_LEADER_SQL = """
+    SELECT pbs.person_id, CAST(SUM({stat}) AS bigint) AS value, COUNT(*) AS games
+    FROM player_box_scores pbs
+    JOIN game_details g ON pbs.game_id = g.game_id
+    WHERE g.season = :season {team_filter}
+    GROUP BY pbs.person_id
+    ORDER BY value DESC
+    LIMIT 5
+    """
+
+AGGREGATES_EXIST_SQL = """
+    SELECT to_regclass('player_season_stats') IS NOT NULL AND to_regclass('team_season_stats') IS NOT NULL
+            AND to_regclass('game_stat_leaders') IS NOT NULL
+    """
+
+# Lookups on the aggregate tables built by backend.aggregates ({stat} is a column name from STATS / TEAM_STATS)
+SEASON_LEADER_AGG_SQL = """
+    SELECT person_id, CAST(SUM({stat}) AS bigint) AS value, CAST(SUM(games) AS bigint) AS games
+    FROM player_season_stats
+    WHERE season = :season {team_filter}
+    GROUP BY person_id
+    ORDER BY value DESC
+    LIMIT 5
+    """
+
+PLAYER_TOTALS_AGG_SQL = """
+    SELECT CAST(SUM(games) AS bigint) AS games, CAST(SUM({stat}) AS bigint) AS value
+    FROM player_season_stats
+    WHERE person_id = :person_id{season_filter}
+    """
+
+TEAM_SEASON_AGG_SQL = """
+    SELECT t.city, t.name, s.games, s.{stat} AS value
+    FROM team_season_stats s
+    JOIN teams t ON s.team_id = t.team_id
+    WHERE s.team_id = :team_id AND s.season = :season
+    """
+
+_entities = None
+_entities_lock = threading.Lock()
+
+
+def fold(s):
+    '''
+    Strip accents so "Dončić" and "Doncic" compare equal.
+    '''
+    return unicodedata.normalize("NFKD", s).encode("ascii", "ignore").decode("ascii")
+
+
+def alias_pattern(aliases, flags=0):
+    return re.compile(r"(?<![\w'])(" + "|".join(sorted(map(re.escape, aliases), key=len, reverse=True)) + r")(?![\w])", flags)
+
+
+def build_entities(teams, players):
+    '''
+    Compile name lookups from teams (team_id, city, name, abbreviation) and players (player_id, first_name, last_name) rows.
+    Aliases of three characters or fewer (abbreviations, "LA") only match in upper case.
+    '''
+    teams = [dict(t) for t in teams]
+    cities = {}
+    for t in teams:
+        cities.setdefault(t["city"].lower(), []).append(t)
+
+    team_aliases = {}
+    for t in teams:
+        for alias in (f"{t['city']} {t['name']}", t["name"], t["abbreviation"]):
+            team_aliases[alias] = t
+        if len(cities[t["city"].lower()]) == 1:
+            team_aliases[t["city"]] = t
+
+    long_aliases = {a.lower(): t for a, t in team_aliases.items() if len(a) > 3}
+    short_aliases = {a: t for a, t in team_aliases.items() if len(a) <= 3}
+
+    full_names, last_names = {}, {}
+    for p in players:
+        full_names.setdefault(fold(f"{p['first_name']} {p['last_name']}").lower(), []).append(int(p["player_id"]))
+        last_names.setdefault(fold(p["last_name"]), []).append(int(p["player_id"]))
+    unique_last = {n: ids[0] for n, ids in last_names.items() if len(ids) == 1 and len(n) > 2}
+
+    return {
+        "long_teams": long_aliases,
+        "long_team_pattern": alias_pattern(long_aliases, re.IGNORECASE),
+        "short_teams": short_aliases,
+        "short_team_pattern": alias_pattern(short_aliases),
+        "full_names": full_names,
+        "full_name_pattern": alias_pattern(full_names, re.IGNORECASE),
+        "last_names": unique_last,
+        "last_name_pattern": alias_pattern(unique_last),
+    }
+
+
+def load_entities(cx):
+    '''
+    Team and player name lookups, loaded from the database once per process.
+    '''
+    global _entities
+    with _entities_lock:
+        if _entities is None:
+            teams = cx.execute(text("SELECT team_id, city, name, abbreviation FROM teams")).mappings().all()
+            players = cx.execute(text("SELECT player_id, first_name, last_name FROM players")).mappings().all()
+            _entities = build_entities(teams, players)
+            # Aggregate tables from backend.aggregates, when ingest has built them
+            _entities["aggregates"] = cx.execute(text(AGGREGATES_EXIST_SQL)).scalar()
+        return _entities
+
+
+def reset_entities():
+    '''
+    Forget the cached name lookups (after re-ingesting teams or players).
+    '''
+    global _entities
+    with _entities_lock:
+        _entities = None
+
+
+def find_teams(question, entities):
+    '''
+    Teams mentioned in the question as [(team, start, end)] offsets of the first mention, in order, without repeats.
+    '''
+    found = []
+    for m in entities["long_team_pattern"].finditer(question):
+        found.append((m.start(), m.end(), entities["long_teams"][m.group(1).lower()]))
+    for m in entities["short_team_pattern"].finditer(question):
+        found.append((m.start(), m.end(), entities["short_teams"][m.group(1)]))
+
+    teams, seen = [], set()
+    for start, end, t in sorted(found, key=lambda f: f[0]):
+        if t["team_id"] not in seen:
+            seen.add(t["team_id"])
+            teams.append((t, start, end))
+    return teams
+
+
+def find_players(question, entities):
+    '''
+    Player ids mentioned in the question, by full name, or by a last name that only one player has.
+    '''
+    ids = []
+    for m in entities["full_name_pattern"].finditer(question):
+        ids.extend(entities["full_names"][m.group(1).lower()])
+    if not ids:
+        for m in entities["last_name_pattern"].finditer(question):
+            ids.append(entities["last_names"][m.group(1)])
+    return list(dict.fromkeys(ids))
+
+
+def find_stat(q):
+    '''
+    The single stat a lowercased question asks about, or None if it names none or several.
+    "Scored" only implies points when no other stat is named ("who scored the most rebounds").
+    '''
+    stats = {STAT_BY_WORD[m.group(1)]: m.group(1) for m in STAT_PATTERN.finditer(q)}
+    if len(stats) > 1 and stats.get("points") in ("scored", "scoring"):
+        del stats["points"]
+    return next(iter(stats)) if len(stats) == 1 else None
+
+
+def find_season(q):
+    m = SEASON_PATTERN.search(q)
+    if not m:
+        return None
+    return int(m.group(1) or m.group(3))
+
+
+def find_date(q):
+    '''
+    (year or None, month, day) for the first date in a lowercased question, or None.
+    '''
+    m = ISO_DATE.search(q)
+    if m:
+        return int(m.group(1)), int(m.group(2)), int(m.group(3))
+    m = NUMERIC_DATE.search(q)
+    if m:
+        year = m.group(3) and int(m.group(3))
+        if year and year < 100:
+            year += 2000
+        return year or None, int(m.group(1)), int(m.group(2))
+    m = NAMED_DATE.search(q)
+    if m:
+        return (m.group(3) and int(m.group(3))) or None, MONTHS[m.group(1)], int(m.group(2))
+    m = HOLIDAY_PATTERN.search(q)
+    if m:
+        return (m.group(2) and int(m.group(2))) or None, *HOLIDAYS[m.group(1)]
+    return None
+
+
+def resolve_date(q, season):
+    '''
+    find_date() with the year filled in from the season when only a month and day are given.
+    None if there is no date; ValueError if it is not a real calendar date.
+    '''
+    game_date = find_date(q)
+    if game_date is None:
+        return None
+    year, month, day = game_date
+    # Seasons span September to June: 4/9 in the 2023 season is April 9, 2024
+    if year is None and season is not None:
+        year = season if month >= 9 else season + 1
+    date(year or 2000, month, day)
+    return year, month, day
+
+
+def classify(question):
+    '''
+    Cheap first pass that needs no database: (kind, stat) for questions the planner may handle, else None.
+    '''
+    q = fold(question).lower()
+    stat = find_stat(q)
+    if stat is None:
+        m = TEAM_RESULT_PATTERN.search(q)
+        if m is None:
+            return None
+        stat = "wins" if m.group(1) else "losses"
+    leader = LEADER_PATTERN.search(q)
+    average = AVERAGE_PATTERN.search(q)
+    if leader and not average:
+        # "Which player had the highest scoring game", "Which team scored the most": no plan has that shape
+        if NOT_A_LEADER_PATTERN.search(q) or not PLAYER_SUBJECT_PATTERN.search(q):
+            return None
+        return "leader", stat
+    if average and not leader:
+        return "average", stat
+    if TOTAL_PATTERN.search(q):
+        return "season_total", stat
+    return None
+
+
+def team_role(q, teams, i):
+    '''
+    How the i-th team mention scopes a leader question: "subject" (its players: "Which Lakers player",
+    "led the Lakers") or "game" (the whole game: "Lakers game", "against the Lakers", "Lakers vs Celtics").
+    '''
+    _, start, end = teams[i]
+    following = q[end:].lstrip(" '")
+    if following.startswith(TEAM_PLAYER_WORDS):
+        return "subject"
+    if following.startswith(GAME_SCOPE_WORDS) or OPPONENT_PATTERN.search(q[:start]):
+        return "game"
+    if len(teams) == 2 and i == 0 and following.startswith(MATCHUP_WORDS):
+        return "game"
+    return "subject"
+
+
+def plan_question(question, entities):
+    '''
+    Turn a question into a plan dict for run_plan(), or None if it is not a recognized stat question.
+    '''
+    kind_stat = classify(question)
+    if kind_stat is None:
+        return None
+    kind, stat = kind_stat
+
+    folded = fold(question)
+    q = folded.lower()
+    season = find_season(q)
+    try:
+        game_date = resolve_date(q, season)
+    except ValueError:
+        return None
+
+    teams = find_teams(folded, entities)
+    players = find_players(folded, entities)
+    plan = {"kind": kind, "stat": stat, "season": season, "date": game_date,
+            "team_ids": [int(t["team_id"]) for t, _, _ in teams], "team_id": None, "person_id": None}
+
+    if kind == "leader":
+        if players or len(teams) > 2 or stat not in STATS:
+            return None
+        roles = [team_role(q, teams, i) for i in range(len(teams))]
+        subjects = [plan["team_ids"][i] for i, role in enumerate(roles) if role == "subject"]
+        # Two teams that could each be the one asked about: the scope is unclear, so leave it to RAG
+        if len(subjects) > 1:
+            return None
+        if subjects:
+            plan["team_id"] = subjects[0]
+        if game_date is not None:
+            if stat not in LEADER_STATS:
+                return None
+            plan["scope"] = "game"
+        elif season is not None:
+            # A season leader against one opponent, or in one matchup, has no plan
+            if "game" in roles:
+                return None
+            plan["scope"] = "season"
+        else:
+            return None
+        return plan
+
+    # Totals and averages are over whole seasons, not single games
+    if game_date is not None:
+        return None
+
+    # Team season totals and averages come from team_season_stats
+    if not players and len(teams) == 1:
+        if season is None or stat not in TEAM_STATS or (kind == "average" and stat in ("wins", "losses")):
+            return None
+        plan["team_id"] = plan["team_ids"][0]
+        return plan
+
+    if len(players) != 1 or stat not in STATS:
+        return None
+    if kind == "season_total" and season is None:
+        return None
+    plan["person_id"] = players[0]
+    return plan
+
+
+def stat_label(stat, value):
+    label = STAT_LABELS.get(stat, stat)
+    return label[:-1] if value == 1 else label
+
+
+def player_name(r):
+    return f"{r['first_name']} {r['last_name']}"
+
+
+def join_names(names):
+    return names[0] if len(names) == 1 else ", ".join(names[:-1]) + " and " + names[-1]
+
+
+def game_label(g):
+    return f"{g['away_city']} {g['away_name']} at {g['home_city']} {g['home_name']} on {str(g['game_timestamp']).split()[0]}"
+
+
+def find_games(cx, plan):
+    '''
+    Games on the plan's date involving every mentioned team.
+    '''
+    year, month, day = plan["date"]
+    clauses = [
+        "EXTRACT(MONTH FROM CAST(g.game_timestamp AS timestamp)) = CAST(:month AS int)",
+        "EXTRACT(DAY FROM CAST(g.game_timestamp AS timestamp)) = CAST(:day AS int)",
+    ]
+    params = {"month": month, "day": day}
+    if year is not None:
+        clauses.append("EXTRACT(YEAR FROM CAST(g.game_timestamp AS timestamp)) = CAST(:year AS int)")
+        params["year"] = year
+    for i, team_id in enumerate(plan["team_ids"]):
+        clauses.append(f":team_{i} IN (g.home_team_id, g.away_team_id)")
+        params[f"team_{i}"] = team_id
+    sql = GAME_SELECT + "WHERE " + " AND ".join(clauses)
+    return list(cx.execute(text(sql), params).mappings())
+
+
+def limit_clause(limit):
+    return "" if limit is None else f" LIMIT {int(limit)}"
+
+
+def game_leader(cx, plan, aggregates, evidence_limit):
+    games = find_games(cx, plan)
+    if len(games) != 1:
+        return None
+    game = games[0]
+
+    params = {"game_id": game["game_id"], "stat": plan["stat"], "team_id": plan["team_id"]}
+    if aggregates:
+        # Leaders were ranked at ingest time, so this is one indexed lookup on game_stat_leaders
+        sql = PLAYER_SELECT.format(stat="l.value") + """
+    JOIN game_stat_leaders l ON l.game_id = pbs.game_id AND l.person_id = pbs.person_id AND l.team_id = pbs.team_id
+    WHERE l.game_id = :game_id AND l.stat = :stat
+    """
+        sql += "AND l.team_id = :team_id AND l.team_leader" if plan["team_id"] is not None else "AND l.game_leader"
+        leaders = list(cx.execute(text(sql), params).mappings())
+    else:
+        sql = PLAYER_SELECT.format(stat=STATS[plan["stat"]][0]) + "WHERE pbs.game_id = :game_id"
+        if plan["team_id"] is not None:
+            sql += " AND pbs.team_id = :team_id"
+        rows = list(cx.execute(text(sql + " ORDER BY value DESC"), params).mappings())
+        leaders = [r for r in rows if r["value"] == rows[0]["value"]]
+    if not leaders:
+        return None
+
+    best = leaders[0]["value"]
+    scope = leaders[0]["team_name"] if plan["team_id"] is not None else "the game"
+    names = join_names([player_name(r) for r in leaders])
+    return {
+        "answer": f"{names} led {scope} with {best} {stat_label(plan['stat'], best)} ({game_label(game)}).",
+        "game_rows": [game],
+        "player_rows": leaders[:evidence_limit],
+        "fields": {"player_name": names, "team": leaders[0]["team_name"], plan["stat"]: best,
+                   "game_id": int(game["game_id"]), "value": best},
+    }
+
+
+def season_leader(cx, plan, aggregates, evidence_limit):
+    team_filter = "AND pbs.team_id = :team_id" if plan["team_id"] is not None else ""
+    params = {"season": plan["season"], "team_id": plan["team_id"]}
+    if aggregates:
+        sql = SEASON_LEADER_AGG_SQL.format(stat=plan["stat"], team_filter=team_filter.replace("pbs.", ""))
+    else:
+        sql = SEASON_LEADER_SQL.format(stat=STATS[plan["stat"]][0], team_filter=team_filter)
+    totals = list(cx.execute(text(sql), params).mappings())
+    if not totals:
+        return None
+
+    best = totals[0]["value"]
+    leader_ids = [int(r["person_id"]) for r in totals if r["value"] == best]
+    rows = list(cx.execute(
+        text(PLAYER_SELECT.format(stat=STATS[plan["stat"]][0]) +
+             "WHERE pbs.person_id = ANY(:person_ids) AND g.season = :season " + team_filter +
+             " ORDER BY value DESC" + limit_clause(evidence_limit)),
+        {**params, "person_ids": leader_ids},
+    ).mappings())
+    if not rows:
+        return None
+
+    names = join_names(list(dict.fromkeys(player_name(r) for r in rows)))
+    scope = rows[0]["team_name"] if plan["team_id"] is not None else "the league"
+    return {
+        "answer": f"{names} led {scope} with {best} {stat_label(plan['stat'], best)} in the {plan['season']} season.",
+        "game_rows": [],
+        "player_rows": rows,
+        "fields": {"player_name": names, plan["stat"]: best, "season": plan["season"], "value": best},
+    }
+
+
+def player_season(cx, plan, aggregates, evidence_limit):
+    season_filter = " AND g.season = :season" if plan["season"] is not None else ""
+    params = {"person_id": plan["person_id"], "season": plan["season"]}
+    rows = list(cx.execute(
+        text(PLAYER_SELECT.format(stat=STATS[plan["stat"]][0]) + "WHERE pbs.person_id = :person_id" + season_filter +
+             " ORDER BY value DESC" + (limit_clause(evidence_limit) if aggregates else "")),
+        params,
+    ).mappings())
+    if not rows:
+        return None
+
+    if aggregates:
+        sql = PLAYER_TOTALS_AGG_SQL.format(stat=plan["stat"], season_filter=season_filter.replace("g.", ""))
+        totals = cx.execute(text(sql), params).mappings().one()
+        games, total = int(totals["games"]), int(totals["value"])
+    else:
+        # Without the aggregate tables, total the player's box scores here
+        values = np.array([r["value"] for r in rows], dtype=np.float64)
+        games, total = len(values), int(values.sum())
+        rows = rows[:evidence_limit]
+
+    name = player_name(rows[0])
+    period = f"the {plan['season']} season" if plan["season"] is not None else "all loaded games"
+    if plan["kind"] == "average":
+        value = round(total / games, 1)
+        text_answer = f"{name} averaged {value} {STAT_LABELS.get(plan['stat'], plan['stat'])} per game over {games} games in {period}."
+    else:
+        value = total
+        text_answer = f"{name} recorded {value} {stat_label(plan['stat'], value)} over {games} games in {period}."
+    return {
+        "answer": text_answer,
+        "game_rows": [],
+        "player_rows": rows,
+        "fields": {"player_name": name, plan["stat"]: value, "games": games, "season": plan["season"], "value": value},
+    }
+
+
+def team_season(cx, plan, aggregates, evidence_limit):
+    if not aggregates:
+        return None
+    row = cx.execute(text(TEAM_SEASON_AGG_SQL.format(stat=plan["stat"])),
+                     {"team_id": plan["team_id"], "season": plan["season"]}).mappings().first()
+    if row is None:
+        return None
+    games = list(cx.execute(
+        text(GAME_SELECT + "WHERE :team_id IN (g.home_team_id, g.away_team_id) AND g.season = :season "
+             "ORDER BY g.game_timestamp" + limit_clause(evidence_limit)),
+        {"team_id": plan["team_id"], "season": plan["season"]},
+    ).mappings())
+
+    team = f"{row['city']} {row['name']}"
+    games_played, total = int(row["games"]), int(row["value"])
+    if plan["kind"] == "average":
+        value = round(total / games_played, 1)
+        text_answer = (f"The {team} averaged {value} {STAT_LABELS.get(plan['stat'], plan['stat'])} per game "
+                       f"over {games_played} games in the {plan['season']} season.")
+    else:
+        value = total
+        text_answer = (f"The {team} recorded {value} {stat_label(plan['stat'], value)} "
+                       f"over {games_played} games in the {plan['season']} season.")
+    return {
+        "answer": text_answer,
+        "game_rows": games,
+        "player_rows": [],
+        "fields": {"team": team, plan["stat"]: value, "games": games_played, "season": plan["season"], "value": value},
+    }
+
+
+def run_plan(cx, plan, aggregates=False, evidence_limit=None):
+    '''
+    Execute a plan, from the aggregate tables when they exist, else from the box scores.
+    Returns {"answer", "game_rows", "player_rows", "fields"}, or None if no rows match.
+    player_rows are the box scores behind the answer, largest value first, capped at evidence_limit.
+    '''
+    if plan["kind"] == "leader":
+        run = game_leader if plan["scope"] == "game" else season_leader
+    elif plan["person_id"] is not None:
+        run = player_season
+    else:
+        run = team_season
+    return run(cx, plan, aggregates, evidence_limit)
+
+
+def answer_question(cx, question, evidence_limit=None):
+    '''
+    Answer a recognized stat question straight from the database, or return None to fall back to RAG.
+    '''
+    if classify(question) is None:
+        return None
+    entities = load_entities(cx)
+    plan = plan_question(question, entities)
+    if plan is None:
+        return None
+    return run_plan(cx, plan, entities["aggregates"], evidence_limit)
@@ -13,27 +13,62 @@
 #     r.raise_for_status()
 #     return r.json()["response"]
 
-from groq import Groq
-from sentence_transformers import SentenceTransformer
-from backend.config import GROQ_API_KEY, EMBED_MODEL, LLM_MODEL
+import re
+import time
+import random
+import asyncio
+import threading
+from backend.config import (GROQ_API_KEY, EMBED_BACKEND, LLM_MODEL, EMBED_BATCH_SIZE,
+                            QUERY_CACHE_SIZE, QUERY_CACHE_TTL, QUERY_CACHE_NORMALIZE, QUERY_CACHE_PATH,
+                            LLM_BACKEND, FAKE_LLM_LATENCY, LLM_MAX_RETRIES, LLM_RETRY_DELAY)
+from backend.cache import EmbeddingCache
+from backend.encoders import load_encoder, encoder_id
 
-# Initialize Groq client
-groq_client = Groq(api_key=GROQ_API_KEY)
+# Groq clients (sync for the CLI, async for the API server), created on first use so importing
+# this module does not import the groq SDK
+_groq_client = None
+_async_groq_client = None
 
-# Initialize sentence transformer for embeddings (lazy load)
+# Encoder for embeddings, SentenceTransformer or ONNX Runtime per EMBED_BACKEND (lazy load)
 _embed_model = None
+_embed_model_lock = threading.Lock()
 
-def get_embed_model():
-    """Lazy load the embedding model."""
+# Cache of question embeddings, shared by the API server and the CLI
+query_cache = EmbeddingCache(maxsize=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL,
+                             normalize=QUERY_CACHE_NORMALIZE, path=QUERY_CACHE_PATH)
+
+def get_groq_client():
+    """Lazily create the sync Groq client."""
+    global _groq_client
+    if _groq_client is None:
+        from groq import Groq
+        _groq_client = Groq(api_key=GROQ_API_KEY)
+    return _groq_client
+
+
+def get_async_groq_client():
+    """Lazily create the async Groq client."""
+    global _async_groq_client
+    if _async_groq_client is None:
+        from groq import AsyncGroq
+        _async_groq_client = AsyncGroq(api_key=GROQ_API_KEY)
+    return _async_groq_client
+
+
+def get_embed_model(num_threads=None):
+    """Lazy load the embedding model (num_threads caps its threads, applied on the first call only)."""
     global _embed_model
     if _embed_model is None:
-        _embed_model = SentenceTransformer(EMBED_MODEL)
+        # The server's warm-up and a first request can ask at the same time; load the model once
+        with _embed_model_lock:
+            if _embed_model is None:
+                _embed_model = load_encoder(EMBED_BACKEND, num_threads)
     return _embed_model
 
 
 def ollama_embed(model: str, text: str):
     """
-    Generate embeddings using sentence-transformers.
+    Generate embeddings using the EMBED_BACKEND encoder.
     Returns a list of floats (768-dimensional vector).
     Note: model parameter is kept for backward compatibility but not used.
     """
@@ -42,19 +77,81 @@ def ollama_embed(model: str, text: str):
     return embedding.tolist()
 
 
+def embed_query(model: str, text: str):
+    """
+    Embed a user question, going through the query embedding cache (keyed on the model and EMBED_BACKEND).
+    Returns a list of floats (768-dimensional vector).
+    """
+    return query_cache.get_or_compute(encoder_id(model, EMBED_BACKEND), text, ollama_embed)
+
+
+def ollama_embed_batch(model: str, texts, batch_size: int = EMBED_BATCH_SIZE):
+    """
+    Generate embeddings for a list of texts in a single encode call.
+    Returns a float32 numpy array of shape (len(texts), 768).
+    Note: model parameter is kept for backward compatibility but not used.
+    """
+    embed_model = get_embed_model()
+    return embed_model.encode(list(texts), batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+
+
+def embed_queries(model: str, texts):
+    """
+    Embed several questions at once: cached vectors are reused and the misses are encoded in one batch.
+    Returns a list of vectors (lists of floats) in the order of texts.
+    """
+    key = encoder_id(model, EMBED_BACKEND)
+    vecs = [query_cache.get(key, t) for t in texts]
+    missing = [i for i, v in enumerate(vecs) if v is None]
+    if missing:
+        for i, vec in zip(missing, ollama_embed_batch(model, [texts[i] for i in missing])):
+            vecs[i] = vec.tolist()
+            query_cache.put(key, texts[i], vecs[i])
+    return vecs
+
+
+def fake_answer(prompt: str):
+    """
+    Deterministic local stand-in for the hosted LLM (LLM_BACKEND=fake), for tests and benchmarks.
+    Answers with the first game in the prompt's context and cites it with an evidence tag.
+    """
+    match = re.search(r"Game (?:ID )?(\d+) on", prompt)
+    if not match:
+        return "I could not find that in the available data."
+    return f"Game {match.group(1)} is the most relevant game in the context.\n|||EVIDENCE:game_details:{match.group(1)}|||"
+
+
+def fake_generate(prompt: str):
+    """
+    fake_answer() after sleeping FAKE_LLM_LATENCY seconds to simulate generation time.
+    """
+    if FAKE_LLM_LATENCY:
+        time.sleep(FAKE_LLM_LATENCY)
+    return fake_answer(prompt)
+
+
+def chat_messages(prompt: str):
+    """
+    System + user messages sent to the chat completion API.
+    """
+    return [
+        {"role": "system", "content": "You are a helpful NBA statistics assistant."},
+        {"role": "user", "content": prompt}
+    ]
+
+
 def ollama_generate(model: str, prompt: str):
     """
-    Generate text using Groq API.
+    Generate text using Groq API (or the local fake LLM when LLM_BACKEND=fake).
     Returns the generated text as a string.
     Note: model parameter is kept for backward compatibility but uses LLM_MODEL from config.
     """
+    if LLM_BACKEND == "fake":
+        return fake_generate(prompt)
     try:
-        response = groq_client.chat.completions.create(
+        response = get_groq_client().chat.completions.create(
             model=LLM_MODEL,
-            messages=[
-                {"role": "system", "content": "You are a helpful NBA statistics assistant."},
-                {"role": "user", "content": prompt}
-            ],
+            messages=chat_messages(prompt),
             temperature=0.3,  # Lower temperature for more consistent responses
             max_tokens=2048
         )
@@ -62,4 +159,96 @@ def ollama_generate(model: str, prompt: str):
     except Exception as e:
         print(f"Error calling Groq API: {e}")
         return "I'm sorry, I encountered an error processing your request."
-    
\ No newline at end of file
+
+
+async def ollama_generate_async(model: str, prompt: str):
+    """
+    Non-blocking ollama_generate for the async API server, using the async Groq client.
+    """
+    if LLM_BACKEND == "fake":
+        if FAKE_LLM_LATENCY:
+            await asyncio.sleep(FAKE_LLM_LATENCY)
+        return fake_answer(prompt)
+    try:
+        response = await get_async_groq_client().chat.completions.create(
+            model=LLM_MODEL,
+            messages=chat_messages(prompt),
+            temperature=0.3,
+            max_tokens=2048
+        )
+        return response.choices[0].message.content
+    except Exception as e:
+        print(f"Error calling Groq API: {e}")
+        return "I'm sorry, I encountered an error processing your request."
+
+
+def retry_delay(error, attempt):
+    """
+    Seconds to wait before retrying a failed LLM call: the server's Retry-After if it sent one,
+    otherwise exponential backoff from LLM_RETRY_DELAY with a little jitter.
+    """
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(retry_after)
+    except (TypeError, ValueError):
+        return LLM_RETRY_DELAY * 2 ** attempt * (1 + random.random() / 4)
+
+
+async def generate_with_retry(model: str, prompt: str, retries: int = LLM_MAX_RETRIES):
+    """
+    ollama_generate_async for batch jobs: rate limits (429), timeouts, connection and server errors are retried
+    up to `retries` times. Other errors, or running out of retries, return the usual apology.
+    """
+    if LLM_BACKEND == "fake":
+        return await ollama_generate_async(model, prompt)
+    from groq import RateLimitError, APIConnectionError, InternalServerError
+    for attempt in range(retries + 1):
+        try:
+            response = await get_async_groq_client().chat.completions.create(
+                model=LLM_MODEL,
+                messages=chat_messages(prompt),
+                temperature=0.3,
+                max_tokens=2048
+            )
+            return response.choices[0].message.content
+        except (RateLimitError, APIConnectionError, InternalServerError) as e:
+            if attempt == retries:
+                print(f"Error calling Groq API after {retries} retries: {e}")
+                break
+            delay = retry_delay(e, attempt)
+            print(f"  Groq API {type(e).__name__}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+        except Exception as e:
+            print(f"Error calling Groq API: {e}")
+            break
+    return "I'm sorry, I encountered an error processing your request."
+
+
+async def ollama_stream_async(model: str, prompt: str):
+    """
+    Stream the completion for prompt as text deltas, as they arrive from the async Groq client.
+    The fake LLM yields its answer word by word, spreading FAKE_LLM_LATENCY across the words.
+    """
+    if LLM_BACKEND == "fake":
+        words = re.findall(r"\S+\s*", fake_answer(prompt))
+        for w in words:
+            if FAKE_LLM_LATENCY:
+                await asyncio.sleep(FAKE_LLM_LATENCY / len(words))
+            yield w
+        return
+    try:
+        stream = await get_async_groq_client().chat.completions.create(
+            model=LLM_MODEL,
+            messages=chat_messages(prompt),
+            temperature=0.3,
+            max_tokens=2048,
+            stream=True
+        )
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+    except Exception as e:
+        print(f"Error calling Groq API: {e}")
+        yield "I'm sorry, I encountered an error processing your request."
@@ -0,0 +1,262 @@
+import os
+import sys
+import time
+import argparse
+import threading
+import numpy as np
+import sqlalchemy as sa
+from pathlib import Path
+from backend.config import DB_DSN, LOCAL_INDEX, LOCAL_HNSW_EF, SNAPSHOT_DIR, VECTOR_QUANTIZATION, QUANTIZED_RERANK
+
+# (table, embedding column, key columns) for each searchable snapshot
+EMBEDDED_TABLES = {
+    "games": ("game_details", "game_embedding", ["game_id"]),
+    "players": ("player_box_scores", "player_embedding", ["person_id", "game_id"]),
+}
+
+# In-process quantizations of LocalIndex (VECTOR_QUANTIZATION); others, like pgvector's halfvec, search exactly
+LOCAL_QUANTIZATIONS = ("int8", "binary")
+# Rows scored per block of the int8 first pass; a 768 KB float32 temporary stays in cache
+QUANT_BLOCK = 256
+
+
+def save_array(path, arr):
+    '''
+    np.save to a temporary file then rename, so readers never see a half-written snapshot file.
+    '''
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, arr)
+    os.replace(tmp, path)
+
+
+def export_embeddings(eng, out_dir=SNAPSHOT_DIR):
+    '''
+    Write every embedded row to out_dir as two .npy files per table:
+    - {name}_keys.npy: int64 (n, len(key columns)) primary keys
+    - {name}_vectors.npy: float32 (n, 768) unit-normalized embeddings, row-aligned with the keys
+    '''
+    from pgvector.psycopg2 import register_vector
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    with eng.connect() as cx:
+        raw = cx.connection.dbapi_connection
+        register_vector(raw)
+        for name, (table, column, key_cols) in EMBEDDED_TABLES.items():
+            start = time.perf_counter()
+            keys = ", ".join(key_cols)
+            with raw.cursor() as cur:
+                cur.execute(f"SELECT {keys}, {column} FROM {table} WHERE {column} IS NOT NULL ORDER BY {keys}")
+                rows = cur.fetchall()
+
+            n_keys = len(key_cols)
+            key_arr = np.array([r[:n_keys] for r in rows], dtype=np.int64).reshape(len(rows), n_keys)
+            vectors = np.array([r[n_keys] for r in rows], dtype=np.float32).reshape(len(rows), -1)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors /= np.where(norms > 0, norms, 1)
+
+            save_array(out_dir / f"{name}_keys.npy", key_arr)
+            save_array(out_dir / f"{name}_vectors.npy", np.ascontiguousarray(vectors))
+            print(f"Exported {len(rows)} {name} embeddings in {time.perf_counter() - start:.1f}s")
+
+
+def quantize_vectors(vectors, method):
+    '''
+    Codes for the first pass of a quantized LocalIndex:
+    - int8:   (int8 codes, float32 per-dimension scale) with vectors ~= codes * scale
+    - binary: (sign bits packed into uint8, None), 1 bit per dimension
+    '''
+    if method == "binary":
+        bits = np.empty((len(vectors), (vectors.shape[1] + 7) // 8), dtype=np.uint8)
+        for i in range(0, len(vectors), QUANT_BLOCK):
+            bits[i:i + QUANT_BLOCK] = np.packbits(np.asarray(vectors[i:i + QUANT_BLOCK]) > 0, axis=1)
+        return bits, None
+    scale = np.abs(vectors).max(axis=0) / 127
+    scale = np.where(scale > 0, scale, 1).astype(np.float32)
+    codes = np.empty(vectors.shape, dtype=np.int8)
+    for i in range(0, len(vectors), QUANT_BLOCK):
+        codes[i:i + QUANT_BLOCK] = np.round(np.asarray(vectors[i:i + QUANT_BLOCK]) / scale)
+    return codes, scale
+
+
+def load_codes(snapshot_dir, name, vectors, method):
+    '''
+    quantize_vectors() of a snapshot table, cached as {name}_vectors.{method}.npy (and .int8_scale.npy) next to
+    the vectors and rebuilt when they are newer. A read-only snapshot directory just skips the cache.
+    '''
+    snapshot_dir = Path(snapshot_dir)
+    source = snapshot_dir / f"{name}_vectors.npy"
+    codes_path = snapshot_dir / f"{name}_vectors.{method}.npy"
+    scale_path = snapshot_dir / f"{name}_vectors.{method}_scale.npy"
+    fresh = codes_path.exists() and codes_path.stat().st_mtime >= source.stat().st_mtime
+    if fresh and (method == "binary" or scale_path.exists()):
+        return (np.load(codes_path, mmap_mode="r"),
+                np.load(scale_path) if method != "binary" else None)
+    codes, scale = quantize_vectors(vectors, method)
+    try:
+        save_array(codes_path, codes)
+        if scale is not None:
+            save_array(scale_path, scale)
+    except OSError:
+        pass
+    return codes, scale
+
+
+class LocalIndex:
+    '''
+    Top-k cosine search over a contiguous float32 matrix of unit vectors, in-process.
+    method="exact" scores every row with one matrix-vector product; method="hnsw" uses an hnswlib graph
+    built over the same matrix (cached next to the snapshot as {name}.hnsw).
+    With codes from quantize_vectors(), an exact search first scores every row on the int8 or binary codes, then
+    re-ranks the best QUANTIZED_RERANK of them on the float32 vectors, so only those rows of the matrix are read.
+    '''
+
+    def __init__(self, keys, vectors, method="exact", index_path=None, codes=None):
+        self.keys = keys
+        self.vectors = vectors
+        self.method = method
+        self._hnsw = None
+        self._codes, self._scale = codes if codes is not None else (None, None)
+        if method == "hnsw":
+            self._hnsw = self._load_hnsw(index_path)
+        elif method != "exact":
+            raise ValueError(f"Unknown LOCAL_INDEX {method!r} (expected 'exact' or 'hnsw')")
+        if self._codes is not None and self._scale is None and self._codes.shape[1] % 8 == 0:
+            # Sign bits compared 64 at a time
+            self._codes = self._codes.view(np.uint64)
+
+    def _load_hnsw(self, index_path):
+        try:
+            import hnswlib
+        except ImportError as e:
+            raise RuntimeError("LOCAL_INDEX=hnsw requires hnswlib (pip install hnswlib)") from e
+
+        n, dim = self.vectors.shape
+        index = hnswlib.Index(space="ip", dim=dim)
+        if index_path is not None and os.path.exists(index_path):
+            index.load_index(str(index_path), max_elements=n)
+        else:
+            index.init_index(max_elements=n, ef_construction=200, M=16)
+            index.add_items(np.asarray(self.vectors), np.arange(n))
+            if index_path is not None:
+                index.save_index(str(index_path))
+        index.set_ef(max(LOCAL_HNSW_EF, 1))
+        return index
+
+    def __len__(self):
+        return len(self.keys)
+
+    def prewarm(self):
+        '''
+        Read one byte per 4 KB page of the vectors (and quantized codes), so a memory-mapped snapshot is resident
+        before the first search instead of faulting in during it. Returns the bytes touched.
+        '''
+        size = 0
+        for arr in (self.vectors, self._codes):
+            if arr is not None:
+                pages = np.asarray(arr).reshape(-1).view(np.uint8)[::4096]
+                int(pages.sum())
+                size += arr.nbytes
+        return size
+
+    def _first_pass(self, q, n):
+        '''
+        Indices of the n rows scoring best on the quantized codes (binary: fewest differing sign bits), unordered.
+        '''
+        if self._scale is None:
+            bits = np.packbits(q > 0).view(self._codes.dtype)
+            scores = -np.bitwise_count(self._codes ^ bits).sum(axis=1, dtype=np.int32)
+        else:
+            qs = q * self._scale
+            scores = np.concatenate([self._codes[i:i + QUANT_BLOCK].astype(np.float32) @ qs
+                                     for i in range(0, len(self), QUANT_BLOCK)])
+        return np.argpartition(-scores, n - 1)[:n]
+
+    def search(self, qvec, k, rows=None):
+        '''
+        Return (row indices, cosine similarities) of the k most similar rows, most similar first.
+        rows restricts the search to those row indices (pre-filtered candidates), scored exactly.
+        '''
+        q = np.asarray(qvec, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+        k = min(k, len(self) if rows is None else len(rows))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        if rows is not None:
+            scores = np.asarray(self.vectors[rows]) @ q
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return rows[top], scores[top]
+
+        if self._hnsw is not None:
+            labels, distances = self._hnsw.knn_query(q, k=k)
+            return labels[0].astype(np.int64), 1 - distances[0]
+
+        if self._codes is not None:
+            candidates = np.sort(self._first_pass(q, min(max(QUANTIZED_RERANK, k), len(self))))
+            scores = np.asarray(self.vectors[candidates]) @ q
+            top = np.argsort(-scores)[:k]
+            return candidates[top], scores[top]
+
+        scores = self.vectors @ q
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return top, scores[top]
+
+    def search_keys(self, qvec, k, rows=None):
+        '''
+        search() mapped to primary keys: a list of (key tuple, score).
+        '''
+        idx, scores = self.search(qvec, k, rows)
+        return [(tuple(int(v) for v in self.keys[i]), float(s)) for i, s in zip(idx, scores)]
+
+
+class LocalStore:
+    '''
+    Game and player LocalIndexes over a snapshot directory written by export_embeddings().
+    Vectors are memory-mapped read-only, so loading is near-instant and pages are shared between processes.
+    quantization is one of LOCAL_QUANTIZATIONS to search exact indexes through quantized codes (see load_codes()).
+    '''
+
+    def __init__(self, snapshot_dir=SNAPSHOT_DIR, method=LOCAL_INDEX, quantization=VECTOR_QUANTIZATION):
+        snapshot_dir = Path(snapshot_dir)
+        for name in EMBEDDED_TABLES:
+            keys = np.load(snapshot_dir / f"{name}_keys.npy")
+            vectors = np.load(snapshot_dir / f"{name}_vectors.npy", mmap_mode="r")
+            codes = None
+            if quantization in LOCAL_QUANTIZATIONS and method == "exact":
+                codes = load_codes(snapshot_dir, name, vectors, quantization)
+            setattr(self, name, LocalIndex(keys, vectors, method, snapshot_dir / f"{name}.hnsw", codes))
+
+
+_local_store = None
+_local_store_lock = threading.Lock()
+
+
+def get_local_store():
+    '''
+    Lazily load the process-wide LocalStore (RETRIEVAL_BACKEND=local).
+    '''
+    global _local_store
+    if _local_store is None:
+        with _local_store_lock:
+            if _local_store is None:
+                _local_store = LocalStore()
+    return _local_store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the local vector snapshot used by RETRIEVAL_BACKEND=local.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="Export embeddings from Postgres to a snapshot directory")
+    export.add_argument("--out", default=SNAPSHOT_DIR)
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        export_embeddings(sa.create_engine(DB_DSN), args.out)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,26 @@
+import time
+import pandas as pd
+from pathlib import Path
+from backend.frames import game_frame, player_frame
+from backend.latency import percentile
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "backend" / "data"
+
+
+def read_tables(data_dir=DATA_DIR):
+    '''
+    Read the four bundled CSVs into DataFrames keyed by table name.
+    '''
+    return {t: pd.read_csv(Path(data_dir) / f"{t}.csv") for t in ["game_details", "player_box_scores", "players", "teams"]}
+
+
+def best_of(fn, repeat=3):
+    '''
+    Run fn repeat times and return (best wall time in seconds, last result).
+    '''
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
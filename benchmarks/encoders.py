@@ -0,0 +1,90 @@
+'''
+Encoder backends (EMBED_BACKEND) side by side: load time (imports included), peak RSS, whether torch was imported,
+single-question latency (p50/p99), batch throughput over row texts, and cosine similarity of the embeddings to torch's.
+Each backend runs in its own process, so one backend's imports do not count against the next.
+The ONNX backends need python -m backend.encoders export first.
+Usage: python -m benchmarks.encoders [--backend torch --backend onnx-int8 ...] [--rows N] [--queries N]
+'''
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def run_backend(backend, rows, queries, out):
+    '''
+    Measure one backend in this process and save its embeddings of the check texts to out.
+    '''
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    from benchmarks.suite import peak_rss_mb
+    from benchmarks.common import percentile
+
+    start = time.perf_counter()
+    from backend.encoders import load_encoder, sample_texts, SAMPLE_QUESTIONS
+    encoder = load_encoder(backend)
+    load = time.perf_counter() - start
+
+    texts = sample_texts(rows)
+    encoder.encode(SAMPLE_QUESTIONS[:1])  # Warm-up
+    latencies = []
+    for i in range(queries):
+        q = SAMPLE_QUESTIONS[i % len(SAMPLE_QUESTIONS)]
+        t0 = time.perf_counter()
+        encoder.encode(q, convert_to_numpy=True, show_progress_bar=False)
+        latencies.append(time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    vectors = encoder.encode(texts, convert_to_numpy=True, show_progress_bar=False)
+    batch = time.perf_counter() - t0
+    np.save(out, np.asarray(vectors, dtype=np.float32))
+    return {"backend": backend, "load_s": load, "peak_rss_mb": peak_rss_mb(),
+            "p50_ms": percentile(latencies, 50) * 1000, "p99_ms": percentile(latencies, 99) * 1000,
+            "texts": len(texts), "texts_per_s": len(texts) / batch, "torch": "torch" in sys.modules}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend", choices=BACKENDS, action="append")
+    parser.add_argument("--rows", type=int, default=500, help="Row texts per table in the batch")
+    parser.add_argument("--queries", type=int, default=100, help="Single-question encodes timed")
+    parser.add_argument("--worker", choices=BACKENDS, help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(run_backend(args.worker, args.rows, args.queries, args.out)))
+        return
+
+    backends = args.backend or list(BACKENDS)
+    if "torch" not in backends:
+        backends = ["torch", *backends]  # Reference for the similarity column
+    tmp = tempfile.mkdtemp(prefix="nba-encoders-")
+    results, vectors = [], {}
+    for backend in backends:
+        out = os.path.join(tmp, f"{backend}.npy")
+        proc = subprocess.run([sys.executable, "-m", "benchmarks.encoders", "--worker", backend, "--out", out,
+                               "--rows", str(args.rows), "--queries", str(args.queries)],
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(f"Skipping {backend}: {proc.stderr.strip().splitlines()[-1]}")
+            continue
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+        vectors[backend] = np.load(out)
+
+    print(f"{'backend':<10} {'torch':>6} {'load':>7} {'peak RSS':>9} {'p50':>9} {'p99':>9} {'batch':>13} "
+          f"{'cos min':>9} {'cos mean':>9}")
+    for r in results:
+        v, ref = vectors[r["backend"]], vectors.get("torch")
+        sims = (v * ref).sum(axis=1) / (np.linalg.norm(v, axis=1) * np.linalg.norm(ref, axis=1)) if ref is not None else None
+        print(f"{r['backend']:<10} {'yes' if r['torch'] else 'no':>6} {r['load_s']:>6.1f}s {r['peak_rss_mb']:>7.0f}MB "
+              f"{r['p50_ms']:>7.2f}ms {r['p99_ms']:>7.2f}ms {r['texts_per_s']:>8.0f} txt/s "
+              + (f"{sims.min():>9.6f} {sims.mean():>9.6f}" if sims is not None else f"{'-':>9} {'-':>9}"))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,96 @@
+'''
+Hit rate of vector-only vs hybrid (vector + full-text, reciprocal rank fusion) retrieval of player box scores,
+on generated questions whose answer is one known row, e.g. "How many points did Jalen Brunson score on 1/30/2024?".
+Both rankers search every row of a snapshot built from the CSVs (pre-filtering is left out), and the report gives
+hit@k, MRR and p50 latency for each.
+
+--encoder hash (default) uses the hashed bag-of-words encoder of benchmarks.suite, which is itself lexical, so the
+gap to hybrid is smaller than with the real model (--encoder model).
+Usage: python -m benchmarks.hybrid_recall [--questions N] [--k K] [--encoder hash|model]
+'''
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import pandas as pd
+from benchmarks.common import read_tables, player_frame, percentile
+from benchmarks.suite import HashEncoder, bench_embed, build_snapshot
+
+TEMPLATES = [
+    "How many points did {name} score on {m}/{d}/{y}?",
+    "What was {name}'s stat line against the {opp} on {long}?",
+    "How many rebounds did {name} have for the {team} vs the {opp} in {y}?",
+]
+
+
+def make_questions(tables, n, seed=0):
+    '''
+    n (question, (person_id, game_id)) pairs from randomly drawn box scores, cycling through TEMPLATES.
+    '''
+    df = player_frame(tables).sample(n, random_state=seed)
+    questions = []
+    for i, r in enumerate(df.itertuples(index=False)):
+        ts = pd.Timestamp(r.game_timestamp)
+        q = TEMPLATES[i % len(TEMPLATES)].format(
+            name=f"{r.first_name} {r.last_name}", team=r.team_name, opp=r.opp_name,
+            m=ts.month, d=ts.day, y=ts.year, long=ts.strftime("%B %d, %Y"))
+        questions.append((q, (int(r.person_id), int(r.game_id))))
+    return questions
+
+
+def evaluate(name, search, questions, qvecs, rows_by_key, k):
+    hits, reciprocal, latencies = 0, 0.0, []
+    for (q, key), qvec in zip(questions, qvecs):
+        start = time.perf_counter()
+        idx = search(qvec, q)
+        latencies.append(time.perf_counter() - start)
+        ranked = [int(i) for i in idx[:k]]
+        target = rows_by_key.get(key)
+        if target in ranked:
+            hits += 1
+            reciprocal += 1 / (ranked.index(target) + 1)
+    n = len(questions)
+    print(f"  {name:<8} hit@{k} {hits / n:>6.1%}   MRR {reciprocal / n:.3f}   p50 {percentile(latencies, 50) * 1000:>7.2f}ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--questions", type=int, default=300)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--encoder", choices=["hash", "model"], default="hash")
+    args = parser.parse_args(argv)
+
+    snapshot_dir = tempfile.mkdtemp(prefix="nba-hybrid-")
+    # Read by backend.config at import time, so set before any backend module that uses them is imported
+    os.environ.update({"SNAPSHOT_DIR": snapshot_dir})
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    from backend import utils
+    from backend.snapshot import Snapshot
+    from backend.lexical import hybrid_search
+
+    encoder = utils.get_embed_model() if args.encoder == "model" else HashEncoder()
+    tables = read_tables()
+    _, vectors = bench_embed(encoder, tables, 64)
+    build_snapshot(snapshot_dir, tables, vectors)
+
+    snapshot = Snapshot(snapshot_dir, "exact")
+    index = snapshot.index("players")
+    start = time.perf_counter()
+    lexical = snapshot.lexical("players")
+    print(f"Built full-text index over {len(lexical)} box scores in {time.perf_counter() - start:.2f}s")
+
+    questions = make_questions(tables, args.questions)
+    qvecs = encoder.encode([q for q, _ in questions], convert_to_numpy=True, show_progress_bar=False)
+    rows_by_key = {tuple(int(v) for v in key): i for i, key in enumerate(index.keys)}
+
+    print(f"{len(questions)} questions, k={args.k}, encoder={args.encoder}")
+    evaluate("vector", lambda qvec, q: index.search(qvec, args.k)[0], questions, qvecs, rows_by_key, args.k)
+    evaluate("hybrid", lambda qvec, q: hybrid_search(index, lexical, qvec, q, args.k)[0], questions, qvecs,
+             rows_by_key, args.k)
+    shutil.rmtree(snapshot_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,101 @@
+'''
+Check that streaming ingest memory is bounded: peak RSS of reading, validating and serializing a synthetic
+player_box_scores CSV (as copy mode does before COPY) should not grow with the number of rows.
+
+Each size runs in a fresh process so its peak RSS is measured on its own; no database is needed.
+tests/test_ingest_memory.py runs the same measurement on smaller files and bounds the growth.
+Usage: python -m benchmarks.ingest_memory [--rows 2000000] [--chunk-size N]
+'''
+import io
+import os
+import sys
+import time
+import argparse
+import resource
+import tempfile
+import numpy as np
+import multiprocessing as mp
+from backend.config import INGEST_CHUNK_SIZE
+from backend.ingest import SCHEMAS, read_chunks
+
+TABLE = "player_box_scores"
+
+
+def write_synthetic_csv(path, rows, block=50_000, seed=0):
+    '''
+    Write a player_box_scores-shaped CSV of the given size, a block at a time.
+    '''
+    rng = np.random.default_rng(seed)
+    cols = [c for c, _ in SCHEMAS[TABLE]["columns"]]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(",".join(cols) + "\n")
+        for start in range(0, rows, block):
+            n = min(block, rows - start)
+            ids = np.arange(start, start + n)
+            fields = [
+                (22400000 + ids // 30).astype(str), (1000000 + ids).astype(str),
+                rng.integers(1610612737, 1610612767, n).astype(str), np.where(rng.random(n) < 0.5, "true", "false"),
+                np.round(rng.random(n) * 2880, 1).astype(str),
+            ] + [rng.integers(0, 40, n).astype(str) for _ in cols[5:]]
+            f.write("\n".join(",".join(row) for row in zip(*fields)) + "\n")
+
+
+def peak_rss_mb():
+    '''
+    Peak RSS of this process in MB. ru_maxrss survives exec, so a spawned child would report its parent's peak
+    at fork time; VmHWM belongs to the new address space.
+    '''
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(path, chunksize, queue):
+    start = time.perf_counter()
+    rows = 0
+    for chunk in read_chunks(path, TABLE, chunksize):
+        buf = io.StringIO()
+        chunk.to_csv(buf, index=False, header=False)
+        rows += len(chunk)
+    queue.put((rows, time.perf_counter() - start, peak_rss_mb()))
+
+
+def run(path, chunksize):
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=measure, args=(path, chunksize, queue))
+    proc.start()
+    proc.join()
+    if proc.exitcode != 0:
+        raise RuntimeError(f"Measuring {path} failed (exit code {proc.exitcode})")
+    return queue.get()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2_000_000, help="Rows in the largest synthetic file")
+    parser.add_argument("--chunk-size", type=int, default=INGEST_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    peaks = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in (args.rows // 8, args.rows):
+            path = os.path.join(tmp, f"{TABLE}_{rows}.csv")
+            write_synthetic_csv(path, rows)
+            size_mb = os.path.getsize(path) / 2**20
+            count, seconds, peak = run(path, args.chunk_size)
+            peaks.append(peak)
+            print(f"{count:>9} rows ({size_mb:7.1f} MB) | {seconds:6.2f}s | {count / seconds:>9,.0f} rows/s | peak RSS {peak:7.1f} MB")
+            os.remove(path)
+
+    print(f"Peak RSS growth for {args.rows // 8} -> {args.rows} rows: {peaks[-1] - peaks[0]:.1f} MB")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,71 @@
+'''
+Load test for a running /api/chat server: N requests at a fixed concurrency, reporting requests/sec and latency.
+
+Start the server against the stub LLM so only the API path is measured, e.g.:
+    LLM_BACKEND=fake FAKE_LLM_LATENCY=0.5 ANSWER_CACHE_SIZE=0 uvicorn backend.server:app --port 8000
+Then:
+    python -m benchmarks.load_chat --url http://localhost:8000/api/chat --requests 200 --concurrency 50
+Run it against the sync handler (before) and the async handler (after) with the same settings to compare.
+'''
+import sys
+import time
+import asyncio
+import argparse
+import httpx
+from benchmarks.common import percentile
+
+QUESTIONS = [
+    "Who scored the most points on Christmas Day in the 2023 season?",
+    "What was the final score of the Lakers game on 12/25/2023?",
+    "How many rebounds did Nikola Jokic have against the Suns on 4/9 in the 2023 NBA Season?",
+    "Which team won the Celtics vs Knicks game on Halloween 2024?",
+    "Who led the Warriors in assists on 1/15/2024?",
+]
+
+
+async def run(url, total, concurrency, timeout, transport=None):
+    '''
+    Send total requests, at most concurrency at a time. Returns (elapsed seconds, latencies of successes, errors).
+    transport=httpx.ASGITransport(app) runs them against an in-process app instead of over the network.
+    '''
+    latencies = []
+    errors = 0
+    sem = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(timeout=timeout, limits=httpx.Limits(max_connections=concurrency),
+                                 transport=transport) as client:
+        async def one(i):
+            nonlocal errors
+            async with sem:
+                start = time.perf_counter()
+                try:
+                    r = await client.post(url, json={"question": QUESTIONS[i % len(QUESTIONS)]})
+                    r.raise_for_status()
+                    latencies.append(time.perf_counter() - start)
+                except httpx.HTTPError:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+
+    return elapsed, latencies, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000/api/chat")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args(argv)
+
+    elapsed, latencies, errors = asyncio.run(run(args.url, args.requests, args.concurrency, args.timeout))
+    ok = len(latencies)
+    print(f"{ok} ok / {errors} errors in {elapsed:.2f}s | {ok / elapsed:.1f} req/s | "
+          f"p50 {percentile(latencies, 50) * 1000:.0f} ms | p95 {percentile(latencies, 95) * 1000:.0f} ms | "
+          f"p99 {percentile(latencies, 99) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
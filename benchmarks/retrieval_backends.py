@@ -0,0 +1,97 @@
+'''
+Compare retrieval backends on the same queries: local exact (ground truth), local int8 and binary quantized
+search with exact re-ranking (VECTOR_QUANTIZATION), local HNSW and pgvector HNSW.
+Reports p50/p99 search latency and recall@k against exact search, and the size and build time of the quantized codes.
+For the pgvector halfvec and binary indexes, see python -m backend.quantize report.
+
+Queries are stored embeddings perturbed with Gaussian noise, which stand in for questions near real rows.
+Requires a snapshot (python -m backend.vector_store export); --pgvector also needs the database (DB_DSN).
+Usage: python -m benchmarks.retrieval_backends [--queries N] [--k K] [--pgvector]
+'''
+import sys
+import time
+import argparse
+import numpy as np
+import sqlalchemy as sa
+from sqlalchemy import text, event
+from benchmarks.common import percentile
+from backend.config import DB_DSN, SNAPSHOT_DIR
+from backend.vector_store import LocalStore, LocalIndex, EMBEDDED_TABLES, LOCAL_QUANTIZATIONS, quantize_vectors
+
+
+def make_queries(index, n, noise, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = np.asarray(index.vectors[rng.choice(len(index), size=n, replace=False)])
+    q = rows + rng.standard_normal(rows.shape).astype(np.float32) * noise
+    return q / np.linalg.norm(q, axis=1, keepdims=True)
+
+
+def pgvector_search(eng, name):
+    table, column, key_cols = EMBEDDED_TABLES[name]
+    sql = text(f"SELECT {', '.join(key_cols)} FROM {table} ORDER BY {column} <=> CAST(:q AS vector) LIMIT :k")
+
+    def search(cx, q, k):
+        return [tuple(int(v) for v in r) for r in cx.execute(sql, {"q": q, "k": k})]
+    return search
+
+
+def run_backend(label, search, queries, k, truth):
+    latencies, recalls = [], []
+    for q, expected in zip(queries, truth):
+        start = time.perf_counter()
+        found = search(q, k)
+        latencies.append(time.perf_counter() - start)
+        recalls.append(len(set(found) & expected) / len(expected))
+    print(f"  {label:<14} p50 {percentile(latencies, 50) * 1000:7.2f} ms | p99 {percentile(latencies, 99) * 1000:7.2f} ms | "
+          f"recall@{k} {np.mean(recalls):.3f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--snapshot", default=SNAPSHOT_DIR)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--noise", type=float, default=0.05)
+    parser.add_argument("--pgvector", action="store_true", help="Also query pgvector over DB_DSN")
+    args = parser.parse_args(argv)
+
+    exact = LocalStore(args.snapshot, "exact", quantization="none")
+    try:
+        hnsw = LocalStore(args.snapshot, "hnsw", quantization="none")
+    except RuntimeError as e:
+        print(f"Skipping local HNSW: {e}")
+        hnsw = None
+
+    eng = None
+    if args.pgvector:
+        from pgvector.psycopg2 import register_vector
+        eng = sa.create_engine(DB_DSN)
+        event.listen(eng, "connect", lambda dbapi_connection, _: register_vector(dbapi_connection))
+
+    for name in EMBEDDED_TABLES:
+        index = getattr(exact, name)
+        queries = make_queries(index, min(args.queries, len(index)), args.noise)
+        truth = [set(k for k, _ in index.search_keys(q, args.k)) for q in queries]
+        print(f"{name} ({len(index)} rows, {len(queries)} queries)")
+
+        run_backend("local exact", lambda q, k: [key for key, _ in index.search_keys(q, k)], queries, args.k, truth)
+        for method in LOCAL_QUANTIZATIONS:
+            start = time.perf_counter()
+            codes = quantize_vectors(index.vectors, method)
+            build = time.perf_counter() - start
+            quantized = LocalIndex(index.keys, index.vectors, codes=codes)
+            run_backend(f"local {method}", lambda q, k: [key for key, _ in quantized.search_keys(q, k)], queries,
+                        args.k, truth)
+            print(f"  {'':<14} codes {codes[0].nbytes / 2**20:.1f} MB vs float32 {index.vectors.nbytes / 2**20:.1f} MB, "
+                  f"built in {build:.2f}s")
+        if hnsw is not None:
+            h = getattr(hnsw, name)
+            run_backend("local hnsw", lambda q, k: [key for key, _ in h.search_keys(q, k)], queries, args.k, truth)
+        if eng is not None:
+            search = pgvector_search(eng, name)
+            with eng.connect() as cx:
+                run_backend("pgvector hnsw", lambda q, k: search(cx, q, k), queries, args.k, truth)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
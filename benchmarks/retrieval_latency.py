@@ -0,0 +1,86 @@
+'''
+Per-request DB latency of /api/chat retrieval: the previous two queries with the query vector inlined as an
+ARRAY[...] literal vs the single prepared RETRIEVAL_SQL with the vector bound in pgvector's binary format.
+
+Requires an ingested and embedded database (ASYNC_DB_DSN / DB_DSN).
+Usage: python -m benchmarks.retrieval_latency [--requests N]
+'''
+import sys
+import time
+import asyncio
+import argparse
+import numpy as np
+from sqlalchemy import text
+from benchmarks.common import percentile
+from backend.server import aeng, RETRIEVAL_SQL
+
+# Retrieval as it was before RETRIEVAL_SQL: two round-trips, each with a unique ~10KB SQL string
+LEGACY_GAME_SQL = (
+    "SELECT g.game_id, g.season, g.game_timestamp, "
+    "h.name AS home_name, h.city AS home_city, h.abbreviation AS home_abbrev, g.home_points, "
+    "a.name AS away_name, a.city AS away_city, a.abbreviation AS away_abbrev, g.away_points, "
+    "1 - (g.game_embedding <=> (:q)::vector) AS score, 'game_details' AS source "
+    "FROM game_details g "
+    "JOIN teams h ON g.home_team_id = h.team_id "
+    "JOIN teams a ON g.away_team_id = a.team_id "
+    "ORDER BY game_embedding <-> ARRAY{qvec}::vector "
+    "LIMIT :k"
+)
+LEGACY_PLAYER_SQL = (
+    "SELECT pbs.person_id, pbs.game_id, p.first_name, p.last_name, t.name AS team_name, "
+    "pbs.points, pbs.offensive_reb AS oreb, pbs.defensive_reb AS dreb, pbs.assists, "
+    "pbs.steals, pbs.blocks, pbs.turnovers, g.game_id, g.game_timestamp, "
+    "1 - (pbs.player_embedding <=> (:q)::vector) AS score, 'player_box_scores' AS source "
+    "FROM player_box_scores pbs "
+    "JOIN players p ON pbs.person_id = p.player_id "
+    "JOIN teams t ON pbs.team_id = t.team_id "
+    "JOIN game_details g ON g.game_id = pbs.game_id "
+    "ORDER BY player_embedding <-> ARRAY{qvec}::vector "
+    "LIMIT :k"
+)
+
+
+def random_unit_vectors(n, dim=768, seed=0):
+    vecs = np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+    return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+
+async def legacy(cx, qvec):
+    q = qvec.tolist()
+    await cx.execute(text(LEGACY_GAME_SQL.format(qvec=q)), {"q": q, "k": 5})
+    await cx.execute(text(LEGACY_PLAYER_SQL.format(qvec=q)), {"q": q, "k": 5})
+
+
+async def combined(cx, qvec):
+    await cx.execute(text(RETRIEVAL_SQL), {"q": qvec, "k_games": 5, "k_players": 5})
+
+
+async def measure(fn, vecs):
+    latencies = []
+    async with aeng.connect() as cx:
+        await fn(cx, vecs[0])  # Warm-up (connection setup, first prepare)
+        for v in vecs:
+            start = time.perf_counter()
+            await fn(cx, v)
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def run(n):
+    vecs = random_unit_vectors(n)
+    for label, fn in [("two queries, inlined vector", legacy), ("one prepared query, bound vector", combined)]:
+        lat = await measure(fn, vecs)
+        print(f"{label:<34} p50 {percentile(lat, 50) * 1000:7.2f} ms | p95 {percentile(lat, 95) * 1000:7.2f} ms | "
+              f"p99 {percentile(lat, 99) * 1000:7.2f} ms")
+    await aeng.dispose()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args(argv)
+    asyncio.run(run(args.requests))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,33 @@
+'''
+Micro-benchmark: per-row (iterrows) vs column-wise embedding text builders on the bundled CSVs.
+
+Usage: python -m benchmarks.row_text [--repeat N]
+'''
+import sys
+import argparse
+from benchmarks.common import read_tables, game_frame, player_frame, best_of
+from backend.embed import row_text_game, row_text_player, row_texts_game, row_texts_player
+
+
+def compare(label, df, row_text, row_texts, repeat):
+    old_s, old = best_of(lambda: [row_text(r) for _, r in df.iterrows()], repeat)
+    new_s, new = best_of(lambda: row_texts(df).tolist(), repeat)
+    if old != new:
+        mismatch = next(i for i, (a, b) in enumerate(zip(old, new)) if a != b)
+        raise SystemExit(f"{label}: output differs at row {mismatch}:\n  {old[mismatch]!r}\n  {new[mismatch]!r}")
+    print(f"{label:<8} {len(df):>6} rows | iterrows {old_s:7.3f}s | vectorized {new_s:7.3f}s | "
+          f"{old_s / new_s:5.1f}x faster | identical output")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    tables = read_tables()
+    compare("games", game_frame(tables), row_text_game, row_texts_game, args.repeat)
+    compare("players", player_frame(tables), row_text_player, row_texts_player, args.repeat)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
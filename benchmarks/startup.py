@@ -0,0 +1,100 @@
+'''
+Cold start of the API server with and without the startup warm-up (WARMUP): time to import backend.server,
+time until GET /ready turns 200, and latency of the first and second /api/chat requests, each in a fresh process.
+Without warm-up the first request pays for loading the encoder (EMBED_BACKEND) and the indexes.
+
+By default it serves a snapshot of the CSVs (embedded with the hashed test encoder) with the fake LLM, so only the
+question encoder is real; --retrieval pgvector or local use the database at DB_DSN instead.
+Usage: python -m benchmarks.startup [--retrieval snapshot|pgvector|local] [--prewarm]
+'''
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+QUESTIONS = [
+    "Who scored the most points for the Lakers against the Celtics?",
+    "How did the Knicks do against Utah on 1/30/2024?",
+]
+
+
+def run_server():
+    '''
+    Import the server, run its lifespan until ready, then time two /api/chat requests. Returns the measurements.
+    '''
+    start = time.perf_counter()
+    from backend import server
+    import_s = time.perf_counter() - start
+    import httpx
+
+    async def serve():
+        async with server.app.router.lifespan_context(server.app):
+            start = time.perf_counter()
+            while not server.readiness["ready"] and server.readiness["error"] is None:
+                await asyncio.sleep(0.005)
+            ready_s = time.perf_counter() - start
+            requests = []
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+                for q in QUESTIONS:
+                    t0 = time.perf_counter()
+                    r = await client.post("/api/chat", json={"question": q})
+                    r.raise_for_status()
+                    requests.append(time.perf_counter() - t0)
+            return ready_s, requests
+
+    ready_s, requests = asyncio.run(serve())
+    return {"import_s": import_s, "ready_s": ready_s, "first_s": requests[0], "second_s": requests[1],
+            "readiness": server.readiness}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--retrieval", choices=["snapshot", "pgvector", "local"], default="snapshot")
+    parser.add_argument("--prewarm", action="store_true", help="Also prewarm the vector indexes (WARMUP_PREWARM)")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(run_server()))
+        return
+
+    env = {**os.environ, "RETRIEVAL_BACKEND": args.retrieval, "LLM_BACKEND": "fake", "ANSWER_CACHE_SIZE": "0",
+           "QUERY_CACHE_SIZE": "0", "TRACE_FILE": "", "WARMUP_PREWARM": "1" if args.prewarm else "0"}
+    env.setdefault("GROQ_API_KEY", "benchmark")
+    snapshot_dir = None
+    if args.retrieval == "snapshot":
+        from benchmarks.common import read_tables
+        from benchmarks.suite import HashEncoder, bench_embed, build_snapshot
+
+        snapshot_dir = tempfile.mkdtemp(prefix="nba-startup-")
+        tables = read_tables()
+        _, vectors = bench_embed(HashEncoder(), tables, 64)
+        build_snapshot(snapshot_dir, tables, vectors)
+        env["SNAPSHOT_DIR"] = snapshot_dir
+
+    print(f"retrieval={args.retrieval} EMBED_BACKEND={env.get('EMBED_BACKEND', 'torch')}")
+    print(f"  {'warm-up':<8} {'import':>8} {'ready':>8} {'1st chat':>9} {'2nd chat':>9} {'to 1st answer':>14}")
+    for warmup in ("0", "1"):
+        proc = subprocess.run([sys.executable, "-m", "benchmarks.startup", "--worker"],
+                              env={**env, "WARMUP": warmup}, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise SystemExit(proc.stderr)
+        r = json.loads(proc.stdout.strip().splitlines()[-1])
+        total = r["import_s"] + r["ready_s"] + r["first_s"]
+        print(f"  {'on' if warmup == '1' else 'off':<8} {r['import_s']:>7.2f}s {r['ready_s']:>7.2f}s "
+              f"{r['first_s'] * 1000:>7.0f}ms {r['second_s'] * 1000:>7.0f}ms {total:>13.2f}s")
+        if warmup == "1":
+            print(f"  warm-up stages: {json.dumps(r['readiness']['stages'])}"
+                  + (f", error: {r['readiness']['error']}" if r["readiness"]["error"] else ""))
+    if snapshot_dir:
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,228 @@
+'''
+End-to-end benchmark suite over the bundled CSVs, with the fake LLM and an in-process store so runs are
+reproducible and need neither Postgres nor the Groq API:
+- embed:    embedding texts for game_details and player_box_scores, encoded in batches (rows/s, per-batch latency)
+- retrieve: backend.rag.retrieve() for a fixed question set over a columnar snapshot built from the CSVs
+- context:  backend.rag.build_context() + build_prompt() over the retrieved rows
+- chat:     POST /api/chat in-process at a fixed concurrency (LLM_BACKEND=fake, answer cache off)
+
+Each stage reports throughput, p50/p95/p99 latency and the process's peak RSS so far. Results are written as JSON
+(with the git commit) to benchmarks/results/, and --compare OLD.json prints the change against an earlier run.
+
+--encoder hash (default) uses a deterministic hashed bag-of-words encoder so results do not depend on downloading
+the model; --encoder model uses the real sentence-transformers model for the embed stage and all queries.
+Usage: python -m benchmarks.suite [--encoder hash|model] [--requests N] [--concurrency N] [--compare OLD.json]
+'''
+import os
+import sys
+import json
+import time
+import zlib
+import shutil
+import asyncio
+import argparse
+import platform
+import resource
+import tempfile
+import contextlib
+import subprocess
+import numpy as np
+from pathlib import Path
+from benchmarks.common import read_tables, game_frame, player_frame, percentile
+from benchmarks.load_chat import QUESTIONS
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+DIM = 768
+
+
+class HashEncoder:
+    '''
+    Deterministic stand-in for SentenceTransformer.encode(): each token adds +-1 to a crc32-chosen dimension.
+    Similar texts share tokens, so retrieval still returns plausible rows.
+    '''
+
+    def encode(self, texts, batch_size=None, convert_to_numpy=True, show_progress_bar=False):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        out = np.zeros((len(texts), DIM), dtype=np.float32)
+        for i, t in enumerate(texts):
+            hashes = np.array([zlib.crc32(tok.encode()) for tok in t.lower().split()], dtype=np.uint64)
+            if len(hashes):
+                signs = np.where(hashes & 1, 1.0, -1.0)
+                out[i] = np.bincount((hashes >> 1) % DIM, weights=signs, minlength=DIM)
+        out /= np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-12)
+        return out[0] if single else out
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def summarize(items, seconds, latencies, unit):
+    return {
+        "items": items, "unit": unit, "seconds": round(seconds, 4),
+        "throughput": round(items / seconds, 2) if seconds else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def bench_embed(encoder, tables, batch_size):
+    '''
+    Encode every game and player row text. Returns (stage result, {name: (keys, vectors)}).
+    '''
+    from backend.embed import row_texts_game, row_texts_player
+
+    frames = {"games": (game_frame(tables), row_texts_game, ["game_id"]),
+              "players": (player_frame(tables), row_texts_player, ["person_id", "game_id"])}
+    latencies, total, vectors = [], 0, {}
+    start = time.perf_counter()
+    for name, (df, row_texts, key_cols) in frames.items():
+        df = df.sort_values(key_cols).reset_index(drop=True)
+        texts = row_texts(df).tolist()
+        parts = []
+        for i in range(0, len(texts), batch_size):
+            t0 = time.perf_counter()
+            parts.append(encoder.encode(texts[i:i + batch_size], batch_size=batch_size, convert_to_numpy=True,
+                                        show_progress_bar=False))
+            latencies.append(time.perf_counter() - t0)
+        vecs = np.vstack(parts).astype(np.float32)
+        vecs /= np.maximum(np.linalg.norm(vecs, axis=1, keepdims=True), 1e-12)
+        vectors[name] = (df[key_cols].to_numpy(dtype=np.int64), vecs)
+        total += len(texts)
+    return summarize(total, time.perf_counter() - start, latencies, "rows"), vectors
+
+
+def build_snapshot(out_dir, tables, vectors):
+    '''
+    Write a columnar snapshot (backend.snapshot) of the CSVs plus the benchmark's embeddings.
+    '''
+    from backend.snapshot import write_table, write_manifest
+    from backend.vector_store import save_array
+
+    meta = {t: write_table(out_dir, t, df) for t, df in tables.items()}
+    for name, (keys, vecs) in vectors.items():
+        save_array(Path(out_dir) / f"{name}_keys.npy", keys)
+        save_array(Path(out_dir) / f"{name}_vectors.npy", np.ascontiguousarray(vecs))
+        save_array(Path(out_dir) / f"{name}_hashes.npy", np.zeros(len(keys), dtype="S64"))
+    write_manifest(out_dir, meta, {name: {"rows": len(keys)} for name, (keys, _) in vectors.items()})
+
+
+def bench_retrieve(questions, qvecs, repeat):
+    from backend import rag
+
+    latencies, results = [], []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for q, qvec in zip(questions, qvecs):
+            t0 = time.perf_counter()
+            results.append(rag.retrieve(None, qvec, q))
+            latencies.append(time.perf_counter() - t0)
+    return summarize(len(latencies), time.perf_counter() - start, latencies, "queries"), results
+
+
+def bench_context(questions, retrieved, repeat):
+    from backend import rag
+
+    expected = {"player_name": None, "points": None}
+    latencies = []
+    start = time.perf_counter()
+    for q, rows in zip(questions * repeat, retrieved):
+        t0 = time.perf_counter()
+        rag.build_prompt(q, rows, rag.extract_requested_stats(q), expected)
+        latencies.append(time.perf_counter() - t0)
+    return summarize(len(latencies), time.perf_counter() - start, latencies, "prompts")
+
+
+def bench_chat(requests, concurrency):
+    import httpx
+    from backend.server import app
+    from benchmarks.load_chat import run
+
+    elapsed, latencies, errors = asyncio.run(run("http://bench/api/chat", requests, concurrency, 120.0,
+                                                 transport=httpx.ASGITransport(app=app)))
+    if errors:
+        raise SystemExit(f"/api/chat failed for {errors} of {requests} requests")
+    return summarize(len(latencies), elapsed, latencies, "requests")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_results(results, baseline=None):
+    print(f"\n  {'stage':<9} {'items':>7} {'throughput':>22} {'p50':>9} {'p95':>9} {'p99':>9} {'peak RSS':>10}")
+    for stage, r in results["stages"].items():
+        line = (f"  {stage:<9} {r['items']:>7} {r['throughput']:>10,.1f} {r['unit'] + '/s':<11} "
+                f"{r['p50_ms']:>7.2f}ms {r['p95_ms']:>7.2f}ms {r['p99_ms']:>7.2f}ms {r['peak_rss_mb']:>8.1f}MB")
+        old = (baseline or {}).get("stages", {}).get(stage)
+        if old and old["throughput"]:
+            line += f" | {r['throughput'] / old['throughput'] - 1:+.1%} throughput, p95 {r['p95_ms'] - old['p95_ms']:+.2f}ms"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--encoder", choices=["hash", "model"], default="hash")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=20, help="Passes over the question set for retrieve/context")
+    parser.add_argument("--requests", type=int, default=200, help="/api/chat requests")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--out", help="Result file (default: benchmarks/results/<time>_<commit>.json)")
+    parser.add_argument("--compare", help="Earlier result file to compare against")
+    args = parser.parse_args(argv)
+
+    snapshot_dir = tempfile.mkdtemp(prefix="nba-bench-")
+    # Read by backend.config at import time, so set before any backend module that uses them is imported
+    os.environ.update({"RETRIEVAL_BACKEND": "snapshot", "SNAPSHOT_DIR": snapshot_dir, "LLM_BACKEND": "fake",
+                       "ANSWER_CACHE_SIZE": "0", "QUERY_CACHE_SIZE": "0", "TRACE_FILE": ""})
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+
+    from backend import utils
+    if args.encoder == "model":
+        encoder = utils.get_embed_model()
+    else:
+        # Used by embed_query() in the server and rag as if it were the loaded model
+        encoder = utils._embed_model = HashEncoder()
+
+    tables = read_tables()
+    stages = {}
+    stages["embed"], vectors = bench_embed(encoder, tables, args.batch_size)
+    build_snapshot(snapshot_dir, tables, vectors)
+
+    qvecs = [encoder.encode(q).tolist() for q in QUESTIONS]
+    # The pipeline prints progress per question; keep it out of the report
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        stages["retrieve"], retrieved = bench_retrieve(QUESTIONS, qvecs, args.repeat)
+        stages["context"] = bench_context(QUESTIONS, retrieved, args.repeat)
+        stages["chat"] = bench_chat(args.requests, args.concurrency)
+    shutil.rmtree(snapshot_dir, ignore_errors=True)
+
+    results = {
+        "commit": git_commit(), "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count(),
+        "config": vars(args), "stages": stages,
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"Comparing against {args.compare} (commit {baseline.get('commit')})")
+    print_results(results, baseline)
+
+    out = Path(args.out) if args.out else RESULTS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}_{results['commit']}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nWrote {out}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -104,19 +104,35 @@ export class AppComponent {
     // Show loading animation
     this.isLoading = true;
 
-    this.chatService.sendMessage(input).subscribe({
-      next: (res: any) => {
+    // Stream the answer so it shows up as the LLM writes it; the bubble replaces the loading dots on the first token
+    let reply: Message | null = null;
+    const getReply = (): Message => {
+      if (!reply) {
         this.isLoading = false;
-        const reply = res?.answer ?? 'No Answer.';
-        currentChat.messages.push({
-          sender: 'bot',
-          text: reply,
-          evidence: res?.evidence || []
-        });
+        reply = { sender: 'bot', text: '', evidence: [] };
+        currentChat.messages.push(reply);
+      }
+      return reply;
+    };
+
+    this.chatService.streamMessage(input).subscribe({
+      next: (event: any) => {
+        if (event?.type === 'token') {
+          getReply().text += event.text;
+        } else if (event?.type === 'evidence') {
+          getReply().evidence = event.evidence || [];
+        }
+      },
+      complete: () => {
+        const message = getReply();
+        if (!message.text) {
+          message.text = 'No Answer.';
+        }
       },
       error: () => {
         this.isLoading = false;
-        currentChat.messages.push({ sender: 'bot', text: 'Error contacting server.' });
+        const message = getReply();
+        message.text = message.text ? `${message.text} (Error contacting server.)` : 'Error contacting server.';
       }
     });
   }
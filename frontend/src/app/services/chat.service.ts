@@ -17,4 +17,50 @@ export class ChatService extends BaseService {
     const endpoint = `${this.baseUrl}/chat`;
     return this.post(endpoint, { question });
   }
+
+  // Streams /chat/stream events ({type: 'token' | 'evidence' | 'done', ...}) as they arrive
+  streamMessage(question: string): Observable<any> {
+    const endpoint = `${this.baseUrl}/chat/stream`;
+    return new Observable<any>(subscriber => {
+      const controller = new AbortController();
+      let reader: ReadableStreamDefaultReader<Uint8Array> | null = null;
+
+      fetch(endpoint, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ question }),
+        signal: controller.signal
+      })
+        .then(async res => {
+          if (!res.ok || !res.body) {
+            throw new Error(`HTTP ${res.status}`);
+          }
+          reader = res.body.getReader();
+          const decoder = new TextDecoder();
+          const emit = (lines: string[]) =>
+            lines.filter(line => line.trim()).forEach(line => subscriber.next(JSON.parse(line)));
+          let buffer = '';
+          while (true) {
+            const { done, value } = await reader.read();
+            if (done) {
+              // Flush the decoder and emit a last event the server did not end with a newline
+              emit([buffer + decoder.decode()]);
+              break;
+            }
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n');
+            buffer = lines.pop() ?? '';
+            emit(lines);
+          }
+          subscriber.complete();
+        })
+        .catch(err => {
+          // A malformed event ends the stream: stop reading the rest of the response
+          reader?.cancel().catch(() => {});
+          subscriber.error(err);
+        });
+
+      return () => controller.abort();
+    });
+  }
 }
\ No newline at end of file
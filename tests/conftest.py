@@ -0,0 +1,86 @@
+'''
+Shared fixtures. backend.config reads its settings at import time, so the environment is set here first: the fake
+LLM, the snapshot retrieval backend over a slice of the bundled CSVs, and no query embedding cache.
+Tests that need Postgres connect to TEST_DB_DSN (a scratch database whose tables they replace) and are skipped without it.
+'''
+import os
+import tempfile
+
+import pytest
+import sqlalchemy as sa
+from sqlalchemy import text
+
+os.environ.update({"LLM_BACKEND": "fake", "RETRIEVAL_BACKEND": "snapshot", "QUERY_CACHE_SIZE": "0", "TRACE_FILE": "",
+                   "SNAPSHOT_DIR": tempfile.mkdtemp(prefix="nba-test-snapshot-")})
+os.environ.setdefault("GROQ_API_KEY", "test")
+
+TEST_DB_DSN = os.getenv("TEST_DB_DSN")
+# Games in the slice of the CSVs the tests load (with their box scores, and every team and player)
+SLICE_GAMES = 40
+
+
+@pytest.fixture(scope="session")
+def tables():
+    '''
+    The bundled CSVs cut down to SLICE_GAMES games, as {table: DataFrame}.
+    '''
+    from benchmarks.common import read_tables
+
+    tables = read_tables()
+    games = tables["game_details"].head(SLICE_GAMES)
+    tables["game_details"] = games
+    box = tables["player_box_scores"]
+    tables["player_box_scores"] = box[box["game_id"].isin(games["game_id"])]
+    return tables
+
+
+@pytest.fixture(scope="session")
+def snapshot(tables):
+    '''
+    Columnar snapshot of the slice in SNAPSHOT_DIR, embedded with the benchmark suite's hashing encoder,
+    which also stands in for the sentence-transformers model for question encodes.
+    '''
+    from backend import utils
+    from benchmarks.suite import HashEncoder, bench_embed, build_snapshot
+
+    encoder = utils._embed_model = HashEncoder()
+    _, vectors = bench_embed(encoder, tables, 64)
+    build_snapshot(os.environ["SNAPSHOT_DIR"], tables, vectors)
+    return os.environ["SNAPSHOT_DIR"]
+
+
+@pytest.fixture
+def csv_dir(tmp_path, tables, monkeypatch):
+    '''
+    Write the slice as CSVs to a temporary directory and point backend.ingest at it.
+    Tests edit the files and re-ingest to simulate a new data drop.
+    '''
+    from backend import ingest
+
+    for name, df in tables.items():
+        df.to_csv(tmp_path / f"{name}.csv", index=False)
+    monkeypatch.setattr(ingest, "DATA_DIR", tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def pg(monkeypatch):
+    '''
+    Engine on an empty TEST_DB_DSN database (the ingest tables, aggregates and staging schemas are dropped first),
+    with backend.ingest pointed at it.
+    '''
+    if not TEST_DB_DSN:
+        pytest.skip("TEST_DB_DSN is not set")
+    from backend import ingest
+    from backend.aggregates import AGGREGATE_TABLES
+
+    eng = sa.create_engine(TEST_DB_DSN)
+    with eng.begin() as cx:
+        cx.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        for schema in (ingest.STAGING_SCHEMA, ingest.RETIRED_SCHEMA):
+            cx.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+        for t in AGGREGATE_TABLES + ingest.TABLES:
+            cx.execute(text(f"DROP TABLE IF EXISTS {t} CASCADE"))
+    monkeypatch.setattr(ingest, "DB_DSN", TEST_DB_DSN)
+    yield eng
+    eng.dispose()
@@ -0,0 +1,109 @@
+import asyncio
+
+import httpx
+import numpy as np
+import pytest
+from sqlalchemy import text
+
+from backend.cache import SemanticCache
+
+LAKERS_QUESTION = "How many points did the Lakers score in the 2023 season?"
+
+
+def test_entries_only_match_an_equal_key():
+    cache = SemanticCache(threshold=0.9)
+    vec = np.ones(4)
+    cache.store(vec, {"answer": "2023"}, key=("points", 2023))
+    assert cache.lookup(vec, key=("points", 2024)) is None
+    assert cache.lookup(vec, key=("points", 2023)) == {"answer": "2023"}
+
+
+@pytest.fixture
+def server(snapshot):
+    from backend import server
+
+    server.answer_cache.invalidate()
+    yield server
+    server.answer_cache.invalidate()
+
+
+def ask(server, question):
+    async def post():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://test") as client:
+            resp = await client.post("/api/chat", json={"question": question})
+            resp.raise_for_status()
+            return resp.json()
+    return asyncio.run(post())
+
+
+def test_repeated_question_is_answered_from_the_cache(server):
+    first = ask(server, LAKERS_QUESTION)
+    hits = server.answer_cache.stats()["hits"]
+    assert ask(server, LAKERS_QUESTION) == first
+    assert server.answer_cache.stats()["hits"] == hits + 1
+
+
+@pytest.mark.parametrize("other", [
+    "How many points did the Celtics score in the 2023 season?",
+    "How many points did the Lakers score in the 2024 season?",
+    "How many rebounds did the Lakers get in the 2023 season?",
+])
+def test_question_about_something_else_misses(server, monkeypatch, other):
+    # Every embedding is "similar enough", so only the key tells the questions apart
+    monkeypatch.setattr(server.answer_cache, "threshold", -1.0)
+    ask(server, LAKERS_QUESTION)
+    hits = server.answer_cache.stats()["hits"]
+    ask(server, other)
+    assert server.answer_cache.stats()["hits"] == hits
+    ask(server, LAKERS_QUESTION.lower())
+    assert server.answer_cache.stats()["hits"] == hits + 1
+
+
+@pytest.mark.parametrize("mode", ["copy", "swap"])
+def test_reingest_invalidates_answers_built_from_changed_rows(pg, csv_dir, mode):
+    from backend import ingest, server
+    from backend.embed import embed_games, embed_players
+    from benchmarks.suite import HashEncoder
+
+    encode = HashEncoder().encode
+    ingest.main(["--mode", mode])
+    embed_games(pg, encode=encode)
+    embed_players(pg, encode=encode)
+
+    def deps_for(cx, game_id):
+        games = cx.execute(text("SELECT game_id, game_embedding_hash AS row_hash FROM game_details WHERE game_id = :g"),
+                           {"g": game_id}).mappings().all()
+        players = cx.execute(text("SELECT person_id, game_id, player_embedding_hash AS row_hash FROM player_box_scores "
+                                  "WHERE game_id = :g AND player_embedding_hash IS NOT NULL"), {"g": game_id}).mappings().all()
+        return server.answer_deps(games, players)
+
+    games = (csv_dir / "game_details.csv").read_text().splitlines()
+    changed, untouched = (int(line.split(",")[0]) for line in games[1:3])
+    cache = SemanticCache(threshold=0.9)
+    with pg.connect() as cx:
+        cache.store(np.ones(4), {"answer": "changed"}, deps_for(cx, changed), key="changed")
+        cache.store(np.ones(4), {"answer": "untouched"}, deps_for(cx, untouched), key="untouched")
+
+    # A new data drop corrects the home score of one game
+    cols = games[1].split(",")
+    cols[5] = str(int(cols[5]) + 1)
+    games[1] = ",".join(cols)
+    (csv_dir / "game_details.csv").write_text("\n".join(games) + "\n")
+    ingest.main(["--mode", mode])
+
+    with pg.connect() as cx:
+        is_valid = lambda deps: server.deps_unchanged(cx, deps)
+        assert cache.lookup(np.ones(4), is_valid, key="changed") is None
+        assert cache.lookup(np.ones(4), is_valid, key="untouched") == {"answer": "untouched"}
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_missing_hash_columns_count_as_changed(pg, csv_dir):
+    from backend import ingest, server
+
+    # Replace mode re-creates the tables without embedding or hash columns
+    ingest.main(["--mode", "replace"])
+    deps = {"game_ids": {1}, "games": {1: "hash"}, "players": {(2, 1): "hash"}}
+    for d in (deps, {**deps, "games": {}}):
+        with pg.connect() as cx:
+            assert server.deps_unchanged(cx, d) is False
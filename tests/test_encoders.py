@@ -0,0 +1,43 @@
+import hashlib
+
+import numpy as np
+
+from backend import embed, utils
+from backend.cache import EmbeddingCache
+from backend.config import EMBED_MODEL
+
+
+def test_content_hash_depends_on_the_encoder_backend(monkeypatch):
+    monkeypatch.setattr(embed, "EMBED_BACKEND", "torch")
+    torch_hash = embed.content_hash("row")
+    # Hashes stored by torch embeddings stay valid
+    assert torch_hash == hashlib.sha256(f"{EMBED_MODEL}\nrow".encode("utf-8")).hexdigest()
+    monkeypatch.setattr(embed, "EMBED_BACKEND", "onnx-int8")
+    assert embed.content_hash("row") != torch_hash
+
+
+class ConstantEncoder:
+    def __init__(self, value):
+        self.value = value
+
+    def encode(self, texts, batch_size=None, convert_to_numpy=True, show_progress_bar=False):
+        if isinstance(texts, str):
+            return np.full(4, self.value, dtype=np.float32)
+        return np.full((len(texts), 4), self.value, dtype=np.float32)
+
+
+def test_query_cache_is_keyed_on_the_encoder_backend(monkeypatch, tmp_path):
+    path = str(tmp_path / "queries.sqlite")
+    monkeypatch.setattr(utils, "query_cache", EmbeddingCache(maxsize=16, path=path))
+    for backend, value in (("torch", 1.0), ("onnx-int8", 2.0)):
+        monkeypatch.setattr(utils, "EMBED_BACKEND", backend)
+        monkeypatch.setattr(utils, "_embed_model", ConstantEncoder(value))
+        assert utils.embed_query(EMBED_MODEL, "who won?") == [value] * 4
+        assert utils.embed_queries(EMBED_MODEL, ["who won?"]) == [[value] * 4]
+
+    # The on-disk tier keeps them apart across restarts too
+    monkeypatch.setattr(utils, "query_cache", EmbeddingCache(maxsize=16, path=path))
+    monkeypatch.setattr(utils, "_embed_model", None)
+    assert utils.embed_query(EMBED_MODEL, "who won?") == [2.0] * 4
+    monkeypatch.setattr(utils, "EMBED_BACKEND", "torch")
+    assert utils.embed_query(EMBED_MODEL, "who won?") == [1.0] * 4
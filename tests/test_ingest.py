@@ -0,0 +1,153 @@
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from backend import ingest
+from backend.aggregates import build_aggregates
+
+
+def edit_csv(csv_dir, table, edit):
+    '''
+    Rewrite one CSV of the slice through edit(df) -> df, as a new data drop would change it.
+    '''
+    path = csv_dir / f"{table}.csv"
+    edit(pd.read_csv(path)).to_csv(path, index=False)
+
+
+def embed(eng):
+    from backend.embed import embed_games, embed_players
+    from benchmarks.suite import HashEncoder
+
+    encode = HashEncoder().encode
+    embed_games(eng, encode=encode)
+    embed_players(eng, encode=encode)
+
+
+def hashes(eng, table):
+    column = ingest.EMBEDDING_COLUMNS[table]
+    key = ", ".join(ingest.SCHEMAS[table]["primary_key"])
+    with eng.connect() as cx:
+        rows = cx.execute(text(f"SELECT {key}, {column}_hash, {column} IS NOT NULL FROM {table}")).all()
+    return {tuple(r[:-2]): (r[-2], r[-1]) for r in rows}
+
+
+def row_counts(eng):
+    with eng.connect() as cx:
+        return {t: cx.execute(text(f"SELECT count(*) FROM {t}")).scalar() for t in ingest.TABLES}
+
+
+def test_validate_chunk_names_the_bad_line(csv_dir):
+    edit_csv(csv_dir, "game_details",
+             lambda df: df.assign(home_points=df["home_points"].astype(object).where(df.index != 3, "abc")))
+    with pytest.raises(ValueError, match=r"game_details.csv line 5"):
+        list(ingest.read_chunks(ingest.csv_path("game_details"), "game_details", chunksize=2))
+
+
+@pytest.fixture
+def loaded(pg, csv_dir, tables):
+    '''
+    The slice ingested in copy mode and embedded, as (engine, first game_id, second game_id).
+    '''
+    ingest.main(["--mode", "copy"])
+    embed(pg)
+    first, second = (int(g) for g in tables["game_details"]["game_id"].head(2))
+    return pg, first, second
+
+
+def change_first_game(csv_dir, first, second):
+    '''
+    New data drop: one game's home score corrected, and one box score of another game removed.
+    Returns the removed box score's key.
+    '''
+    edit_csv(csv_dir, "game_details",
+             lambda df: df.assign(home_points=df["home_points"].where(df["game_id"] != first, df["home_points"] + 1)))
+    box = pd.read_csv(csv_dir / "player_box_scores.csv")
+    removed = box[box["game_id"] == second].iloc[0]
+    box.drop(index=removed.name).to_csv(csv_dir / "player_box_scores.csv", index=False)
+    return int(removed["person_id"]), int(removed["game_id"])
+
+
+def test_copy_ingest_loads_every_row(loaded, tables):
+    eng, _, _ = loaded
+    assert row_counts(eng) == {t: len(df) for t, df in tables.items()}
+    assert all(h is not None for h, _ in hashes(eng, "game_details").values())
+
+
+def test_upsert_clears_hashes_of_changed_rows_only(loaded, csv_dir):
+    eng, first, second = loaded
+    before = hashes(eng, "game_details")
+    removed = change_first_game(csv_dir, first, second)
+
+    with eng.begin() as cx:
+        game_ids, seasons = ingest.ingest_copy(cx)
+    assert game_ids == {first, second}
+    assert seasons
+
+    after = hashes(eng, "game_details")
+    assert after[(first,)] == (None, True)
+    assert {k: v for k, v in after.items() if k != (first,)} == {k: v for k, v in before.items() if k != (first,)}
+    assert removed not in hashes(eng, "player_box_scores")
+
+    # Re-ingesting the same files changes nothing
+    with eng.begin() as cx:
+        assert ingest.ingest_copy(cx)[0] == set()
+
+
+@pytest.mark.parametrize("mode", ["copy", "replace"])
+def test_changed_game_ids(pg, csv_dir, tables, mode):
+    # Typed tables from copy (and swap) mode, and untyped ones from replace mode
+    ingest.main(["--mode", mode])
+    first, second = (int(g) for g in tables["game_details"]["game_id"].head(2))
+    change_first_game(csv_dir, first, second)
+    with pg.connect() as cx:
+        for table, expected in (("game_details", {first}), ("player_box_scores", {second})):
+            assert ingest.changed_game_ids(cx, table, pd.read_csv(ingest.csv_path(table))) == expected
+
+
+def test_load_staging_leaves_live_tables_alone(loaded, csv_dir, tables):
+    eng, first, second = loaded
+    change_first_game(csv_dir, first, second)
+    with eng.begin() as cx:
+        cx.execute(text(f"CREATE SCHEMA {ingest.STAGING_SCHEMA}"))
+
+    report = ingest.load_staging(eng, chunksize=100, workers=2)
+    assert {r["table"]: r["rows"] for r in report} == {
+        t: len(df) - (t == "player_box_scores") for t, df in tables.items()}
+    with eng.connect() as cx:
+        staged = cx.execute(text(f"SELECT home_points, game_embedding_hash FROM {ingest.STAGING_SCHEMA}.game_details "
+                                 "WHERE game_id = :g"), {"g": first}).one()
+        live = cx.execute(text("SELECT home_points, game_embedding_hash FROM game_details WHERE game_id = :g"),
+                          {"g": first}).one()
+    assert staged.home_points == live.home_points + 1
+    assert staged.game_embedding_hash is None and live.game_embedding_hash is not None
+
+    with eng.begin() as cx:
+        cx.execute(text(f"SET LOCAL search_path TO {ingest.STAGING_SCHEMA}, public"))
+        build_aggregates(cx, ingest.STAGING_SCHEMA)
+        cx.execute(text("SET LOCAL search_path TO public"))
+        ingest.swap_staging(cx)
+    with eng.connect() as cx:
+        swapped = cx.execute(text("SELECT home_points FROM game_details WHERE game_id = :g"), {"g": first}).scalar()
+        schemas = cx.execute(text("SELECT nspname FROM pg_namespace WHERE nspname IN (:s, :r)"),
+                             {"s": ingest.STAGING_SCHEMA, "r": ingest.RETIRED_SCHEMA}).all()
+    assert swapped == staged.home_points
+    assert schemas == []
+
+
+def test_swap_ingest_carries_embeddings_and_clears_changed_hashes(loaded, csv_dir):
+    eng, first, second = loaded
+    games, box = hashes(eng, "game_details"), hashes(eng, "player_box_scores")
+    removed = change_first_game(csv_dir, first, second)
+
+    ingest.main(["--mode", "swap"])
+
+    after = hashes(eng, "game_details")
+    assert after[(first,)] == (None, True)
+    assert {k: v for k, v in after.items() if k != (first,)} == {k: v for k, v in games.items() if k != (first,)}
+    box_after = hashes(eng, "player_box_scores")
+    assert removed not in box_after
+    assert box_after == {k: v for k, v in box.items() if k != removed}
+
+    # The next embed run re-embeds exactly the changed game
+    embed(eng)
+    assert all(h is not None for h, _ in hashes(eng, "game_details").values())
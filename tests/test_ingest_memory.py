@@ -0,0 +1,27 @@
+from benchmarks.ingest_memory import write_synthetic_csv, run
+
+SMALL_ROWS, LARGE_ROWS = 20_000, 160_000
+CHUNK_SIZE = 5_000
+# Reading the large file in one piece grows peak RSS by about 50 MB; chunked reads should stay flat
+MAX_GROWTH_MB = 16
+
+
+def peak_growth(tmp_path, chunksize):
+    peaks = []
+    for rows in (SMALL_ROWS, LARGE_ROWS):
+        path = tmp_path / f"player_box_scores_{rows}.csv"
+        if not path.exists():
+            write_synthetic_csv(path, rows)
+        count, _, peak = run(str(path), chunksize)
+        assert count == rows
+        peaks.append(peak)
+    return peaks[1] - peaks[0]
+
+
+def test_chunked_ingest_memory_does_not_grow_with_file_size(tmp_path):
+    assert peak_growth(tmp_path, CHUNK_SIZE) < MAX_GROWTH_MB
+
+
+def test_unchunked_read_grows(tmp_path):
+    # Without this, a measurement that always reported the same number would pass the test above
+    assert peak_growth(tmp_path, LARGE_ROWS) > MAX_GROWTH_MB
@@ -0,0 +1,43 @@
+import asyncio
+
+from backend import metrics
+
+
+def disconnects():
+    series = metrics.REQUEST_SECONDS._series.get(("/api/chat/stream", "disconnected"))
+    return series["count"] if series else 0
+
+
+def test_stream_closed_after_client_disconnect(snapshot):
+    from backend import server
+
+    async def disconnect():
+        resp = await server.answer_stream(server.Q(question="Who scored the most points for the Lakers?"))
+        body = resp.body_iterator
+        assert '"type": "token"' in await body.__anext__()
+        # The span of the paused stream stays out of this task's context
+        assert metrics._current.get() is None
+        # Starlette abandons the generator mid-answer; it is finalized from another task
+        await asyncio.create_task(body.aclose())
+
+    before = disconnects()
+    asyncio.run(disconnect())
+    assert disconnects() == before + 1
+
+
+def test_stream_cancelled_while_waiting_for_the_llm(snapshot, monkeypatch):
+    from backend import server, utils
+
+    monkeypatch.setattr(utils, "FAKE_LLM_LATENCY", 60)
+
+    async def cancel():
+        resp = await server.answer_stream(server.Q(question="Who scored the most points for the Celtics?"))
+        reader = asyncio.create_task(resp.body_iterator.__anext__())
+        await asyncio.sleep(0.5)
+        reader.cancel()
+        await asyncio.gather(reader, return_exceptions=True)
+        await resp.body_iterator.aclose()
+
+    before = disconnects()
+    asyncio.run(cancel())
+    assert disconnects() == before + 1
@@ -0,0 +1,29 @@
+import pytest
+from sqlalchemy import text
+
+from backend import quantize
+
+
+def test_pgvector_quantizations_check_the_extension_version(pg):
+    with pg.connect() as cx:
+        version = quantize.pgvector_version(cx)
+        quantize.check_pgvector(cx, "none")
+        if version >= quantize.PG_QUANTIZATION_MIN_VERSION:
+            quantize.check_pgvector(cx, "halfvec")
+        else:
+            with pytest.raises(RuntimeError, match=r"VECTOR_QUANTIZATION=halfvec needs pgvector >= 0\.7\.0"):
+                quantize.check_pgvector(cx, "halfvec")
+            cx.execute(text("CREATE TABLE quantize_check (v vector(768))"))
+            with pytest.raises(RuntimeError, match="binary"):
+                quantize.create_vector_index(cx, "quantize_check", "v", method="binary")
+            cx.rollback()
+
+
+def test_other_hnsw_indexes(pg):
+    with pg.begin() as cx:
+        cx.execute(text("DROP TABLE IF EXISTS quantize_check"))
+        cx.execute(text("CREATE TABLE quantize_check (id int PRIMARY KEY, v vector(3))"))
+        for name in ("idx_a", "idx_b"):
+            cx.execute(text(f"CREATE INDEX {name} ON quantize_check USING hnsw (v vector_cosine_ops)"))
+        assert quantize.other_hnsw_indexes(cx, "quantize_check", "idx_a") == ["idx_b"]
+        cx.execute(text("DROP TABLE quantize_check"))
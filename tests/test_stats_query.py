@@ -0,0 +1,71 @@
+import csv
+from pathlib import Path
+
+import pytest
+
+from backend.stats_query import build_entities, classify, plan_question
+
+DATA = Path(__file__).resolve().parent.parent / "backend" / "data"
+LAKERS, CELTICS, NUGGETS = 1610612747, 1610612738, 1610612743
+
+
+@pytest.fixture(scope="module")
+def entities():
+    with open(DATA / "teams.csv", newline="") as f:
+        teams = list(csv.DictReader(f))
+    with open(DATA / "players.csv", newline="") as f:
+        players = list(csv.DictReader(f))
+    return build_entities(teams, players)
+
+
+@pytest.mark.parametrize("question", [
+    "Which player had the highest scoring game in the 2023 season?",
+    "Who had the most points in a single game in the 2023 season?",
+    "What was the highest scoring game of the 2023 season?",
+    "Which team scored the most points in the 2023 season?",
+])
+def test_questions_without_a_plan_fall_back(question, entities):
+    assert classify(question) is None
+    assert plan_question(question, entities) is None
+
+
+def test_team_comes_from_the_player_subject(entities):
+    plan = plan_question("Which Lakers player led in rebounds against the Celtics on 12/25/2023?", entities)
+    assert plan["scope"] == "game"
+    assert plan["stat"] == "rebounds"
+    assert plan["team_id"] == LAKERS
+    assert plan["team_ids"] == [LAKERS, CELTICS]
+    assert plan["date"] == (2023, 12, 25)
+
+
+def test_team_leader_in_a_game(entities):
+    plan = plan_question("Who led the Nuggets in rebounds on 4/9 in the 2023 season?", entities)
+    assert plan["scope"] == "game"
+    assert plan["team_id"] == NUGGETS
+    assert plan["date"] == (2024, 4, 9)
+
+
+def test_game_leader_across_both_teams(entities):
+    plan = plan_question("Who had the most assists in the Lakers vs Celtics game on 12/25/2023?", entities)
+    assert plan["scope"] == "game"
+    assert plan["team_id"] is None
+    assert plan["team_ids"] == [LAKERS, CELTICS]
+
+
+def test_season_leader(entities):
+    plan = plan_question("Who led the league in steals in the 2023 season?", entities)
+    assert plan["scope"] == "season"
+    assert plan["season"] == 2023
+    assert plan["team_id"] is None
+
+
+@pytest.mark.parametrize("question", [
+    # Two teams that could each be the subject
+    "Which Lakers player had the most points for the Celtics on 12/25/2023?",
+    # Season leader restricted to one opponent: no plan computes that
+    "Who scored the most points against the Celtics in the 2023 season?",
+    # No date or season
+    "Who led the Lakers in rebounds?",
+])
+def test_unclear_scope_falls_back(question, entities):
+    assert plan_question(question, entities) is None